@@ -0,0 +1,54 @@
+# bench/asgi.py
+"""Gọi 1 ứng dụng ASGI (FastAPI) ngay trong process, không cần socket/httpx."""
+
+from __future__ import annotations
+import asyncio
+import json
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+
+async def asgi_request(
+    app, path: str, params: Optional[Dict[str, Any]] = None, method: str = "GET"
+) -> Tuple[int, bytes]:
+    """1 request HTTP/1.1 tối giản -> (status, body)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(params or {}).encode(),
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status, chunks = 500, []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Event().wait()  # không có gì thêm: chờ tới khi bị huỷ
+
+    async def send(msg):
+        nonlocal status
+        if msg["type"] == "http.response.start":
+            status = msg["status"]
+        elif msg["type"] == "http.response.body":
+            chunks.append(msg.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+def get_json(app, path: str, params: Optional[Dict[str, Any]] = None):
+    """Bản đồng bộ: GET rồi parse JSON; lỗi HTTP -> RuntimeError."""
+    status, body = asyncio.run(asgi_request(app, path, params))
+    if status != 200:
+        raise RuntimeError(f"GET {path} -> {status}: {body[:200]!r}")
+    return json.loads(body)
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# bench/loadtest.py
+"""
+Load test cho web/app.py: C client đồng thời, mỗi client gửi liên tục 1 request
+rút ngẫu nhiên (có seed) theo tỉ lệ --mix, trong --duration giây (hoặc đủ --requests).
+
+Ba chế độ:
+  --mode inprocess   gọi thẳng ứng dụng ASGI trong process (không socket)
+  --mode uvicorn     tự bật `uvicorn web.app:app --workers N` ở cổng trống rồi bắn HTTP
+  --url http://...   bắn vào server đang chạy sẵn (bỏ qua --mode/--backend)
+
+--backend stub (mặc định): model VAE ngẫu nhiên nhỏ + dữ liệu giả (bench/synthetic.py),
+                           không cần web/best_model; --backend real: artifacts thật.
+
+  python bench/loadtest.py --concurrency 8 --duration 30
+  python bench/loadtest.py --mode uvicorn --workers 2 --save-baseline
+  python bench/loadtest.py --mode uvicorn --workers 2 --check   # exit 1 nếu p95 xấu đi
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlencode, urlparse
+
+import numpy as np
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+warnings.filterwarnings("ignore")
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+for p in (ROOT / "src", ROOT, BENCH_DIR):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+PERCENTILES = [50, 90, 95, 99]
+
+
+def parse_mix(spec: str):
+    """'symbols=1,infer=4' -> ([ 'symbols', 'infer' ], [0.2, 0.8])"""
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        if name.strip() not in ("symbols", "infer"):
+            raise ValueError(f"endpoint không hỗ trợ: {name}")
+        names.append(name.strip())
+        weights.append(float(w or 1))
+    total = sum(weights)
+    return names, [w / total for w in weights]
+
+
+class Recorder:
+    """Gom (endpoint, latency, ok) từ nhiều thread/task."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = []  # (endpoint, latency_s, ok, status)
+
+    def add(self, endpoint, latency, ok, status):
+        with self.lock:
+            self.samples.append((endpoint, latency, ok, status))
+
+    def summary(self, wall: float):
+        def stats(rows):
+            lat = np.array([r[1] for r in rows]) * 1000.0
+            errors = sum(1 for r in rows if not r[2])
+            out = {
+                "requests": len(rows),
+                "errors": errors,
+                "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+                "throughput_rps": round(len(rows) / wall, 2) if wall > 0 else None,
+            }
+            if len(lat):
+                out.update(
+                    {
+                        f"p{q}_ms": round(float(np.percentile(lat, q)), 2)
+                        for q in PERCENTILES
+                    }
+                )
+                out["mean_ms"] = round(float(lat.mean()), 2)
+                out["max_ms"] = round(float(lat.max()), 2)
+            return out
+
+        by_ep = {}
+        for r in self.samples:
+            by_ep.setdefault(r[0], []).append(r)
+        statuses = {}
+        for r in self.samples:
+            statuses[str(r[3])] = statuses.get(str(r[3]), 0) + 1
+        return {
+            "overall": stats(self.samples),
+            "endpoints": {ep: stats(rows) for ep, rows in sorted(by_ep.items())},
+            "status_codes": statuses,
+        }
+
+
+# ====== Sinh request ======
+class Workload:
+    def __init__(self, mix: str, symbols, seed: int, backtest_days: int):
+        self.names, self.weights = parse_mix(mix)
+        self.symbols = list(symbols)
+        self.seed = seed
+        self.backtest_days = backtest_days
+
+    def stream(self, worker: int):
+        rng = random.Random(self.seed * 1000 + worker)
+        while True:
+            ep = rng.choices(self.names, self.weights)[0]
+            if ep == "symbols":
+                yield ep, "/symbols", {}
+            else:
+                sym = rng.choice(self.symbols)
+                yield ep, "/infer", {"symbol": sym, "backtest_days": self.backtest_days}
+
+
+def _deadline(duration: float, max_requests: int):
+    """Trả về hàm take() -> True nếu còn được gửi request tiếp."""
+    end = time.perf_counter() + duration if duration else None
+    lock = threading.Lock()
+    left = [max_requests or -1]
+
+    def take():
+        if end is not None and time.perf_counter() >= end:
+            return False
+        with lock:
+            if left[0] == 0:
+                return False
+            left[0] -= 1
+        return True
+
+    return take
+
+
+# ====== Chế độ trong process (ASGI) ======
+async def _run_asgi(app, workload, concurrency, take, rec):
+    from asgi import asgi_request
+
+    async def worker(i):
+        for ep, path, params in workload.stream(i):
+            if not take():
+                return
+            t0 = time.perf_counter()
+            try:
+                status, _ = await asgi_request(app, path, params)
+            except Exception:
+                status = "exc"
+            rec.add(ep, time.perf_counter() - t0, status == 200, status)
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+
+
+def run_inprocess(app, workload, concurrency, duration, max_requests, warmup):
+    from asgi import asgi_request
+
+    for _, path, params in _take_n(workload, warmup):
+        asyncio.run(asgi_request(app, path, params))
+    rec = Recorder()
+    take = _deadline(duration, max_requests)
+    t0 = time.perf_counter()
+    asyncio.run(_run_asgi(app, workload, concurrency, take, rec))
+    return rec, time.perf_counter() - t0
+
+
+# ====== Chế độ HTTP (uvicorn / --url) ======
+def _http_get(conn, path, params):
+    conn.request("GET", f"{path}?{urlencode(params)}" if params else path)
+    resp = conn.getresponse()
+    resp.read()
+    return resp.status
+
+
+def run_http(base_url, workload, concurrency, duration, max_requests, warmup):
+    u = urlparse(base_url)
+    host, port = u.hostname, u.port or 80
+    rec = Recorder()
+
+    conn = http.client.HTTPConnection(host, port, timeout=120)
+    for _, path, params in _take_n(workload, warmup):
+        _http_get(conn, path, params)
+    conn.close()
+
+    take = _deadline(duration, max_requests)
+
+    def worker(i):
+        conn = http.client.HTTPConnection(host, port, timeout=120)  # keep-alive
+        for ep, path, params in workload.stream(i):
+            if not take():
+                break
+            t0 = time.perf_counter()
+            try:
+                status = _http_get(conn, path, params)
+            except Exception:
+                status = "exc"
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=120)
+            rec.add(ep, time.perf_counter() - t0, status == 200, status)
+        conn.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(worker, range(concurrency)))
+    return rec, time.perf_counter() - t0
+
+
+def _take_n(workload, n):
+    """n request đầu (warmup) — mỗi endpoint ít nhất 1 lần để nạp/trace model."""
+    seen, out = set(), []
+    for item in workload.stream(-1):
+        if len(out) >= n and seen >= set(workload.names):
+            break
+        seen.add(item[0])
+        out.append(item)
+        if len(out) > n + 50:
+            break
+    return out
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(workers: int, env: dict, timeout: float = 180.0):
+    port = _free_port()
+    cmd = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "web.app:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env={**os.environ, **env})
+    url = f"http://127.0.0.1:{port}"
+    end = time.time() + timeout
+    while time.time() < end:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn thoát sớm (code {proc.returncode})")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            if _http_get(conn, "/symbols", {}) == 200:
+                conn.close()
+                return proc, url
+        except OSError:
+            time.sleep(0.5)
+    proc.terminate()
+    raise TimeoutError(f"uvicorn không sẵn sàng sau {timeout}s")
+
+
+def print_report(report):
+    print(
+        f"\n{'endpoint':<10}{'reqs':>8}{'err%':>7}{'rps':>9}"
+        + "".join(f"{'p' + str(q):>9}" for q in PERCENTILES)
+        + f"{'max':>9}  (ms)"
+    )
+    rows = [("ALL", report["overall"])] + list(report["endpoints"].items())
+    for name, st in rows:
+        print(
+            f"{name:<10}{st['requests']:>8}{st['error_rate'] * 100:>7.2f}"
+            f"{st['throughput_rps'] or 0:>9.2f}"
+            + "".join(f"{st.get(f'p{q}_ms', float('nan')):>9.1f}" for q in PERCENTILES)
+            + f"{st.get('max_ms', float('nan')):>9.1f}"
+        )
+    if report["status_codes"]:
+        print(f"status: {report['status_codes']}")
+
+
+def check_baseline(report, baseline, tolerance):
+    """So p95 + error rate với baseline; trả về danh sách vi phạm."""
+    issues = []
+    base_eps = baseline.get("endpoints", {})
+    for ep, st in report["endpoints"].items():
+        b = base_eps.get(ep)
+        if not b or "p95_ms" not in b or "p95_ms" not in st:
+            continue
+        ratio = st["p95_ms"] / b["p95_ms"] if b["p95_ms"] else float("inf")
+        print(
+            f"{ep}: p95 {st['p95_ms']:.1f}ms vs baseline {b['p95_ms']:.1f}ms ({ratio:.2f}x)"
+        )
+        if ratio > 1 + tolerance:
+            issues.append(f"{ep} p95 x{ratio:.2f}")
+        if st["error_rate"] > b.get("error_rate", 0) + 0.01:
+            issues.append(f"{ep} error_rate {st['error_rate']:.2%}")
+    return issues
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test cho web/app.py")
+    ap.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    ap.add_argument(
+        "--url", default=None, help="Server đang chạy (vd. http://127.0.0.1:8000)"
+    )
+    ap.add_argument("--backend", choices=["stub", "real"], default="stub")
+    ap.add_argument("--workers", type=int, default=1, help="Số worker uvicorn")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument(
+        "--duration", type=float, default=20.0, help="giây (0 = không giới hạn)"
+    )
+    ap.add_argument(
+        "--requests", type=int, default=0, help="tổng số request (0 = theo duration)"
+    )
+    ap.add_argument("--warmup", type=int, default=5)
+    ap.add_argument("--mix", default="symbols=1,infer=4", help="tỉ lệ endpoint")
+    ap.add_argument("--backtest-days", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=BENCH_DIR / "loadtest_last.json")
+    ap.add_argument(
+        "--baseline", type=Path, default=BENCH_DIR / "loadtest_baseline.json"
+    )
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    ap.add_argument(
+        "--check", action="store_true", help="exit 1 nếu p95/lỗi xấu hơn baseline"
+    )
+    args = ap.parse_args()
+    if not args.duration and not args.requests:
+        ap.error("cần --duration hoặc --requests")
+
+    env = {}
+    tmp = None
+    if args.url is None and args.backend == "stub":
+        import synthetic
+
+        tmp = tempfile.TemporaryDirectory(prefix="stock_loadtest_")
+        best_dir, data_csv = synthetic.make_stub_backend(tmp.name, seed=args.seed)
+        env = {"STOCK_BEST_DIR": str(best_dir), "STOCK_DATA_PATH": str(data_csv)}
+
+    proc = None
+    try:
+        if args.url is None and args.mode == "inprocess":
+            os.environ.update(env)
+            import web.app as web_app
+            from web.model import list_symbols
+
+            symbols = list_symbols(web_app.DF_RAW)
+            workload = Workload(args.mix, symbols, args.seed, args.backtest_days)
+            target = "inprocess"
+            rec, wall = run_inprocess(
+                web_app.app,
+                workload,
+                args.concurrency,
+                args.duration,
+                args.requests,
+                args.warmup,
+            )
+        else:
+            url = args.url
+            if url is None:
+                proc, url = start_uvicorn(args.workers, env)
+            conn = http.client.HTTPConnection(
+                urlparse(url).hostname, urlparse(url).port
+            )
+            conn.request("GET", "/symbols")
+            symbols = json.loads(conn.getresponse().read())
+            conn.close()
+            workload = Workload(args.mix, symbols, args.seed, args.backtest_days)
+            target = url if args.url else f"uvicorn x{args.workers}"
+            rec, wall = run_http(
+                url,
+                workload,
+                args.concurrency,
+                args.duration,
+                args.requests,
+                args.warmup,
+            )
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+        if tmp is not None:
+            tmp.cleanup()
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "target": target,
+            "backend": None if args.url else args.backend,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "wall_s": round(wall, 3),
+            "cpu_count": os.cpu_count(),
+        },
+        **rec.summary(wall),
+    }
+    print_report(report)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Đã lưu báo cáo -> {args.out}")
+
+    issues = []
+    if args.baseline.exists() and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            issues = check_baseline(report, json.load(f), args.tolerance)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Đã lưu baseline -> {args.baseline}")
+    if args.check and issues:
+        print(f"❌ Hồi quy độ trễ: {', '.join(issues)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# bench/run_bench.py
+"""
+Benchmark các đường nóng trên dữ liệu giả (tái lập được: seed cố định, model ngẫu nhiên nhỏ).
+
+  python bench/run_bench.py                       # small,medium; so với bench/baseline.json
+  python bench/run_bench.py --scales large --only backtest_multi_symbol,infer_one_symbol
+  python bench/run_bench.py --save-baseline       # ghi kết quả làm baseline mới
+  python bench/run_bench.py --check               # exit 1 nếu có case chậm hơn baseline > tolerance
+
+Kết quả lần chạy gần nhất: bench/last_run.json (cùng định dạng với baseline).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "3")
+warnings.filterwarnings("ignore")
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+for p in (ROOT / "src", ROOT, BENCH_DIR):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
+
+import synthetic  # noqa: E402
+
+BASELINE = BENCH_DIR / "baseline.json"
+LAST_RUN = BENCH_DIR / "last_run.json"
+
+# N mã × T ngày giao dịch, số bài báo
+SCALES = {
+    "small": {"symbols": 5, "days": 400, "articles": 200},
+    "medium": {"symbols": 20, "days": 1000, "articles": 1000},
+    "large": {"symbols": 100, "days": 2500, "articles": 5000},
+}
+CASES = [
+    "merge_stock_csvs",
+    "preprocess_data",
+    "preprocess_multisymbol_df",
+    "explode_content_to_sentences",
+    "backtest_multi_symbol",
+    "rolling_backtest",
+    "infer_one_symbol",
+    "/infer",
+    "scenario_one_symbol",
+]
+# lưới what-if cho case scenario_one_symbol: 4 sentiment × 21 shock × 5 days = 420 kịch bản
+SCENARIO_GRID = {
+    "sentiment": ["neg", "neu", "pos", None],
+    "shock": [x / 100 for x in range(-10, 11)],
+    "days": [1, 3, 5, 10, 20],
+}
+
+
+def time_case(fn, repeat: int, warmup: int):
+    """Chạy warmup lần (không tính) rồi repeat lần; trả về list thời gian (giây)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+class Workload:
+    """Dữ liệu giả của 1 scale + model giả dùng chung; mỗi case là 1 hàm không đối số."""
+
+    def __init__(self, scale: str, tmp: Path, best_dir: Path, seed: int = 0):
+        from pre_stock import preprocess_data
+
+        cfg = SCALES[scale]
+        self.tmp = tmp / scale
+        self.best_dir = best_dir
+        self.prices = synthetic.make_ohlcv(cfg["symbols"], cfg["days"], seed)
+        self.stock_dir = self.tmp / "stock"
+        synthetic.write_stock_csvs(self.prices, self.stock_dir)
+        self.store = synthetic.make_sentiment_store(self.prices, seed=seed)
+        self.news = synthetic.make_news(cfg["articles"], seed=seed)
+        self.pre = preprocess_data(
+            input_path=self.prices,
+            json_path=self.tmp / "none.json",
+            start_date=None,
+            output_path=None,
+            sentiment_store=self.store,
+        )
+        self.symbol = self.pre["symbol"].iloc[0]
+        self.n_windows = 1
+
+    def rows(self, case: str) -> int:
+        return {
+            "merge_stock_csvs": len(self.prices),
+            "preprocess_data": len(self.prices),
+            "preprocess_multisymbol_df": len(self.pre),
+            "explode_content_to_sentences": len(self.news),
+            "backtest_multi_symbol": int(self.pre["symbol"].nunique()),
+            "rolling_backtest": self.n_windows,
+            "scenario_one_symbol": 1
+            + len(SCENARIO_GRID["sentiment"])
+            * len(SCENARIO_GRID["shock"])
+            * len(SCENARIO_GRID["days"]),
+        }.get(case, 1)
+
+    def fn(self, case: str):
+        if case == "merge_stock_csvs":
+            from load_stock import merge_stock_csvs
+
+            out = self.tmp / "data.csv"
+            return lambda: merge_stock_csvs(self.stock_dir, out, full_rebuild=True)
+        if case == "preprocess_data":
+            from pre_stock import preprocess_data
+
+            return lambda: preprocess_data(
+                input_path=self.prices,
+                json_path=self.tmp / "none.json",
+                start_date=None,
+                output_path=None,
+                sentiment_store=self.store,
+            )
+        if case == "preprocess_multisymbol_df":
+            from model_training import preprocess_multisymbol_df
+
+            return lambda: preprocess_multisymbol_df(self.pre)
+        if case == "explode_content_to_sentences":
+            from pre_news import explode_content_to_sentences
+
+            return lambda: explode_content_to_sentences(self.news)
+        if case in ("backtest_multi_symbol", "rolling_backtest"):
+            from metrics_and_backtest import backtest_multi_symbol, rolling_backtest
+            from model_training import (
+                align_features_for_infer,
+                load_best_artifacts,
+                preprocess_multisymbol_df,
+            )
+
+            vae, scaler, config = load_best_artifacts(str(self.best_dir))
+            clean, _, _ = preprocess_multisymbol_df(self.pre)
+            clean, feats = align_features_for_infer(clean, config)
+            if case == "rolling_backtest":
+
+                def call():
+                    out = rolling_backtest(
+                        vae, clean, feats, scaler, "close", config["W"], config["H"]
+                    )
+                    self.n_windows = out["n_windows"]
+
+                return call
+            return lambda: backtest_multi_symbol(
+                vae, clean, feats, scaler, "close", config["W"], config["H"]
+            )
+        if case == "infer_one_symbol":
+            from web.model import infer_one_symbol, prepare_data
+
+            prepare_data(self.pre)  # như lúc khởi động API: scale sẵn 1 lần
+            return lambda: infer_one_symbol(self.pre, self.symbol)
+        if case == "/infer":
+            import web.app as web_app
+            from asgi import get_json
+            from web.model import prepare_data
+
+            prepare_data(self.pre)
+
+            def call():
+                web_app.DF_RAW = self.pre
+                return get_json(web_app.app, "/infer", {"symbol": self.symbol})
+
+            return call
+        if case == "scenario_one_symbol":
+            from web.model import prepare_data, scenario_one_symbol
+
+            prepare_data(self.pre)
+            return lambda: scenario_one_symbol(
+                self.pre, self.symbol, grid=SCENARIO_GRID
+            )
+        raise KeyError(case)
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """In bảng so sánh; trả về danh sách case chậm hơn baseline quá tolerance."""
+    base = baseline.get("results", {})
+    regressions = []
+    print(f"\n{'case':<42}{'median':>10}{'baseline':>10}{'ratio':>8}  rows/s")
+    for key, r in results.items():
+        b = base.get(key)
+        ratio = r["median_s"] / b["median_s"] if b and b["median_s"] > 0 else None
+        flag = ""
+        if ratio is not None and ratio > 1 + tolerance:
+            flag = "  ⚠️ chậm hơn"
+            regressions.append(key)
+        elif ratio is not None and ratio < 1 - tolerance:
+            flag = "  ✓ nhanh hơn"
+        print(
+            f"{key:<42}{r['median_s']:>10.4f}"
+            f"{(b['median_s'] if b else float('nan')):>10.4f}"
+            f"{(ratio if ratio is not None else float('nan')):>8.2f}"
+            f"  {r['rows_per_s']:,.1f}{flag}"
+        )
+    return regressions
+
+
+def run_scales(scales, cases, tmp: Path, args) -> dict:
+    """Sinh model giả + dữ liệu từng scale trong tmp rồi đo mọi case."""
+    # model giả phải có trước khi import web.model (nạp artifacts lúc import)
+    best_dir, data_csv = synthetic.make_stub_backend(tmp / "stub", seed=args.seed)
+    os.environ["STOCK_BEST_DIR"] = str(best_dir)
+    os.environ["STOCK_DATA_PATH"] = str(data_csv)
+
+    results = {}
+    for scale in scales:
+        t0 = time.perf_counter()
+        wl = Workload(scale, tmp, best_dir, args.seed)
+        print(
+            f"==> scale={scale} {SCALES[scale]} (sinh dữ liệu {time.perf_counter() - t0:.1f}s)"
+        )
+        for case in cases:
+            times = time_case(wl.fn(case), args.repeat, args.warmup)
+            med = statistics.median(times)
+            rows = wl.rows(case)
+            results[f"{scale}/{case}"] = {
+                "median_s": round(med, 6),
+                "min_s": round(min(times), 6),
+                "repeat": args.repeat,
+                "rows": rows,
+                "rows_per_s": round(rows / med, 2) if med > 0 else None,
+            }
+            print(f"    {case:<32}{med:>9.4f}s  (min {min(times):.4f}s)")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark đường nóng trên dữ liệu giả")
+    ap.add_argument("--scales", default="small,medium", help=",".join(SCALES))
+    ap.add_argument("--only", default="", help="Chỉ chạy các case (cách nhau dấu ,)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--warmup", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--out", type=Path, default=LAST_RUN)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="0.25 = ±25%%")
+    ap.add_argument("--check", action="store_true", help="exit 1 nếu có hồi quy")
+    args = ap.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    cases = [c.strip() for c in args.only.split(",") if c.strip()] or CASES
+    for c in cases:
+        if c not in CASES:
+            ap.error(f"case không tồn tại: {c} (có: {', '.join(CASES)})")
+
+    tmp = Path(tempfile.mkdtemp(prefix="stock_bench_"))
+    try:
+        results = run_scales(scales, cases, tmp, args)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    payload = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "scales": {s: SCALES[s] for s in scales},
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"Đã lưu kết quả -> {args.out}")
+
+    regressions = []
+    if args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+    if args.save_baseline:
+        old = {}
+        if args.baseline.exists():
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                old = json.load(f).get("results", {})
+        # chỉ ghi đè các case vừa chạy, giữ các case/scale khác của baseline cũ
+        payload["results"] = {**old, **results}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        print(f"Đã cập nhật baseline -> {args.baseline}")
+    if args.check and regressions:
+        print(f"❌ Hồi quy hiệu năng: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# bench/synthetic.py
+"""
+Sinh dữ liệu giả có seed cố định cho benchmark (không cần crawl / model thật):
+  - make_ohlcv: giá OHLCV N mã × T ngày giao dịch (random walk log-normal)
+  - make_sentiment_store: bảng (symbol, time, p_neg, p_neu, p_pos, n_articles)
+  - make_news: bài báo "giống tiếng Việt" (content, ngay_dang, source, ticket)
+  - write_tiny_artifacts: VAE ngẫu nhiên rất nhỏ, cùng shape vào/ra với model thật
+    ((None, W, F) -> (None, H, 1)), kèm config.json + x_scaler.pkl
+"""
+
+from __future__ import annotations
+import json
+import os
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT / "src") not in sys.path:
+    sys.path.insert(0, str(ROOT / "src"))
+
+# 11 mã thật (cùng thứ tự one-hot với model) rồi tới mã giả S012, S013, ...
+REAL_SYMBOLS = [
+    "BSR",
+    "CMC",
+    "ELC",
+    "FPT",
+    "GAS",
+    "ITC",
+    "OIL",
+    "PLX",
+    "PVG",
+    "SGT",
+    "VNZ",
+]
+BASE_FEATURES = [
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "ma_5",
+    "ema_5",
+    "ma_10",
+    "ema_10",
+    "ma_20",
+    "ema_20",
+    "rsi_14",
+    "open_pct",
+    "high_pct",
+    "low_pct",
+    "close_pct",
+    "volume_pct",
+    "macd",
+    "macd_signal",
+    "atr_14",
+    "p_neg",
+    "p_neu",
+    "p_pos",
+    "has_news",
+]
+FEATURE_COLS = BASE_FEATURES + [f"sym_{s}" for s in REAL_SYMBOLS]
+
+
+def symbols(n: int) -> List[str]:
+    return REAL_SYMBOLS[:n] + [f"S{i:03d}" for i in range(len(REAL_SYMBOLS) + 1, n + 1)]
+
+
+def make_ohlcv(
+    n_symbols: int, n_days: int, seed: int = 0, start: str = "2018-01-01"
+) -> pd.DataFrame:
+    """OHLCV theo ngày làm việc; cột giống dataset/data.csv (time, OHLCV, symbol)."""
+    rng = np.random.default_rng(seed)
+    times = pd.bdate_range(start, periods=n_days)
+    frames = []
+    for sym in symbols(n_symbols):
+        p0 = rng.uniform(5_000, 120_000)
+        rets = rng.normal(0.0003, rng.uniform(0.01, 0.03), n_days)
+        close = p0 * np.exp(np.cumsum(rets))
+        open_ = close * np.exp(rng.normal(0, 0.005, n_days))
+        spread = np.abs(rng.normal(0, 0.01, n_days))
+        frames.append(
+            pd.DataFrame(
+                {
+                    "time": times,
+                    "open": open_.round(0),
+                    "high": (np.maximum(open_, close) * (1 + spread)).round(0),
+                    "low": (np.minimum(open_, close) * (1 - spread)).round(0),
+                    "close": close.round(0),
+                    "volume": rng.integers(1_000, 5_000_000, n_days),
+                    "symbol": sym,
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_stock_csvs(df: pd.DataFrame, stock_dir: str | Path) -> List[Path]:
+    """Ghi mỗi mã 1 file <SYM>_history_<từ>_<đến>.csv như crawl/crawl_stock.py."""
+    stock_dir = Path(stock_dir)
+    stock_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for sym, g in df.groupby("symbol", sort=True):
+        t = g["time"].dt.strftime("%Y-%m-%d")
+        path = stock_dir / f"{sym}_history_{t.iloc[0]}_{t.iloc[-1]}.csv"
+        g.assign(time=t).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def make_sentiment_store(
+    df_prices: pd.DataFrame, news_ratio: float = 0.2, seed: int = 0
+) -> pd.DataFrame:
+    """Sentiment cho ~news_ratio số (mã, ngày) — giống bảng daily_scores_by_symbol.csv."""
+    rng = np.random.default_rng(seed)
+    pick = df_prices.sample(frac=news_ratio, random_state=seed)[["symbol", "time"]]
+    p = rng.dirichlet([2.0, 5.0, 2.0], len(pick)).astype("float32")
+    return pick.assign(
+        p_neg=p[:, 0],
+        p_neu=p[:, 1],
+        p_pos=p[:, 2],
+        n_articles=rng.integers(1, 4, len(pick)).astype("int32"),
+    ).reset_index(drop=True)
+
+
+# ====== Tin tức giả ======
+_SUBJECTS = [
+    "Công ty",
+    "Tập đoàn",
+    "Ban lãnh đạo",
+    "Hội đồng quản trị",
+    "Doanh nghiệp",
+    "Cổ đông lớn",
+    "Nhà đầu tư nước ngoài",
+]
+_VERBS = [
+    "công bố",
+    "ghi nhận",
+    "dự kiến",
+    "thông qua",
+    "điều chỉnh",
+    "báo cáo",
+    "đẩy mạnh",
+]
+_OBJECTS = [
+    "doanh thu quý {q} tăng {x}% so với cùng kỳ",
+    "lợi nhuận sau thuế đạt {y} tỷ đồng",
+    "kế hoạch chia cổ tức {x}% bằng tiền mặt",
+    "phương án phát hành {y} triệu cổ phiếu",
+    "dự án mở rộng nhà máy tại {place}",
+    "hợp đồng cung cấp dịch vụ chuyển đổi số",
+    "chiến lược tăng trưởng giai đoạn 2025 - 2030",
+    "biên lợi nhuận gộp giảm còn {x}%",
+]
+_TAILS = [
+    "trong bối cảnh thị trường còn nhiều biến động",
+    "nhờ nhu cầu trong nước phục hồi",
+    "dù chi phí nguyên vật liệu tăng mạnh",
+    "theo nghị quyết đại hội đồng cổ đông thường niên",
+    "",
+]
+_PLACES = ["Hà Nội", "TP.HCM", "Đà Nẵng", "Bà Rịa - Vũng Tàu", "Quảng Ngãi"]
+
+
+def _sentence(rng, sym: str) -> str:
+    obj = rng.choice(_OBJECTS).format(
+        q=rng.integers(1, 5),
+        x=rng.integers(1, 60),
+        y=rng.integers(10, 5000),
+        place=rng.choice(_PLACES),
+    )
+    tail = rng.choice(_TAILS)
+    s = f"{rng.choice(_SUBJECTS)} {sym} {rng.choice(_VERBS)} {obj}"
+    return (f"{s} {tail}" if tail else s) + "."
+
+
+def make_news(
+    n_articles: int, n_symbols: int = 9, seed: int = 0, start: str = "2023-01-01"
+) -> pd.DataFrame:
+    """Bài báo giả: 3–12 câu/bài; cột như merged_news_clean.csv (+ ticket)."""
+    rng = np.random.default_rng(seed)
+    syms = symbols(n_symbols)
+    days = pd.date_range(start, periods=720, freq="D")
+    rows = []
+    for _ in range(n_articles):
+        sym = syms[rng.integers(len(syms))]
+        n = int(rng.integers(3, 13))
+        rows.append(
+            {
+                "content": " ".join(_sentence(rng, sym) for _ in range(n)),
+                "ngay_dang": days[rng.integers(len(days))].strftime("%d/%m/%Y"),
+                "source": sym.lower(),
+                "ticket": sym,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+# ====== Model giả ======
+def build_tiny_vae(W: int = 90, H: int = 7, F: int = len(FEATURE_COLS), seed: int = 0):
+    """Cùng kiến trúc (thu nhỏ) & tên lớp chính với best_vae.keras, trọng số ngẫu nhiên."""
+    import tensorflow as tf
+    from tensorflow.keras import layers
+    from model_training import KLDivergenceLayer, Sampling
+
+    tf.keras.utils.set_random_seed(seed)
+    x_in = layers.Input(shape=(W, F))
+    h = layers.Conv1D(8, 3, padding="causal", activation="relu")(x_in)
+    h = layers.LayerNormalization()(h)
+    h = layers.LSTM(8)(h)
+    z_mu = layers.Dense(4, name="z_mu")(h)
+    z_logvar = layers.Dense(4, name="z_logvar")(h)
+    z_mu, z_logvar = KLDivergenceLayer(name="kl_layer")([z_mu, z_logvar])
+    z = Sampling(name="z")([z_mu, z_logvar])
+    d = layers.RepeatVector(H)(z)
+    d = layers.LSTM(8, return_sequences=True)(d)
+    d = layers.TimeDistributed(layers.Dense(8, activation="relu"))(d)
+    y = layers.TimeDistributed(layers.Dense(1), name="y_hat")(d)
+    return tf.keras.Model(x_in, y, name="tiny_vae")
+
+
+def write_tiny_artifacts(
+    best_dir: str | Path,
+    df_features: pd.DataFrame,
+    W: int = 90,
+    H: int = 7,
+    seed: int = 0,
+) -> Path:
+    """
+    Ghi best_vae.keras (ngẫu nhiên) + x_scaler.pkl (RobustScaler fit trên df_features)
+    + config.json vào best_dir -> dùng được với load_best_artifacts và web/model.py.
+    """
+    import joblib
+    from sklearn.preprocessing import RobustScaler
+
+    best_dir = Path(best_dir)
+    best_dir.mkdir(parents=True, exist_ok=True)
+    from features import feature_matrix
+
+    # khung gọn (sym_id) -> one-hot được bung lại như lúc train
+    scaler = RobustScaler().fit(feature_matrix(df_features, FEATURE_COLS))
+    joblib.dump(scaler, best_dir / "x_scaler.pkl")
+    with open(best_dir / "config.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {"W": W, "H": H, "TARGET_COL": "close", "feature_cols": FEATURE_COLS},
+            f,
+            indent=2,
+        )
+    build_tiny_vae(W, H, len(FEATURE_COLS), seed).save(best_dir / "best_vae.keras")
+    return best_dir
+
+
+def make_stub_backend(
+    out_dir: str | Path, n_symbols: int = 11, n_days: int = 300, seed: int = 0
+):
+    """
+    Model giả (+ model chỉ-suy-luận đã xuất, như bước 6b) + dữ liệu đã tiền xử lý để chạy
+    web/app.py không cần artifacts thật. Trả về (best_dir, preprocessed_csv); trỏ
+    STOCK_BEST_DIR / STOCK_DATA_PATH vào đây TRƯỚC khi import web.model / web.app.
+    """
+    from infer_export import export_inference
+    from model_training import preprocess_multisymbol_df
+    from pre_stock import preprocess_data
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prices = make_ohlcv(n_symbols, n_days, seed)
+    pre = preprocess_data(
+        input_path=prices,
+        json_path=out_dir / "none.json",
+        start_date=None,
+        output_path=out_dir / "preprocessed_data.csv",
+        sentiment_store=make_sentiment_store(prices, seed=seed),
+    )
+    best_dir = write_tiny_artifacts(
+        out_dir / "best_model", preprocess_multisymbol_df(pre)[0], seed=seed
+    )
+    export_inference(best_dir)
+    return best_dir, out_dir / "preprocessed_data.csv"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Sinh dữ liệu giả vào 1 thư mục")
+    ap.add_argument("out_dir")
+    ap.add_argument("--symbols", type=int, default=11)
+    ap.add_argument("--days", type=int, default=750)
+    ap.add_argument("--articles", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    out = Path(args.out_dir)
+    prices = make_ohlcv(args.symbols, args.days, args.seed)
+    write_stock_csvs(prices, out / "stock")
+    make_sentiment_store(prices, seed=args.seed).to_csv(
+        out / "daily_scores_by_symbol.csv", index=False, date_format="%Y-%m-%d"
+    )
+    make_news(args.articles, seed=args.seed).to_csv(
+        out / "merged_news_clean.csv", index=False, encoding="utf-8"
+    )
+    print(f"✅ Đã sinh dữ liệu giả vào {os.path.abspath(out)}")
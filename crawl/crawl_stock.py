@@ -1,6 +1,17 @@
-import pandas as pd
+import os
+import glob
+import re
 import time
-from vnstock import Vnstock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from rate_limit import RateLimiter  # token bucket dùng chung với crawler tin tức
+
+STOCK_DIR = "../dataset/stock"
+DEFAULT_START = "2020-01-01"
+PRICE_COLS = ["time", "open", "high", "low", "close", "volume", "symbol"]
 
 
 def fetch_history(symbol, start_date="2025-01-01", end_date="2025-09-01", source="VCI"):
@@ -8,6 +19,8 @@ def fetch_history(symbol, start_date="2025-01-01", end_date="2025-09-01", source
     Lấy dữ liệu lịch sử giá cho symbol trong khoảng thời gian đã cho.
     source: TCBS | VCI | MSN (nguồn dữ liệu được vnstock hỗ trợ)
     """
+    from vnstock import Vnstock
+
     stock = Vnstock().stock(symbol=symbol, source=source)
     df = stock.quote.history(start=start_date, end=end_date)
 
@@ -17,6 +30,140 @@ def fetch_history(symbol, start_date="2025-01-01", end_date="2025-09-01", source
     return df
 
 
+class VnstockSource:
+    """Nguồn giá mặc định: callable (symbol, start, end) -> DataFrame. Thay bằng stub khi test."""
+
+    def __init__(self, source="VCI"):
+        self.source = source
+
+    def __call__(self, symbol, start_date, end_date):
+        return fetch_history(symbol, start_date, end_date, source=self.source)
+
+
+# ====== Kho giá theo từng mã: <stock_dir>/<SYM>_history_<từ>_<đến>.csv ======
+# Mỗi lần cập nhật ghi phần đuôi mới thành 1 file riêng (không viết lại lịch sử) ->
+# merge_stock_csvs (src/load_stock.py) chỉ phải đọc đúng các dòng mới.
+_RANGE_RE = re.compile(r"_history_(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})\.csv$")
+
+
+def _symbol_files(stock_dir, symbol):
+    return sorted(glob.glob(os.path.join(stock_dir, f"{symbol}_history_*.csv")))
+
+
+def _normalize(df, symbol):
+    df = df.rename(columns={"date": "time", "tradingDate": "time"}).copy()
+    df["time"] = pd.to_datetime(df["time"], errors="coerce").dt.strftime("%Y-%m-%d")
+    df["symbol"] = symbol
+    df = df.dropna(subset=["time"])
+    cols = [c for c in PRICE_COLS if c in df.columns]
+    return df[cols + [c for c in df.columns if c not in cols]]
+
+
+def read_symbol(stock_dir, symbol):
+    files = _symbol_files(stock_dir, symbol)
+    if not files:
+        return pd.DataFrame(columns=PRICE_COLS)
+    return (
+        pd.concat([pd.read_csv(f) for f in files], ignore_index=True)
+        .drop_duplicates(subset=["symbol", "time"], keep="last")
+        .sort_values("time")
+        .reset_index(drop=True)
+    )
+
+
+def last_stored_date(stock_dir, symbol):
+    """
+    Ngày cuối đã lưu của mã (None nếu chưa có): lấy từ khoảng ngày trong tên file;
+    chỉ file đặt tên khác mẫu mới phải đọc cột time.
+    """
+    last = None
+    for f in _symbol_files(stock_dir, symbol):
+        m = _RANGE_RE.search(os.path.basename(f))
+        if m:
+            t = m.group(2)
+        else:
+            t = pd.read_csv(f, usecols=["time"])["time"].max()
+        if isinstance(t, str) and (last is None or t > last):
+            last = t
+    return last
+
+
+def upsert_symbol(stock_dir, symbol, df_new, after=None):
+    """
+    Ghi phần dữ liệu mới của mã thành file riêng <SYM>_history_<từ>_<đến>.csv (khoảng
+    ngày của chính phần mới); file cũ giữ nguyên. Dòng có time <= after (ngày cuối đã
+    lưu) bị bỏ. Trả về số ngày mới thêm.
+    """
+    new = _normalize(df_new, symbol)
+    if after is not None:
+        new = new[new["time"] > after]
+    new = (
+        new.drop_duplicates(subset=["symbol", "time"], keep="last")
+        .sort_values("time")
+        .reset_index(drop=True)
+    )
+    if new.empty:
+        return 0
+    os.makedirs(stock_dir, exist_ok=True)
+    first, last = new["time"].iloc[0], new["time"].iloc[-1]
+    out = os.path.join(stock_dir, f"{symbol}_history_{first}_{last}.csv")
+    tmp = out + ".tmp"
+    new.to_csv(tmp, index=False)
+    os.replace(tmp, out)
+    return len(new)
+
+
+# ====== Cập nhật song song ======
+def update_symbols(
+    symbols,
+    end_date=None,
+    default_start=DEFAULT_START,
+    stock_dir=STOCK_DIR,
+    source=None,
+    rate=5.0,
+    max_workers=8,
+    retries=2,
+    backoff=1.0,
+):
+    """
+    Với mỗi mã: đọc ngày cuối đã lưu -> chỉ tải phần thiếu (ngày cuối + 1 .. end_date)
+    -> ghi thành 1 file đuôi mới của mã. Các mã chạy song song, tổng số request bị giới
+    hạn bởi token bucket `rate` request/giây. source: callable (symbol, start, end) -> DataFrame.
+    Trả về {symbol: số ngày mới | 'up-to-date' | 'error: ...'}.
+    """
+    source = source or VnstockSource()
+    end_date = end_date or date.today().isoformat()
+    limiter = RateLimiter(rate, burst=max_workers)
+
+    def one(sym):
+        last = last_stored_date(stock_dir, sym)
+        start = default_start
+        if last:
+            start = (datetime.strptime(last, "%Y-%m-%d") + timedelta(days=1)).strftime(
+                "%Y-%m-%d"
+            )
+        if start > end_date:
+            return sym, "up-to-date"
+        for attempt in range(retries + 1):
+            limiter.acquire()
+            try:
+                df = source(sym, start, end_date)
+                break
+            except Exception as e:
+                if attempt == retries:
+                    return sym, f"error: {e}"
+                time.sleep(backoff * 2**attempt)
+        if df is None or len(df) == 0:
+            return sym, 0
+        return sym, upsert_symbol(stock_dir, sym, df, after=last)
+
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols))
+    if not symbols:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols)))) as ex:
+        return dict(ex.map(one, symbols))
+
+
 def fetch_multiple(
     symbols,
     start_date,
@@ -24,22 +171,29 @@ def fetch_multiple(
     output_csv="stocks_history.csv",
     source="VCI",
     delay=2,
+    max_workers=4,
 ):
     """
     Crawl dữ liệu cho nhiều mã và ghi ra một file CSV duy nhất.
-    delay: thời gian nghỉ giữa các request (giây)
+    Các mã tải song song; delay (giây) giờ là giãn cách tối thiểu giữa 2 request
+    (token bucket 1/delay request/giây) thay vì sleep cứng sau mỗi mã.
     """
-    all_data = []
-    for sym in symbols:
+    fetch = VnstockSource(source)
+    limiter = RateLimiter(1.0 / delay if delay else 0, burst=1)
+
+    def one(sym):
+        limiter.acquire()
         try:
             print(f"Đang lấy dữ liệu cho {sym} ...")
-            df = fetch_history(sym, start_date, end_date, source=source)
+            df = fetch(sym, start_date, end_date)
             df["symbol"] = sym  # đánh dấu mã chứng khoán
-            all_data.append(df)
+            return df
         except Exception as e:
             print(f"Không lấy được dữ liệu cho {sym}: {e}")
-        # Nghỉ giữa các request
-        time.sleep(delay)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as ex:
+        all_data = [df for df in ex.map(one, symbols) if df is not None]
 
     if all_data:
         combined_df = pd.concat(all_data, ignore_index=True)
@@ -50,13 +204,40 @@ def fetch_multiple(
 
 
 if __name__ == "__main__":
-    # Thay bằng list 20 mã bạn cần
-    symbols = ["ELC"]
-    fetch_multiple(
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="Cập nhật giá (chỉ phần còn thiếu) cho các mã vào dataset/stock"
+    )
+    ap.add_argument(
+        "symbols",
+        nargs="*",
+        help="Danh sách mã; bỏ trống = mọi mã đã có trong stock-dir",
+    )
+    ap.add_argument("--stock-dir", default=STOCK_DIR)
+    ap.add_argument("--end", default=None, help="YYYY-MM-DD (mặc định hôm nay)")
+    ap.add_argument("--start", default=DEFAULT_START, help="ngày bắt đầu cho mã mới")
+    ap.add_argument("--source", default="VCI", help="TCBS | VCI | MSN")
+    ap.add_argument("--rate", type=float, default=5.0, help="request/giây")
+    ap.add_argument("--workers", type=int, default=8)
+    args = ap.parse_args()
+
+    symbols = args.symbols or sorted(
+        {
+            os.path.basename(f).split("_history_")[0]
+            for f in glob.glob(os.path.join(args.stock_dir, "*_history_*.csv"))
+        }
+    )
+    t0 = time.perf_counter()
+    summary = update_symbols(
         symbols,
-        "2025-01-01",
-        "2025-09-01",
-        output_csv="vnstock_20_1.csv",
-        source="TCBS",
-        delay=3,  # chờ 3 giây giữa các request
+        end_date=args.end,
+        default_start=args.start,
+        stock_dir=args.stock_dir,
+        source=VnstockSource(args.source),
+        rate=args.rate,
+        max_workers=args.workers,
     )
+    for sym, res in summary.items():
+        print(f"{sym}: {res}")
+    print(f"✅ Cập nhật {len(summary)} mã trong {time.perf_counter() - t0:.1f}s")
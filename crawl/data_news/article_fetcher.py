@@ -0,0 +1,279 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from crawl_state import CrawlState, content_hash
+
+# Token bucket dùng chung với crawl_stock (crawl/rate_limit.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from rate_limit import RateLimiter  # noqa: E402
+
+# Kho tin gộp nằm ở src/news_store.py (load_news đọc cùng file đó)
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "src")
+)
+from news_store import NewsStore  # noqa: E402
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
+    "Connection": "keep-alive",
+}
+
+# Trạng thái crawl dùng chung cho mọi crawler (chạy từ crawl/data_news như các script)
+DEFAULT_STATE_DB = "../../dataset/crawl_state.sqlite"
+# NEWS_STORE_DB=<path>: ghi kho tin sang file khác (vd. khi chạy crawler trên HTML mẫu)
+NEWS_STORE_DB = os.environ.get("NEWS_STORE_DB", "../../dataset/news_store.sqlite")
+# NEWS_WRITE_JSON=1: vẫn ghi thêm file JSON từng trang như trước (để đối chiếu)
+WRITE_JSON = os.environ.get("NEWS_WRITE_JSON") == "1"
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def news_store(db_path=None):
+    """NewsStore dùng chung trong process (mở 1 lần cho mỗi đường dẫn)."""
+    db_path = db_path or NEWS_STORE_DB
+    with _stores_lock:
+        if db_path not in _stores:
+            _stores[db_path] = NewsStore(db_path)
+        return _stores[db_path]
+
+
+def save_records(kind, source, records, page=None, json_path=None):
+    """
+    API ghi chung cho crawler: thêm 1 lô bản ghi vào kho tin gộp (kind 'link'/'article').
+    json_path chỉ được ghi khi NEWS_WRITE_JSON=1. Trả về số bản ghi mới.
+    """
+    n = news_store().add(kind, source, records, page=page)
+    if WRITE_JSON and json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+    return n
+
+
+def save_articles(source, records, json_path=None):
+    page = os.path.basename(json_path) if json_path else None
+    return save_records("article", source, records, page=page, json_path=json_path)
+
+
+def make_session(pool_size=8, retries=3, backoff=0.5, verify=True, headers=None):
+    """Session keep-alive với pool kết nối và retry (backoff luỹ thừa) cho lỗi mạng/429/5xx."""
+    s = requests.Session()
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers.update(headers or DEFAULT_HEADERS)
+    s.verify = verify
+    return s
+
+
+class ArticleFetcher:
+    """
+    Engine tải bài viết dùng chung cho các crawler data_news.
+    - Mỗi luồng giữ 1 Session keep-alive (pool kết nối, không mở TCP/TLS mới mỗi bài)
+    - Giới hạn số request đồng thời trên mỗi host + rate limit (token bucket) theo host
+    - Retry có backoff (urllib3.Retry)
+    - (tuỳ chọn) CrawlState SQLite: URL đã crawl xong thì lấy lại kết quả đã lưu,
+      quá max_age giây thì gửi conditional GET (If-None-Match / If-Modified-Since)
+    Crawler chỉ cần cung cấp hàm parse(soup) -> kết quả (tuple/dict), None nếu bỏ qua.
+    Pool luồng (và Session của từng luồng) sống suốt vòng đời fetcher -> keep-alive giữ
+    qua các file trang; close() / `with fetcher:` đóng pool, mọi Session và CrawlState.
+    """
+
+    def __init__(
+        self,
+        max_workers=16,
+        per_host=4,
+        rate_per_host=4.0,
+        timeout=15,
+        retries=3,
+        backoff=0.5,
+        encoding="utf-8",
+        verify=True,
+        headers=None,
+        session_factory=None,
+        state_db=DEFAULT_STATE_DB,
+        max_age=None,
+        refresh=False,
+    ):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.rate_per_host = rate_per_host
+        self.timeout = timeout
+        self.encoding = encoding
+        self.session_factory = session_factory or (
+            lambda: make_session(
+                pool_size=per_host,
+                retries=retries,
+                backoff=backoff,
+                verify=verify,
+                headers=headers,
+            )
+        )
+        self.state = CrawlState(state_db) if state_db else None
+        self.max_age = max_age
+        self.refresh = refresh
+        self._local = threading.local()
+        self._sessions = []  # mọi Session đã tạo (để close())
+        self._executor = None
+        self._pool_lock = threading.Lock()
+        self._host_lock = threading.Lock()
+        self._host_sem = {}
+        self._host_rate = {}
+
+    # ---------- nội bộ ----------
+    def _session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = self.session_factory()
+            with self._pool_lock:
+                self._sessions.append(s)
+        return s
+
+    def _pool(self):
+        with self._pool_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(1, self.max_workers),
+                    thread_name_prefix="fetch",
+                )
+            return self._executor
+
+    def _host_limits(self, url):
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            if host not in self._host_sem:
+                self._host_sem[host] = threading.BoundedSemaphore(self.per_host)
+                self._host_rate[host] = RateLimiter(
+                    self.rate_per_host, burst=self.per_host
+                )
+            return self._host_sem[host], self._host_rate[host]
+
+    # ---------- API ----------
+    def get(self, url, headers=None):
+        """GET 1 URL (đã qua giới hạn host + rate limit). Trả về Response hoặc None."""
+        if not url:
+            return None
+        sem, limiter = self._host_limits(url)
+        with sem:
+            limiter.acquire()
+            try:
+                r = self._session().get(url, timeout=self.timeout, headers=headers)
+            except Exception as e:
+                print(f"❌ Lỗi request {url}: {e}")
+                return None
+        if self.encoding:
+            r.encoding = self.encoding
+        return r
+
+    def fetch(self, url):
+        """Trả về HTML (str) nếu HTTP 200, ngược lại None."""
+        r = self.get(url)
+        if r is None:
+            return None
+        if r.status_code != 200:
+            print(f"❌ Lỗi HTTP {r.status_code}: {url}")
+            return None
+        return r.text
+
+    def _parse(self, url, html, parse_fn):
+        try:
+            return parse_fn(BeautifulSoup(html, "html.parser"))
+        except Exception as e:
+            print(f"❌ Lỗi parse {url}: {e}")
+            return None
+
+    def crawl_one(self, url, parse_fn):
+        if self.state is None:
+            html = self.fetch(url)
+            return None if html is None else self._parse(url, html, parse_fn)
+
+        rec = None if self.refresh else self.state.get(url)
+        cached = rec is not None and rec["status"] == "done"
+        if cached and (
+            self.max_age is None or time.time() - rec["fetched_at"] < self.max_age
+        ):
+            return rec["result"]  # đã crawl, chưa hết hạn -> bỏ qua
+
+        headers = {}
+        if cached and rec["etag"]:
+            headers["If-None-Match"] = rec["etag"]
+        if cached and rec["last_modified"]:
+            headers["If-Modified-Since"] = rec["last_modified"]
+
+        r = self.get(url, headers=headers or None)
+        if r is None:
+            self.state.save(url, "request_error")
+            return rec["result"] if cached else None
+        etag, last_mod = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if r.status_code == 304 and cached:
+            self.state.touch(url, etag, last_mod)
+            return rec["result"]
+        if r.status_code != 200:
+            print(f"❌ Lỗi HTTP {r.status_code}: {url}")
+            self.state.save(url, "http_error", http_status=r.status_code)
+            return rec["result"] if cached else None
+
+        html = r.text
+        h = content_hash(html)
+        if cached and rec["content_hash"] == h:
+            self.state.touch(url, etag, last_mod)
+            return rec["result"]
+
+        result = self._parse(url, html, parse_fn)
+        if result is None:
+            self.state.save(url, "parse_error", http_status=200)
+            return None
+        self.state.save(url, "done", 200, etag, last_mod, h, result)
+        return result
+
+    def crawl_many(self, urls, parse_fn):
+        """Tải + parse song song; kết quả trả về ĐÚNG thứ tự urls (None nếu lỗi)."""
+        urls = list(urls)
+        if not urls:
+            return []
+        return list(self._pool().map(lambda u: self.crawl_one(u, parse_fn), urls))
+
+    def close(self):
+        """Dừng pool luồng, đóng mọi Session (kết nối keep-alive) và CrawlState."""
+        with self._pool_lock:
+            ex, self._executor = self._executor, None
+            sessions, self._sessions = self._sessions, []
+        if ex is not None:
+            ex.shutdown(wait=True)
+        for s in sessions:
+            s.close()
+        self._local = threading.local()
+        if self.state is not None:
+            self.state.close()
+            self.state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,9 +1,8 @@
 import os
-import requests
-from bs4 import BeautifulSoup
 import json
 from datetime import datetime
 import urllib3
+from article_fetcher import ArticleFetcher, save_articles
 
 # Tắt cảnh báo SSL
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -22,17 +21,12 @@ INPUT_PATH = "../../dataset/link/bsr/pvtrans_data.json"
 with open(INPUT_PATH, "r", encoding="utf-8") as f:
     data = json.load(f)
 
-output = []
-
-for idx, item in enumerate(data, start=1):
-    full_url = BASE_URL + item["url"]
-
-    resp = requests.get(full_url, verify=False, timeout=15)
-    soup = BeautifulSoup(resp.text, "html.parser")
 
+def parse_article(soup):
+    """Trích xuất (title, ngay_dang, content) từ HTML bài viết"""
     # ---- Lấy tiêu đề ----
     title_tag = soup.select_one("div.container h4#blog_post_name")
-    title = title_tag.get_text(strip=True) if title_tag else item.get("title", "")
+    title = title_tag.get_text(strip=True) if title_tag else ""
 
     # ---- Lấy ngày đăng ----
     date_tag = soup.select_one("div.entry-meta time.entry-date")
@@ -54,6 +48,21 @@ for idx, item in enumerate(data, start=1):
             content_parts.append(text)
 
     content = "\n".join(content_parts)
+    return title, ngay_dang, content
+
+
+SOURCE = "bsr"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
+FETCHER = ArticleFetcher(timeout=15, verify=False)
+full_urls = [BASE_URL + item["url"] for item in data]
+crawled_all = FETCHER.crawl_many(full_urls, parse_article)
+
+output = []
+
+for idx, (item, full_url, crawled) in enumerate(
+    zip(data, full_urls, crawled_all), start=1
+):
+    title, ngay_dang, content = crawled or ("", "", "")
+    title = title or item.get("title", "")
 
     # ---- Ngày crawl ----
     ngay_crawl = datetime.now().strftime("%Y-%m-%d")
@@ -71,7 +80,7 @@ for idx, item in enumerate(data, start=1):
     )
 
 # 💾 Lưu ra file JSON
-with open(SAVE_PATH, "w", encoding="utf-8") as f:
-    json.dump(output, f, ensure_ascii=False, indent=4)
+save_articles(SOURCE, output, SAVE_PATH)
+FETCHER.close()  # đóng pool luồng + session
 
-print(f"✅ Đã crawl xong, lưu tại: {SAVE_PATH}")
+print(f"✅ Đã crawl xong, lưu vào kho tin ({SOURCE})")
@@ -1,13 +1,14 @@
 import os
 import json
 import time
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
+from article_fetcher import ArticleFetcher, make_session, save_articles
+
+SOURCE = "cmc"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
 
 
 # =========================
@@ -29,28 +30,26 @@ def init_driver():
 def get_session_cookies(driver, url="https://www.cmc.com.vn/language/vi"):
     driver.get(url)
     time.sleep(2)  # chờ load trang và set ngôn ngữ
-    cookies = driver.get_cookies()
-    s = requests.Session()
-    for cookie in cookies:
-        s.cookies.set(cookie["name"], cookie["value"])
-    return s
+    return driver.get_cookies()
+
+
+def make_cookie_fetcher(cookies):
+    """ArticleFetcher mà mỗi session (theo luồng) đều mang cookie ngôn ngữ lấy từ Selenium"""
+
+    def _factory():
+        s = make_session()
+        for cookie in cookies:
+            s.cookies.set(cookie["name"], cookie["value"])
+        return s
+
+    return ArticleFetcher(timeout=20, session_factory=_factory)
 
 
 # =========================
 # Crawl Article
 # =========================
-def crawl_article(session, url):
-    try:
-        r = session.get(url, timeout=20)
-        r.encoding = "utf-8"
-        if r.status_code != 200:
-            print(f"❌ Lỗi HTTP {r.status_code} - {url}")
-            return None
-    except Exception as e:
-        print(f"❌ Request lỗi {url}: {e}")
-        return None
-
-    soup = BeautifulSoup(r.text, "html.parser")
+def parse_article(soup):
+    """Trích xuất (title, ngay_dang, content) từ HTML bài viết"""
 
     # --- Tiêu đề ---
     title_tag = soup.find("h2", class_="content__article__title")
@@ -90,7 +89,7 @@ def process_files():
     os.makedirs(output_dir, exist_ok=True)
 
     driver = init_driver()
-    session = get_session_cookies(driver)
+    fetcher = make_cookie_fetcher(get_session_cookies(driver))
     driver.quit()
 
     for file in sorted(os.listdir(input_dir)):
@@ -106,12 +105,13 @@ def process_files():
                 continue
 
         output_data = []
-        for art in articles:
+        print(f"[{file}] Crawling {len(articles)} bài ...")
+        results = fetcher.crawl_many(
+            [art.get("url") for art in articles], parse_article
+        )
+        for art, result in zip(articles, results):
             url = art.get("url")
             aid = art.get("id")
-            print(f"[{file}] Crawling: {url}")
-
-            result = crawl_article(session, url)
             if result:
                 title, ngay_dang, content = result
                 output_data.append(
@@ -138,10 +138,10 @@ def process_files():
 
         # Xuất file json output
         output_file = os.path.join(output_dir, f"data_{file}")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=4)
+        save_articles(SOURCE, output_data, output_file)
 
-        print(f"✅ Đã lưu {output_file}")
+        print(f"✅ Đã lưu {SOURCE}/{os.path.basename(output_file)} vào kho tin")
+    fetcher.close()  # đóng pool luồng + session
 
 
 if __name__ == "__main__":
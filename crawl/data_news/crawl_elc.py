@@ -1,5 +1,4 @@
-import requests
-from bs4 import BeautifulSoup
+from article_fetcher import ArticleFetcher, save_articles
 import json
 from datetime import datetime
 import os
@@ -16,14 +15,12 @@ def clean_text(text):
     return " ".join(text.split())
 
 
-def crawl_article(url):
-    response = requests.get(url)
-    response.encoding = "utf-8"
-    if response.status_code != 200:
-        print(f"❌ Không truy cập được {url}")
-        return None
+SOURCE = "elc"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
+FETCHER = ArticleFetcher(timeout=30)
 
-    soup = BeautifulSoup(response.text, "html.parser")
+
+def parse_article(soup):
+    """Trích xuất (title, ngay_dang, content) từ HTML bài viết"""
 
     # Lấy tiêu đề
     title_tag = soup.find("h2", class_="news-title-sub")
@@ -48,12 +45,11 @@ def process_json_file(filepath):
         articles = json.load(f)
 
     results = []
-    for item in articles:
+    print(f"🔍 Đang crawl {len(articles)} bài ...")
+    crawled_all = FETCHER.crawl_many([item["url"] for item in articles], parse_article)
+    for item, data in zip(articles, crawled_all):
         article_id = item["id"]
         url = item["url"]
-
-        print(f"🔍 Đang crawl {url}")
-        data = crawl_article(url)
         if data:
             title, ngay_dang, content = data
             results.append(
@@ -71,9 +67,8 @@ def process_json_file(filepath):
 
 def save_to_json(data, filename):
     out_path = os.path.join(OUTPUT_DIR, filename)
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    print(f"✅ Đã lưu file {out_path}")
+    save_articles(SOURCE, data, out_path)
+    print(f"✅ Đã lưu {SOURCE}/{os.path.basename(out_path)} vào kho tin")
 
 
 if __name__ == "__main__":
@@ -87,3 +82,4 @@ if __name__ == "__main__":
         data = process_json_file(filepath)
         if data:
             save_to_json(data, filename)
+    FETCHER.close()  # đóng pool luồng + session
@@ -1,7 +1,6 @@
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
+from article_fetcher import ArticleFetcher, save_articles
 from datetime import datetime
 
 # Thư mục chứa các file url json
@@ -11,20 +10,12 @@ output_dir = "../../dataset/data/fpt_online"
 os.makedirs(output_dir, exist_ok=True)
 
 
-def crawl_article(url):
-    """Crawl chi tiết bài viết từ URL"""
-    try:
-        r = requests.get(url, timeout=15)
-        r.encoding = "utf-8"
-        if r.status_code != 200:
-            print(f"❌ Lỗi HTTP {r.status_code}: {url}")
-            return None
-    except Exception as e:
-        print(f"❌ Lỗi request {url}: {e}")
-        return None
+SOURCE = "fpt_online"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
+FETCHER = ArticleFetcher(timeout=15)
 
-    soup = BeautifulSoup(r.text, "html.parser")
 
+def parse_article(soup):
+    """Trích xuất (title, ngay_dang, content) từ HTML bài viết"""
     # --- Tiêu đề ---
     title_tag = soup.find("h1", class_="title-name")
     title = title_tag.get_text(strip=True) if title_tag else ""
@@ -60,12 +51,13 @@ def process_files(input_dir, output_dir):
                 continue
 
         output_data = []
-        for art in articles:
+        print(f"[{file}] Crawling {len(articles)} bài ...")
+        results = FETCHER.crawl_many(
+            [art.get("url") for art in articles], parse_article
+        )
+        for art, result in zip(articles, results):
             url = art.get("url")
             aid = art.get("id")
-            print(f"[{file}] Crawling: {url}")
-
-            result = crawl_article(url)
             if result:
                 title, ngay_dang, content = result
                 output_data.append(
@@ -92,11 +84,11 @@ def process_files(input_dir, output_dir):
 
         # Xuất file json mới
         output_file = os.path.join(output_dir, f"data_{file}")
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=4)
+        save_articles(SOURCE, output_data, output_file)
 
-        print(f"✅ Đã lưu {output_file}")
+        print(f"✅ Đã lưu {SOURCE}/{os.path.basename(output_file)} vào kho tin")
 
 
 if __name__ == "__main__":
-    process_files(input_dir, output_dir)
+    with FETCHER:  # đóng pool luồng + session khi xong
+        process_files(input_dir, output_dir)
@@ -1,7 +1,6 @@
 import os
 import json
-import requests
-from bs4 import BeautifulSoup
+from article_fetcher import ArticleFetcher, save_articles
 from datetime import datetime
 
 input_dir = "../../dataset/link/gas/"
@@ -9,16 +8,12 @@ output_dir = "../../dataset/data/gas/"
 os.makedirs(output_dir, exist_ok=True)
 
 
-def crawl_page(url):
-    try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-    except Exception as e:
-        print(f"❌ Lỗi khi crawl {url}: {e}")
-        return None
+SOURCE = "gas"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
+FETCHER = ArticleFetcher(timeout=10, encoding=None)
 
-    soup = BeautifulSoup(r.text, "html.parser")
 
+def parse_page(soup):
+    """Trích xuất (title, pub_date, content) từ HTML bài viết"""
     # --- Lấy title ---
     title_tag = soup.select_one("div.edn_articleTitle")
     title = title_tag.get_text(strip=True) if title_tag else ""
@@ -50,10 +45,10 @@ def process_file(input_file, output_file):
         data = json.load(f)
 
     results = []
-    for item in data:
+    print(f"🔎 Crawling {len(data)} bài ...")
+    crawled_all = FETCHER.crawl_many([item.get("url") for item in data], parse_page)
+    for item, crawled in zip(data, crawled_all):
         url = item.get("url")
-        print(f"🔎 Crawling {url} ...")
-        crawled = crawl_page(url)
         if not crawled:
             continue
 
@@ -71,10 +66,9 @@ def process_file(input_file, output_file):
             }
         )
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    save_articles(SOURCE, results, output_file)
 
-    print(f"✅ Đã lưu {len(results)} bài viết vào {output_file}")
+    print(f"✅ Đã lưu {len(results)} bài viết ({SOURCE}) vào kho tin")
 
 
 def main():
@@ -92,4 +86,5 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    with FETCHER:  # đóng pool luồng + session khi xong
+        main()
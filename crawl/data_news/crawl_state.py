@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_state (
+    url           TEXT PRIMARY KEY,
+    status        TEXT NOT NULL,      -- done | http_error | request_error | parse_error
+    http_status   INTEGER,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT,
+    fetched_at    REAL,               -- epoch giây của lần tải gần nhất
+    result        TEXT                -- kết quả parse (JSON), chỉ có khi status = done
+);
+"""
+
+
+def content_hash(text):
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+class CrawlState:
+    """
+    Lưu trạng thái crawl từng URL trong SQLite để chạy lại/tiếp tục không phải tải lại:
+    status, ETag/Last-Modified, hash nội dung, thời điểm tải, kết quả parse.
+    Mỗi bài được commit ngay sau khi tải -> dừng giữa chừng vẫn giữ được tiến độ.
+    Dùng chung 1 kết nối cho nhiều luồng (có khoá).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        d = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(d, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT status, http_status, etag, last_modified, content_hash, "
+                "fetched_at, result FROM crawl_state WHERE url = ?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = [
+            "status",
+            "http_status",
+            "etag",
+            "last_modified",
+            "content_hash",
+            "fetched_at",
+            "result",
+        ]
+        rec = dict(zip(keys, row))
+        rec["result"] = json.loads(rec["result"]) if rec["result"] else None
+        return rec
+
+    def save(
+        self,
+        url,
+        status,
+        http_status=None,
+        etag=None,
+        last_modified=None,
+        hash_=None,
+        result=None,
+    ):
+        payload = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self.lock:
+            if status == "done":
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        url,
+                        status,
+                        http_status,
+                        etag,
+                        last_modified,
+                        hash_,
+                        time.time(),
+                        payload,
+                    ),
+                )
+            else:
+                # lỗi: không xoá kết quả tốt của lần trước (nếu có)
+                self.conn.execute(
+                    "INSERT INTO crawl_state (url, status, http_status, fetched_at) "
+                    "VALUES (?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET "
+                    "status = CASE WHEN crawl_state.result IS NULL "
+                    "THEN excluded.status ELSE crawl_state.status END, "
+                    "http_status = excluded.http_status, fetched_at = excluded.fetched_at",
+                    (url, status, http_status, time.time()),
+                )
+            self.conn.commit()
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Nội dung không đổi (304 / cùng hash): chỉ cập nhật thời điểm + validator."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE crawl_state SET fetched_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+            self.conn.commit()
+
+    def pending(self, urls):
+        """Lọc các URL chưa crawl thành công."""
+        urls = list(urls)
+        with self.lock:
+            done = {
+                r[0]
+                for r in self.conn.execute(
+                    "SELECT url FROM crawl_state WHERE status = 'done'"
+                )
+            }
+        return [u for u in urls if u not in done]
+
+    def stats(self):
+        with self.lock:
+            return dict(
+                self.conn.execute(
+                    "SELECT status, COUNT(*) FROM crawl_state GROUP BY status"
+                ).fetchall()
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -1,12 +1,12 @@
 import json
 import os
-import requests
-from bs4 import BeautifulSoup
-import time
+from article_fetcher import ArticleFetcher, save_articles
 from datetime import datetime
 import logging
 from urllib.parse import urljoin
 
+SOURCE = "vtc"  # tên source trong kho tin gộp (dataset/news_store.sqlite)
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -20,18 +20,15 @@ class VTCCrawler:
         self.input_dir = input_dir
         self.output_dir = output_dir
         self.delay = delay
-        self.session = requests.Session()
-
-        # Set headers to mimic a real browser
-        self.session.headers.update(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "vi-VN,vi;q=0.9,en;q=0.8",
-                "Accept-Encoding": "gzip, deflate, br",
-                "Connection": "keep-alive",
-                "Upgrade-Insecure-Requests": "1",
-            }
+        # Engine tải dùng chung: session keep-alive, retry/backoff, rate limit theo host
+        self.fetcher = ArticleFetcher(
+            max_workers=8,
+            per_host=4,
+            rate_per_host=4.0 / max(delay, 1e-6),
+            timeout=30,
+            retries=3,
+            backoff=delay,
+            encoding=None,
         )
 
         # Create output directory if it doesn't exist
@@ -99,27 +96,12 @@ class VTCCrawler:
 
         return result
 
-    def crawl_url(self, url, max_retries=3):
-        """Crawl a single URL with retry mechanism"""
-        for attempt in range(max_retries):
-            try:
-                response = self.session.get(url, timeout=30)
-                response.raise_for_status()
-
-                # Parse HTML
-                soup = BeautifulSoup(response.content, "html.parser")
-                return self.extract_content(soup)
-
-            except requests.RequestException as e:
-                logging.warning(f"Attempt {attempt + 1} failed for {url}: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(self.delay * (attempt + 1))  # Exponential backoff
-                else:
-                    logging.error(f"Failed to crawl {url} after {max_retries} attempts")
-                    return None
-            except Exception as e:
-                logging.error(f"Unexpected error crawling {url}: {str(e)}")
-                return None
+    def crawl_url(self, url):
+        """Crawl a single URL (retry/backoff do ArticleFetcher đảm nhiệm)"""
+        result = self.fetcher.crawl_one(url, self.extract_content)
+        if result is None:
+            logging.error(f"Failed to crawl {url}")
+        return result
 
     def process_data(self):
         """Process all JSON files and crawl URLs"""
@@ -131,19 +113,15 @@ class VTCCrawler:
         successful_crawls = 0
         failed_crawls = 0
 
-        for i, item in enumerate(json_data, 1):
-            logging.info(
-                f"Processing item {i}/{len(json_data)}: {item.get('url', 'No URL')}"
-            )
+        # Crawl song song toàn bộ URL (kết quả giữ đúng thứ tự json_data)
+        all_content = self.fetcher.crawl_many(
+            [item["url"] for item in json_data], self.extract_content
+        )
 
+        for i, (item, content_data) in enumerate(zip(json_data, all_content), 1):
             # Get current timestamp
             crawl_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            # Crawl the URL
-            # Enable debug for first URL to analyze structure
-            debug_mode = i == 1
-            content_data = self.crawl_url(item["url"], debug=debug_mode)
-
             if content_data:
                 # Create result object
                 result = {
@@ -172,10 +150,6 @@ class VTCCrawler:
                 failed_crawls += 1
                 logging.error(f"Failed to crawl: {item['url']}")
 
-            # Add delay between requests
-            if i < len(json_data):
-                time.sleep(self.delay)
-
         logging.info(
             f"Crawling completed. Success: {successful_crawls}, Failed: {failed_crawls}"
         )
@@ -186,9 +160,8 @@ class VTCCrawler:
         output_path = os.path.join(self.output_dir, filename)
 
         try:
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            logging.info(f"Results saved to: {output_path}")
+            save_articles(SOURCE, data, output_path)
+            logging.info(f"Results saved to news store: {SOURCE}/{filename}")
             return True
         except Exception as e:
             logging.error(f"Error saving results: {str(e)}")
@@ -221,6 +194,8 @@ def main():
         logging.info("Crawling process interrupted by user")
     except Exception as e:
         logging.error(f"Unexpected error: {str(e)}")
+    finally:
+        crawler.fetcher.close()  # đóng pool luồng + session
 
 
 if __name__ == "__main__":
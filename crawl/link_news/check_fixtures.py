@@ -0,0 +1,76 @@
+"""
+Chạy các crawler danh sách (HTTP) trên HTML mẫu trong fixtures/<site>/ qua serve_fixtures
+rồi so link trích được với fixtures/<site>/expected.json ('{root}' = địa chỉ server mẫu).
+Không cần mạng; output/log/kho tin ghi vào thư mục tạm.
+    cd crawl/link_news && python check_fixtures.py
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+TMP = tempfile.mkdtemp(prefix="link_fixtures_")
+os.environ.setdefault("NEWS_STORE_DB", os.path.join(TMP, "news_store.sqlite"))
+
+from listing_crawler import serve_fixtures  # noqa: E402
+from crawl_st8 import ST8Crawler  # noqa: E402
+from crawl_fpt_online import FPTOnlineCrawler  # noqa: E402
+from crawl_cmc_corporation import CMCCrawler  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# site -> (lớp crawler, base_url tương đối với server mẫu, thuộc tính URL khác cần trỏ về)
+SITES = {
+    "st8": (ST8Crawler, "/truyen-thong/tin-tuc-su-kien", {}),
+    "fpt_online": (FPTOnlineCrawler, "/tin-tuc/page/", {}),
+    "cmc": (CMCCrawler, "/insight/tin-tuc/p", {"language_url": "/language/vi"}),
+}
+
+
+def check_site(site):
+    cls, base, extra = SITES[site]
+    fixture_dir = os.path.join(HERE, "fixtures", site)
+    server, root = serve_fixtures(fixture_dir)
+    try:
+        out_dir = os.path.join(TMP, site)
+        crawler = cls(
+            base_url=root + base,
+            output_dir=out_dir,
+            log_file=os.path.join(TMP, f"{site}.log"),
+        )
+        for attr, path in extra.items():
+            setattr(crawler, attr, root + path)
+        got = crawler.crawl_all_pages()
+        crawler.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    with open(os.path.join(fixture_dir, "expected.json"), encoding="utf-8") as f:
+        expected = [
+            {"title": e["title"], "url": e["url"].replace("{root}", root)}
+            for e in json.load(f)
+        ]
+    problems = []
+    if got != expected:
+        problems.append(f"link trích được khác expected.json:\n  got={got}")
+    saved = os.path.join(out_dir, f"{cls.prefix}_all_articles.json")
+    if expected and not os.path.exists(saved):
+        problems.append(f"thiếu file {os.path.basename(saved)}")
+    return problems
+
+
+def main(sites=None):
+    failed = 0
+    for site in sites or SITES:
+        problems = check_site(site)
+        print(f"{'✅' if not problems else '❌'} {site}")
+        for p in problems:
+            print(f"   {p}")
+        failed += bool(problems)
+    return failed
+
+
+if __name__ == "__main__":
+    sys.exit(1 if main(sys.argv[1:]) else 0)
@@ -0,0 +1,439 @@
+import os
+import sys
+import json
+import queue
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# Dùng lại session pool + token bucket của crawler bài viết (crawl/data_news).
+# append (không insert) để crawl_*.py cùng tên bên data_news không che mất file ở đây.
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_news")
+)
+from article_fetcher import RateLimiter, make_session, save_records  # noqa: E402
+
+
+class BrowserPool:
+    """
+    Pool headless Chrome dùng lại giữa các trang (không khởi động lại định kỳ).
+    Chỉ dùng cho trang cần JavaScript. Chờ bằng điều kiện tường minh (CSS selector
+    xuất hiện) thay vì time.sleep cố định; driver lỗi session thì bỏ và tạo driver mới.
+    """
+
+    def __init__(self, size=1, page_load_timeout=30, wait_timeout=15, user_agent=None):
+        self.size = max(1, size)
+        self.page_load_timeout = page_load_timeout
+        self.wait_timeout = wait_timeout
+        self.user_agent = user_agent or (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+        )
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._all = []
+
+    def _new_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+
+        opts = Options()
+        for arg in [
+            "--headless=new",
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-gpu",
+            "--disable-extensions",
+            "--window-size=1366,900",
+            f"--user-agent={self.user_agent}",
+        ]:
+            opts.add_argument(arg)
+        opts.add_experimental_option(
+            "prefs",
+            {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.media_stream": 2,
+            },
+        )
+        opts.page_load_strategy = "eager"  # không chờ ảnh/quảng cáo, chỉ cần DOM
+        driver = webdriver.Chrome(options=opts)
+        driver.set_page_load_timeout(self.page_load_timeout)
+        with self._lock:
+            self._all.append(driver)
+        return driver
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_create = self._created < self.size
+            if can_create:
+                self._created += 1
+        if can_create:
+            return self._new_driver()
+        return self._idle.get()
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+            self._created -= 1
+
+    def get_html(self, url, wait_css=None, retries=2):
+        """Mở url, chờ tới khi wait_css xuất hiện (hoặc hết wait_timeout) rồi trả page_source."""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        for attempt in range(retries + 1):
+            driver = self._acquire()
+            try:
+                driver.get(url)
+                if wait_css:
+                    try:
+                        WebDriverWait(driver, self.wait_timeout).until(
+                            EC.presence_of_element_located((By.CSS_SELECTOR, wait_css))
+                        )
+                    except TimeoutException:
+                        pass  # trang rỗng/hết dữ liệu -> parse ra 0 bài
+                html = driver.page_source
+                self._idle.put(driver)
+                return html
+            except WebDriverException as e:
+                logging.getLogger(__name__).warning(
+                    f"Lỗi WebDriver ({url}), lần {attempt + 1}: {e}"
+                )
+                self._discard(driver)
+        return None
+
+    def close(self):
+        with self._lock:
+            drivers, self._all = self._all, []
+            self._created = 0
+        for d in drivers:
+            try:
+                d.quit()
+            except Exception:
+                pass
+        self._idle = queue.Queue()
+
+
+class ListingCrawler:
+    """
+    Khung crawl trang danh sách bài viết (link_news).
+    Lớp con chỉ khai báo cấu hình + parse_listing(soup, page_url) -> [{"title", "url"}]:
+      - render="http": tải HTML bằng requests (session keep-alive, retry, rate limit),
+        nhiều trang song song; dùng cho site render phía server
+      - render="browser": qua BrowserPool (Chrome dùng lại, chờ wait_css)
+    base_url/output_dir truyền vào được để chạy trên HTML mẫu (serve_fixtures).
+    Output giữ định dạng cũ: {prefix}_page_{n}.json và {prefix}_all_articles.json.
+    """
+
+    name = "listing"
+    prefix = "listing"
+    base_url = ""
+    output_dir = "../dataset/link/listing"
+    render = "http"
+    wait_css = None
+    max_empty = 1  # số trang rỗng liên tiếp thì coi là hết dữ liệu
+    min_title_len = 5
+
+    def __init__(
+        self,
+        base_url=None,
+        output_dir=None,
+        render=None,
+        max_workers=6,
+        rate=4.0,
+        timeout=20,
+        retries=3,
+        verify=True,
+        browser_pool=None,
+        log_file=None,
+    ):
+        if base_url is not None:
+            self.base_url = base_url
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if render is not None:
+            self.render = render
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.limiter = RateLimiter(rate, burst=max_workers)
+        self._session_args = dict(pool_size=max_workers, retries=retries, verify=verify)
+        self._local = threading.local()
+        self._pool = browser_pool
+        self._own_pool = browser_pool is None
+        self.setup_logging(log_file or f"{self.prefix}_crawler.log")
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def setup_logging(self, log_file):
+        """Thiết lập logging để theo dõi quá trình crawl"""
+        logging.basicConfig(
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+            handlers=[logging.FileHandler(log_file), logging.StreamHandler()],
+        )
+        self.logger = logging.getLogger(self.name)
+
+    # ---------- cấu hình từng site (override) ----------
+    def page_url(self, page_num):
+        return f"{self.base_url}{page_num}"
+
+    def parse_listing(self, soup, page_url):
+        raise NotImplementedError
+
+    def prepare_session(self, session):
+        """Hook: thiết lập session trước khi crawl (cookie ngôn ngữ, ...)."""
+
+    # ---------- tải trang ----------
+    def _session(self):
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = make_session(**self._session_args)
+            self.prepare_session(s)
+        return s
+
+    def browser(self):
+        if self._pool is None:
+            self._pool = BrowserPool(size=min(self.max_workers, 2))
+        return self._pool
+
+    def fetch_html(self, url):
+        if self.render == "browser":
+            return self.browser().get_html(url, wait_css=self.wait_css)
+        self.limiter.acquire()
+        try:
+            r = self._session().get(url, timeout=self.timeout)
+        except Exception as e:
+            self.logger.error(f"Lỗi request {url}: {e}")
+            return None
+        if r.status_code != 200:
+            self.logger.warning(f"HTTP {r.status_code}: {url}")
+            return None
+        if not r.encoding or r.encoding.lower() == "iso-8859-1":
+            r.encoding = "utf-8"  # header không khai báo charset
+        return r.text
+
+    def extract_data_from_page(self, page_num):
+        """Tải + parse 1 trang danh sách -> list bài (đã bỏ trùng URL, title quá ngắn)."""
+        url = self.page_url(page_num)
+        html = self.fetch_html(url)
+        if not html:
+            return []
+        try:
+            items = self.parse_listing(BeautifulSoup(html, "html.parser"), url)
+        except Exception as e:
+            self.logger.error(f"Lỗi khi trích xuất dữ liệu từ trang {page_num}: {e}")
+            return []
+
+        articles, seen = [], set()
+        for it in items:
+            title = (it.get("title") or "").strip()
+            link = (it.get("url") or "").strip()
+            if not link or link in seen or len(title) < self.min_title_len:
+                continue
+            seen.add(link)
+            articles.append({"title": title, "url": link})
+        self.logger.info(f"Trang {page_num}: {len(articles)} bài viết")
+        return articles
+
+    # ---------- lưu ----------
+    def save_page_data(self, articles, page_num):
+        """Lưu dữ liệu của một trang vào file JSON"""
+        if not articles:
+            return
+        filepath = os.path.join(self.output_dir, f"{self.prefix}_page_{page_num}.json")
+        crawl_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data = [
+            {
+                "id": f"page_{page_num}_{idx}",
+                "title": a["title"],
+                "url": a["url"],
+                "crawl_date": crawl_date,
+            }
+            for idx, a in enumerate(articles, 1)
+        ]
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        # kho tin gộp: source = tên thư mục link (cmc_corporation, vtc, ...)
+        source = os.path.basename(os.path.normpath(self.output_dir))
+        save_records("link", source, data, page=os.path.basename(filepath))
+
+    def save_all_data(self, all_articles):
+        """Lưu tất cả dữ liệu vào một file tổng hợp"""
+        if not all_articles:
+            return
+        filepath = os.path.join(self.output_dir, f"{self.prefix}_all_articles.json")
+        crawl_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        data = [
+            {"id": idx, "title": a["title"], "url": a["url"], "crawl_date": crawl_date}
+            for idx, a in enumerate(all_articles, 1)
+        ]
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.logger.info(f"Đã lưu tổng cộng {len(data)} bài viết vào {filepath}")
+
+    # ---------- crawl ----------
+    def _workers(self):
+        if self.render == "browser":
+            return self.browser().size
+        return self.max_workers
+
+    def crawl_pages(self, page_nums, save=True):
+        """Crawl song song các trang cho trước; trả về {page: articles}."""
+        page_nums = list(page_nums)
+        with ThreadPoolExecutor(max_workers=self._workers()) as ex:
+            results = dict(
+                zip(page_nums, ex.map(self.extract_data_from_page, page_nums))
+            )
+        if save:
+            for p in page_nums:
+                self.save_page_data(results[p], p)
+        return results
+
+    def crawl_pages_range(self, start_page, end_page):
+        """Crawl các trang trong khoảng từ start_page đến end_page"""
+        if start_page < 1 or end_page < start_page:
+            self.logger.error(
+                "Số trang không hợp lệ. start_page phải >= 1 và end_page >= start_page"
+            )
+            return []
+        results = self.crawl_pages(range(start_page, end_page + 1))
+        all_articles = [a for p in sorted(results) for a in results[p]]
+        self.save_all_data(all_articles)
+        self.logger.info(f"Hoàn thành crawl! Tổng cộng {len(all_articles)} bài viết")
+        return all_articles
+
+    def crawl_single_page(self, page_num):
+        return self.crawl_pages_range(page_num, page_num)
+
+    def crawl_all_pages(self, start_page=1, max_pages=None):
+        """
+        Crawl tới khi gặp max_empty trang rỗng liên tiếp (hoặc trang lặp lại y hệt
+        trang trước - site trả trang 1 cho số trang vượt quá). Mỗi đợt tải song song
+        _workers() trang; điều kiện dừng xét theo thứ tự trang.
+        """
+        all_articles = []
+        page, empty, prev_urls = start_page, 0, None
+        last_ok = start_page - 1
+        step = self._workers()
+        done = False
+        while not done:
+            last = page + step - 1
+            if max_pages is not None:
+                last = min(last, start_page + max_pages - 1)
+            if last < page:
+                break
+            results = self.crawl_pages(range(page, last + 1), save=False)
+            for p in range(page, last + 1):
+                urls = [a["url"] for a in results[p]]
+                if urls and urls == prev_urls:
+                    self.logger.info(f"Trang {p} lặp lại trang trước -> hết dữ liệu.")
+                    done = True
+                    break
+                if urls:
+                    empty, prev_urls, last_ok = 0, urls, p
+                    self.save_page_data(results[p], p)
+                    all_articles.extend(results[p])
+                    continue
+                empty += 1
+                if empty >= self.max_empty:
+                    self.logger.info(
+                        f"Đã crawl xong. {empty} trang liên tiếp không có dữ liệu (trang {p})."
+                    )
+                    done = True
+                    break
+            page = last + 1
+        self.save_all_data(all_articles)
+        self.logger.info(
+            f"Hoàn thành crawl! Tổng cộng {len(all_articles)} bài viết từ "
+            f"{last_ok - start_page + 1} trang"
+        )
+        return all_articles
+
+    def close(self):
+        if self._pool is not None and self._own_pool:
+            self._pool.close()
+
+
+def absolute_url(href, page_url):
+    """Chuẩn hoá link tương đối theo URL trang danh sách."""
+    return urljoin(page_url, (href or "").strip())
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """Query string thành 1 phần tên file: /list?page=2 -> file 'list@page=2'."""
+
+    def translate_path(self, path):
+        path, _, query = path.partition("?")
+        path = super().translate_path(path.split("#", 1)[0])
+        return f"{path}@{query}" if query else path
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_fixtures(directory, port=0):
+    """
+    Chạy http.server (luồng nền) phục vụ thư mục HTML đã lưu để chạy crawler offline
+    (trang có query lưu thành '<đường dẫn>@<query>', xem fixtures/ + check_fixtures.py):
+        server, root = serve_fixtures("fixtures/vtc")
+        VTCCrawler(base_url=root + "/page-", output_dir="/tmp/vtc").crawl_all_pages()
+        server.shutdown()
+    """
+    handler = partial(_QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def run_interactive(crawler, title):
+    """Menu dòng lệnh chung (giữ cách dùng cũ của các script crawl_*.py)."""
+    print(f"=== {title} ===")
+    print("Chọn chế độ crawl:")
+    print("1. Crawl tất cả trang (từ đầu đến cuối)")
+    print("2. Crawl theo khoảng trang (chọn trang bắt đầu và kết thúc)")
+    try:
+        while True:
+            try:
+                choice = int(input("\nNhập lựa chọn (1 hoặc 2): "))
+                if choice in [1, 2]:
+                    break
+                print("Vui lòng nhập 1 hoặc 2")
+            except ValueError:
+                print("Vui lòng nhập số hợp lệ")
+
+        if choice == 1:
+            print("\n🚀 Bắt đầu crawl tất cả trang...")
+            crawler.crawl_all_pages()
+        else:
+            while True:
+                try:
+                    start_page = int(input("Nhập trang bắt đầu: "))
+                    end_page = int(input("Nhập trang kết thúc: "))
+                    if 1 <= start_page <= end_page:
+                        break
+                    print("Cần 1 <= trang bắt đầu <= trang kết thúc")
+                except ValueError:
+                    print("Vui lòng nhập số hợp lệ")
+            print(f"\n🚀 Bắt đầu crawl từ trang {start_page} đến trang {end_page}...")
+            crawler.crawl_pages_range(start_page, end_page)
+    except KeyboardInterrupt:
+        crawler.logger.info("Crawl bị dừng bởi người dùng")
+    finally:
+        crawler.close()
@@ -0,0 +1,32 @@
+# crawl/rate_limit.py
+"""Token bucket dùng chung cho các crawler (tin tức, giá cổ phiếu) - chỉ cần thư viện chuẩn."""
+
+import time
+import threading
+
+
+class RateLimiter:
+    """Token bucket: tối đa `rate` request/giây, cho phép dồn `burst` request."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
@@ -3,9 +3,8 @@ from __future__ import annotations
 import argparse
 import subprocess
 import sys
-import os
+import time
 from pathlib import Path
-import importlib
 import os, warnings
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -19,6 +18,13 @@ DATASET_DIR = BASE_DIR / "dataset"
 STOCK_DIR = DATASET_DIR / "stock"
 DATA_CSV = DATASET_DIR / "data.csv"  # sau bước 1
 JSON_PATH = DATASET_DIR / "daily_scores_vi.json"  # sau bước 5
+SENT_STORE = DATASET_DIR / "daily_scores_by_symbol.csv"  # sau bước 5 (theo từng mã)
+NEWS_STORE = DATASET_DIR / "news_store.sqlite"  # kho tin gộp (crawler ghi, bước 2 đọc)
+NEWS_CSV = DATASET_DIR / "merged_news_clean.csv"  # sau bước 2
+SENTENCES_CSV = DATASET_DIR / "sentences_clean.csv"  # sau bước 4 (tách câu)
+SENTENCES_DEDUP_CSV = DATASET_DIR / "sentences_dedup.csv"  # sau bước 4 (dedup)
+PIPELINE_STATE = DATASET_DIR / ".pipeline_state.json"  # hash input của từng bước
+RUN_REPORT = DATASET_DIR / "run_report"  # .json + .csv: thời gian/bộ nhớ/rows từng bước
 PREPROCESSED_CSV = (
     DATASET_DIR / "preprocessed_data.csv"
 )  # sau bước 3 (+ ghép news nếu code bạn làm ở bước này)
@@ -30,6 +36,9 @@ CHART_DIR = BASE_DIR / "charts_backtest_forecast"  # output của evaluation (n
 if str(SRC_DIR) not in sys.path:
     sys.path.insert(0, str(SRC_DIR))
 
+from instrument import RECORDER  # noqa: E402
+from pipeline import Pipeline, Step  # noqa: E402
+
 
 # ================== TIỆN ÍCH CHUNG ==================
 def run_py(path: Path, args: list[str] | None = None, env: dict | None = None):
@@ -41,147 +50,276 @@ def run_py(path: Path, args: list[str] | None = None, env: dict | None = None):
     subprocess.run(cmd, check=True, env={**os.environ, **(env or {})})
 
 
-def try_import_attr(module_name: str, attr: str):
-    """Import attr (hàm) từ module; trả None nếu không có."""
-    try:
-        mod = importlib.import_module(module_name)
-        return getattr(mod, attr)
-    except Exception:
-        return None
+# ================== CÁC BƯỚC PIPELINE (DAG) ==================
+# Mỗi bước chạy trong process hiện tại, nhận/trả DataFrame qua ctx (xem src/pipeline.py).
+# Bước có input (file dữ liệu + file code) và tham số không đổi, output còn đủ -> bỏ qua.
+#
+#   1 load_stock ───────────────────────────────┐
+#   2 load_news -> 4 pre_news -> 5 sentiment ───┴─> 3 pre_stock -> 6 training -> 7 evaluation
+#                                                                              └─> 6b export_infer
+#   (--runtime export|numpy|auto: 7 chờ thêm 6b)
+def step_1_load_stock(args):
+    """1) Gộp CSV chứng khoán -> data.csv (gộp tăng dần theo manifest)"""
+    from load_stock import merge_stock_csvs
+
+    out = merge_stock_csvs(args.stock_dir, args.out_csv)
+    print(f"    ✓ Đã gộp -> {out}")
+
+
+def step_2_load_news(args):
+    """2) Đọc kho tin gộp (migrate 1 lần từ JSON cũ nếu chưa có) -> merged_news_clean.csv"""
+    from load_news import load_clean_news
+    from news_store import NewsStore, ensure_migrated
+
+    # theo dấu trong store, không theo việc file tồn tại (crawler có thể đã tạo file)
+    store = NewsStore(str(NEWS_STORE))
+    ensure_migrated(store, str(DATASET_DIR / "link_news"), "link")
+    ensure_migrated(store, str(DATASET_DIR / "data_news"), "article")
+    store.close()
+    news = load_clean_news(str(DATASET_DIR / "data_news"), store_path=str(NEWS_STORE))
+    news.to_csv(NEWS_CSV, index=False, encoding="utf-8")
+    print(f"    ✓ {len(news):,} bài -> {NEWS_CSV}")
+    return {"news": news}
+
+
+def step_4_pre_news(ctx):
+    """4) Tách câu + gắn canonical_id cho bài/câu trùng"""
+    from pre_news import build_sentences
+    from dedup_news import dedup_report, dedup_sentences_df
+
+    df_sent = build_sentences(ctx.get("news"))
+    df_sent.to_csv(SENTENCES_CSV, index=False, encoding="utf-8")
+    df_sent = df_sent.dropna(subset=["article_id", "cau"]).copy()
+    df_dedup = dedup_sentences_df(df_sent)
+    df_dedup.to_csv(SENTENCES_DEDUP_CSV, index=False, encoding="utf-8")
+    print(f"    ✓ Thống kê trùng lặp: {dedup_report(df_dedup)}")
+    return {"sentences": df_dedup}
+
+
+def step_5_model_sentiment(args, ctx):
+    """5) Chấm sentiment (PhoBERT) -> daily_scores_vi.json + bảng theo (mã, ngày)"""
+    from model_sentiment import run_sentiment
+
+    _, _, sym_daily = run_sentiment(
+        ctx.get("sentences"), args.json, args.sentiment_store
+    )
+    print(f"    ✓ Sentiment -> {args.json}, {args.sentiment_store}")
+    return {"sentiment_store": sym_daily}
+
+
+def step_3_pre_stock(args, ctx, with_sentiment: bool):
+    """3) Tiền xử lý giá + ghép sentiment (sau bước 5 nếu bước 5 nằm trong DAG)"""
+    from pre_stock import preprocess_data
+
+    out_df = preprocess_data(
+        input_path=args.out_csv,
+        json_path=args.json,
+        start_date=args.start_date,
+        output_path=args.preprocessed_csv,
+        sentiment_store=(
+            ctx.get("sentiment_store") if with_sentiment else args.sentiment_store
+        ),
+    )
+    print(f"    ✓ Dòng sau làm sạch: {len(out_df):,} -> {args.preprocessed_csv}")
+    return {"preprocessed": out_df}
 
 
-# ================== CÁC BƯỚC PIPELINE ==================
-def step_1_load_stock(stock_dir: Path, out_csv: Path):
-    """1) Gộp CSV chứng khoán -> data.csv"""
-    func = try_import_attr("load_stock", "merge_stock_csvs")
-    if func is not None:
-        print("==> [1/7] load_stock.merge_stock_csvs()")
-        out = func(stock_dir, out_csv)
-        print(f"    ✓ Đã gộp -> {out}")
-    else:
-        print("==> [1/7] Chạy src/load_stock.py (fallback)")
-        run_py(
-            SRC_DIR / "load_stock.py",
-            args=[
-                "--stock-dir",
-                str(stock_dir),
-                "--out-csv",
-                str(out_csv),
-            ],
-        )
+def step_6_model_training(args):
+    """6) Huấn luyện mô hình dự báo (VAE) -> best_model (script riêng, chạy lâu)"""
+    args.best_dir.mkdir(parents=True, exist_ok=True)
+    run_py(SRC_DIR / "model_training.py")
 
 
-def step_2_load_news():
-    """2) Tải/ghép news thô (nếu có)"""
-    path = SRC_DIR / "load_news.py"
-    if path.exists():
-        print("==> [2/7] Chạy src/load_news.py")
-        run_py(path)
-    else:
-        print("==> [2/7] Bỏ qua (không có src/load_news.py)")
-
-
-def step_3_pre_stock(input_csv: Path, json_path: Path, start_date: str, out_csv: Path):
-    """3) Tiền xử lý dữ liệu giá (và ghép JSON nếu logic của bạn thực hiện ở đây)"""
-    func = try_import_attr("pre_stock", "preprocess_data")
-    if func is not None:
-        print("==> [3/7] pre_stock.preprocess_data()")
-        out_df = func(
-            input_path=input_csv,
-            json_path=json_path,
-            start_date=start_date,
-            output_path=out_csv,
-        )
-        print(f"    ✓ Dòng sau làm sạch: {len(out_df):,}")
-        print(f"    ✓ Lưu -> {out_csv}")
-    else:
-        print("==> [3/7] Chạy src/pre_stock.py (fallback)")
-        run_py(SRC_DIR / "pre_stock.py")
+def step_6_export_infer(args):
+    """6b) Xuất model chỉ-suy-luận (tf.function + vae_numpy.npz + x_scaler.npz) + parity"""
+    from infer_export import export_inference
 
+    export_inference(args.best_dir, xla=args.xla)
 
-def step_4_pre_news():
-    """4) Tiền xử lý news thô (nếu có)"""
-    path = SRC_DIR / "pre_news.py"
-    if path.exists():
-        print("==> [4/7] Chạy src/pre_news.py")
-        run_py(path)
-    else:
-        print("==> [4/7] Bỏ qua (không có src/pre_news.py)")
 
+def step_7_evaluation(args, ctx):
+    """7) Đánh giá & vẽ biểu đồ (+ so sánh với các model khác nếu có --compare-models)"""
+    from evaluation import run_evaluation_and_save, save_model_comparison
 
-def step_5_model_sentiment(enable: bool, out_json: Path):
-    """5) Huấn luyện mô hình sentiment -> daily_scores_vi.json (có thể skip vì lâu)"""
-    if not enable:
-        print("==> [5/7] Bỏ qua model_sentiment (đặt --skip-sentiment).")
-        return
-
-    path = SRC_DIR / "model_sentiment.py"
-    if path.exists():
-        print("==> [5/7] Chạy src/model_sentiment.py")
-        # nếu script của bạn hỗ trợ tham số đầu ra, thêm args vào đây
-        run_py(path)
-        # đảm bảo file json tồn tại sau khi chạy
-        if not out_json.exists():
-            print(f"    ⚠️  Không thấy {out_json}. Hãy kiểm tra model_sentiment.py.")
-        else:
-            print(f"    ✓ Sentiment JSON -> {out_json}")
-    else:
-        print("==> [5/7] Bỏ qua (không có src/model_sentiment.py)")
-
-
-def step_6_model_training(best_dir: Path, data_csv: Path):
-    """6) Huấn luyện mô hình dự báo (VAE) -> lưu best_model"""
-    path = SRC_DIR / "model_training.py"
-    if path.exists():
-        print("==> [6/7] Chạy src/model_training.py")
-        best_dir.mkdir(parents=True, exist_ok=True)
-        # Nếu script hỗ trợ tham số, bạn có thể thêm ở đây.
-        # Ví dụ: --data & --best-dir. Nếu chưa hỗ trợ, script sẽ dùng đường dẫn mặc định bên trong.
-        try:
-            run_py(
-                path,
-                args=[
-                    "--data",
-                    str(data_csv),
-                    "--best-dir",
-                    str(best_dir),
-                ],
-            )
-        except subprocess.CalledProcessError:
-            # fallback: chạy không tham số
-            print(
-                "    ⚠️  model_training.py không chấp nhận args --data/--best-dir; chạy không đối số..."
-            )
-            run_py(path)
-    else:
-        print("==> [6/7] Bỏ qua (không có src/model_training.py)")
-
-
-def step_7_evaluation(best_dir: Path, data_csv: Path, chart_dir: Path):
-    """7) Đánh giá & vẽ biểu đồ"""
-    path = SRC_DIR / "evaluation.py"
-    if path.exists():
-        print("==> [7/7] Chạy src/evaluation.py")
-        chart_dir.mkdir(parents=True, exist_ok=True)
-        # Nhiều bạn hardcode BEST_DIR trong evaluation.py.
-        # Nếu evaluation.py hỗ trợ args, truyền vào; nếu không, script sẽ dùng mặc định của nó.
-        try:
-            run_py(
-                path,
-                args=[
-                    "--best-dir",
-                    str(best_dir),
-                    "--data",
-                    str(data_csv),
-                    "--out-dir",
-                    str(chart_dir),
-                ],
+    args.chart_dir.mkdir(parents=True, exist_ok=True)
+    run_evaluation_and_save(
+        df_raw=ctx.get("preprocessed"),
+        best_dir=str(args.best_dir),
+        save_dir=str(args.chart_dir),
+        rolling_eval=args.rolling_eval,
+        rolling_stride=args.rolling_stride,
+        runtime=args.runtime,
+        mc_samples=args.mc_samples,
+        seed=args.seed,
+        plots=not args.no_plots,
+        plot_workers=args.plot_workers,
+        workers=args.eval_workers,
+        threads=args.eval_threads,
+    )
+    if args.compare_models:
+        save_model_comparison(
+            ctx.get("preprocessed"),
+            [str(args.best_dir), *map(str, args.compare_models)],
+            save_dir=str(args.chart_dir),
+            runtime=args.runtime,
+        )
+
+
+def _read_csv(path: Path):
+    import pandas as pd
+
+    return pd.read_csv(path, encoding="utf-8")
+
+
+def _read_preprocessed(path: Path):
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    df["time"] = pd.to_datetime(df["time"])
+    return df
+
+
+def model_files(best_dir: Path):
+    """File model mà đánh giá đọc (không lấy cả thư mục: cache do evaluation/web ghi vào đó)."""
+    best_dir = Path(best_dir)
+    return [
+        best_dir / "config.json",
+        best_dir / "x_scaler.pkl",
+        best_dir / "best_vae.keras",
+        best_dir / "final_vae.keras",  # dự phòng khi chưa có best_vae.keras
+    ]
+
+
+def infer_files(best_dir: Path):
+    """Artifact suy luận do bước 6b ghi (runtime export/numpy/auto đọc các file này)."""
+    best_dir = Path(best_dir)
+    return [
+        best_dir / "infer_model",
+        best_dir / "vae_numpy.npz",
+        best_dir / "x_scaler.npz",
+    ]
+
+
+def build_pipeline(args) -> Pipeline:
+    """Khai báo 7 bước: input/output/phụ thuộc; bước 5 bỏ khỏi DAG khi --skip-sentiment."""
+    with_sentiment = not args.skip_sentiment
+    src = lambda *names: [SRC_DIR / n for n in names]  # noqa: E731
+
+    steps = [
+        Step(
+            "1",
+            lambda ctx: step_1_load_stock(args),
+            inputs=[args.stock_dir, *src("load_stock.py")],
+            outputs=[args.out_csv],
+            title="1/7 load_stock",
+        ),
+        Step(
+            "2",
+            lambda ctx: step_2_load_news(args),
+            inputs=[NEWS_STORE, *src("load_news.py", "news_store.py")],
+            outputs=[NEWS_CSV],
+            title="2/7 load_news",
+        ),
+        Step(
+            "4",
+            step_4_pre_news,
+            inputs=[NEWS_CSV, *src("pre_news.py", "dedup_news.py")],
+            outputs=[SENTENCES_CSV, SENTENCES_DEDUP_CSV],
+            deps=["2"],
+            title="4/7 pre_news",
+        ),
+        Step(
+            "3",
+            lambda ctx: step_3_pre_stock(args, ctx, with_sentiment),
+            inputs=[
+                args.out_csv,
+                args.json,
+                args.sentiment_store,
+                *src("pre_stock.py"),
+            ],
+            outputs=[args.preprocessed_csv],
+            deps=["1", "5"] if with_sentiment else ["1"],
+            params={"start_date": args.start_date},
+            title="3/7 pre_stock",
+        ),
+        Step(
+            "6",
+            lambda ctx: step_6_model_training(args),
+            inputs=[args.preprocessed_csv, *src("model_training.py")],
+            outputs=[args.best_dir / "best_vae.keras"],
+            deps=["3"],
+            title="6/7 model_training",
+        ),
+        Step(
+            "6b",
+            lambda ctx: step_6_export_infer(args),
+            inputs=[
+                args.best_dir / "best_vae.keras",
+                args.best_dir / "x_scaler.pkl",
+                *src("infer_export.py", "np_runtime.py", "features.py"),
+            ],
+            outputs=infer_files(args.best_dir),
+            deps=["6"],
+            params={"xla": args.xla},
+            title="6/7 export_infer",
+        ),
+        Step(
+            "7",
+            lambda ctx: step_7_evaluation(args, ctx),
+            inputs=[
+                args.preprocessed_csv,
+                *model_files(args.best_dir),
+                # runtime khác keras đọc artifact của 6b -> phải chờ 6b ghi xong
+                *(infer_files(args.best_dir) if args.runtime != "keras" else []),
+                *(f for d in args.compare_models for f in model_files(d)),
+                *src(
+                    "evaluation.py",
+                    "model_training.py",
+                    "metrics_and_backtest.py",
+                    "charts.py",
+                    "parallel_eval.py",
+                ),
+            ],
+            outputs=[args.chart_dir / "metrics_backtest_all_symbols.csv"],
+            deps=["3", "6", "6b"] if args.runtime != "keras" else ["3", "6"],
+            params={
+                "rolling_stride": args.rolling_stride if args.rolling_eval else 0,
+                "runtime": args.runtime,
+                "mc_samples": args.mc_samples,
+                "seed": args.seed,
+                "plots": not args.no_plots,
+                "compare_models": [str(d) for d in args.compare_models],
+            },
+            title="7/7 evaluation",
+        ),
+    ]
+    if with_sentiment:
+        steps.append(
+            Step(
+                "5",
+                lambda ctx: step_5_model_sentiment(args, ctx),
+                inputs=[SENTENCES_DEDUP_CSV, *src("model_sentiment.py")],
+                outputs=[args.json, args.sentiment_store],
+                deps=["4"],
+                title="5/7 model_sentiment",
             )
-        except subprocess.CalledProcessError:
-            print("    ⚠️  evaluation.py không chấp nhận args; chạy không đối số...")
-            run_py(path)
+        )
     else:
-        print("==> [7/7] Bỏ qua (không có src/evaluation.py)")
+        print("==> [5/7] Bỏ qua model_sentiment (đặt --skip-sentiment).")
+
+    pipe = Pipeline(
+        steps,
+        PIPELINE_STATE,
+        max_workers=args.workers,
+        profile_dir=args.profile_dir,
+        profiler=args.profiler,
+    )
+    # bước trước được cache / không nằm trong --only -> đọc artifact từ file
+    pipe.ctx.loader("news", lambda: _read_csv(NEWS_CSV))
+    pipe.ctx.loader("sentences", lambda: _read_csv(SENTENCES_DEDUP_CSV))
+    pipe.ctx.loader("sentiment_store", lambda: args.sentiment_store)
+    pipe.ctx.loader("preprocessed", lambda: _read_preprocessed(args.preprocessed_csv))
+    return pipe
 
 
 # ================== CLI & MAIN ==================
@@ -194,6 +332,12 @@ def build_parser() -> argparse.ArgumentParser:
         "--out-csv", type=Path, default=DATA_CSV, help="File CSV hợp nhất sau bước 1"
     )
     p.add_argument("--json", type=Path, default=JSON_PATH, help="File JSON sentiment")
+    p.add_argument(
+        "--sentiment-store",
+        type=Path,
+        default=SENT_STORE,
+        help="Bảng sentiment theo (symbol, ngày); nếu chưa có thì dùng --json",
+    )
     p.add_argument(
         "--start-date", type=str, default="2020-01-01", help="Lọc từ ngày này"
     )
@@ -213,6 +357,73 @@ def build_parser() -> argparse.ArgumentParser:
         help="Thư mục lưu biểu đồ evaluation",
     )
 
+    p.add_argument(
+        "--rolling-eval",
+        action="store_true",
+        help="Bước 7: thêm backtest rolling-origin (mọi origin) -> metrics_rolling_*.csv",
+    )
+    p.add_argument(
+        "--rolling-stride",
+        type=int,
+        default=1,
+        help="Khoảng cách (ngày) giữa các origin khi --rolling-eval",
+    )
+
+    p.add_argument(
+        "--runtime",
+        choices=["keras", "export", "numpy", "auto"],
+        default="keras",
+        help="Bước 7: runtime chạy model (export/numpy cần bước 6b)",
+    )
+    p.add_argument(
+        "--mc-samples",
+        type=int,
+        default=200,
+        help="Bước 7: số mẫu latent cho dải phân vị forecast (0 = tắt)",
+    )
+    p.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Bước 7: seed lấy mẫu Monte Carlo của dải phân vị (kết quả tái lập được)",
+    )
+    p.add_argument(
+        "--no-plots",
+        action="store_true",
+        help="Bước 7: chỉ tính metric, không vẽ biểu đồ",
+    )
+    p.add_argument(
+        "--plot-workers",
+        type=int,
+        default=None,
+        help="Bước 7: số process vẽ biểu đồ song song (mặc định tự chọn, 0 = tuần tự)",
+    )
+    p.add_argument(
+        "--compare-models",
+        type=Path,
+        nargs="+",
+        default=[],
+        help="Bước 7: so sánh --best-dir với các thư mục model này trên cùng cửa sổ "
+        "backtest -> compare_*.csv",
+    )
+    p.add_argument(
+        "--eval-workers",
+        type=int,
+        default=0,
+        help="Bước 7: số process backtest/forecast song song theo mã (0 = tuần tự)",
+    )
+    p.add_argument(
+        "--eval-threads",
+        type=int,
+        default=None,
+        help="Bước 7: tổng số luồng tính cho mọi process đánh giá (mặc định = số lõi)",
+    )
+    p.add_argument(
+        "--xla",
+        action="store_true",
+        help="Bước 6b: biên dịch model suy luận bằng XLA (jit_compile)",
+    )
+
     # Bật/tắt bước
     p.add_argument(
         "--skip-sentiment", action="store_true", help="Bỏ qua bước 5 (model_sentiment)"
@@ -221,7 +432,35 @@ def build_parser() -> argparse.ArgumentParser:
         "--only",
         type=str,
         default="",
-        help="Chỉ chạy 1 bước: 1..7, hoặc nhiều bước cách nhau bởi dấu phẩy (vd: 1,3,7)",
+        help="Chỉ chạy 1 bước: 1..7 (6b = xuất model suy luận), hoặc nhiều bước cách nhau bởi dấu phẩy (vd: 1,3,7)",
+    )
+    p.add_argument(
+        "--force",
+        action="store_true",
+        help="Chạy lại các bước kể cả khi input không đổi",
+    )
+    p.add_argument(
+        "--workers", type=int, default=4, help="Số bước độc lập chạy song song"
+    )
+
+    # Đo đạc
+    p.add_argument(
+        "--report",
+        type=Path,
+        default=RUN_REPORT,
+        help="Báo cáo run (ghi <report>.json + <report>.csv)",
+    )
+    p.add_argument(
+        "--profile-dir",
+        type=Path,
+        default=None,
+        help="Ghi profile từng bước vào thư mục này (mặc định tắt)",
+    )
+    p.add_argument(
+        "--profiler",
+        choices=["cprofile", "pyinstrument"],
+        default="cprofile",
+        help="Công cụ profile cho --profile-dir",
     )
     return p
 
@@ -229,39 +468,27 @@ def build_parser() -> argparse.ArgumentParser:
 def main():
     args = build_parser().parse_args()
 
-    # Nếu dùng --only thì chỉ chạy các bước được liệt kê
-    only_set = set([s.strip() for s in args.only.split(",") if s.strip()])
-
-    def should(step_num: int) -> bool:
-        return (not only_set) or (str(step_num) in only_set)
+    # Nếu dùng --only thì chỉ chạy các bước được liệt kê (bước khác coi như đã xong)
+    only_set = [s.strip() for s in args.only.split(",") if s.strip()]
+    if args.skip_sentiment and "5" in only_set:
+        only_set.remove("5")
 
     # Bảo đảm thư mục dataset tồn tại
     DATASET_DIR.mkdir(parents=True, exist_ok=True)
 
-    if should(1):
-        step_1_load_stock(args.stock_dir, args.out_csv)
-
-    if should(2):
-        step_2_load_news()
-
-    if should(3):
-        # Lưu ý: với code của bạn, pre_stock.preprocess_data có thể đã "ghép JSON".
-        step_3_pre_stock(
-            args.out_csv, args.json, args.start_date, args.preprocessed_csv
-        )
-
-    if should(4):
-        step_4_pre_news()
-
-    if should(5):
-        step_5_model_sentiment(enable=not args.skip_sentiment, out_json=args.json)
-
-    if should(6):
-        step_6_model_training(args.best_dir, args.preprocessed_csv)
-
-    if should(7):
-        step_7_evaluation(args.best_dir, args.preprocessed_csv, args.chart_dir)
-
+    t0 = time.perf_counter()
+    status = build_pipeline(args).run(only=only_set or None, force=args.force)
+    wall = time.perf_counter() - t0
+    failed = [n for n, st in status.items() if st in ("failed", "skipped")]
+    summary = ", ".join(f"{n}:{st}" for n, st in sorted(status.items()))
+    print(f"    Trạng thái: {summary} ({wall:.2f}s)")
+    json_path, _ = RECORDER.write_report(
+        args.report, extra={"wall_s": round(wall, 3), "status": status}
+    )
+    print(f"    Báo cáo đo đạc -> {json_path} (+ .csv)")
+    if failed:
+        print(f"❌ Pipeline dừng ở bước: {', '.join(sorted(failed))}")
+        sys.exit(1)
     print("✅ Hoàn tất pipeline.")
 
 
@@ -0,0 +1,262 @@
+# src/charts.py
+"""
+Vẽ biểu đồ đánh giá (backend Agg, không GUI), tách khỏi phần tính toán:
+  - chart_payload : gói dữ liệu nhỏ cần để vẽ 1 mã (lịch sử + backtest + forecast + metrics)
+  - render_symbol / render_grid : chỉ nhận payload -> chạy được trong process con
+  - ChartRenderer : hàng đợi vẽ qua ProcessPoolExecutor (spawn; process con chỉ import
+    module này, không import TensorFlow) -> vẽ song song, không chặn phần tính metric
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+import matplotlib
+
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+
+
+# ===================== DỮ LIỆU VẼ =====================
+def chart_payload(df_raw, symbol, result, target_col="close", lookback_hist_plot=120):
+    """
+    result: output của infer_backtest_and_future_symbol. Lịch sử lấy từ
+    result['history_df'] nếu có, không thì lọc df_raw theo symbol.
+    """
+    hist = result.get("history_df")
+    if hist is None:
+        dfg = df_raw[df_raw["symbol"] == symbol].sort_values("time")
+        hist = pd.DataFrame(
+            {
+                "time": pd.to_datetime(dfg["time"]).to_numpy(),
+                "actual": dfg[target_col].to_numpy(dtype="float64"),
+            }
+        )
+    return {
+        "symbol": symbol,
+        "history_df": hist.iloc[-lookback_hist_plot:].reset_index(drop=True),
+        "backtest_df": result["backtest_df"],
+        "future_df": result["future_df"],
+        "metrics_backtest": result["metrics_backtest"],
+    }
+
+
+# ===================== CÁC HÀM VẼ =====================
+def _metrics_text(m):
+    return f"Backtest({m['days']}d)  RMSE={m['rmse']:.2f} | MAPE={m['mape']:.2f}%"
+
+
+def _plot_bands(ax, fut: pd.DataFrame):
+    """Dải phân vị Monte Carlo (q05–q95, q25–q75) nếu future_df có các cột q.."""
+    if "q05" not in fut.columns:
+        return
+    t = pd.to_datetime(fut["time"])
+    c = ax.get_lines()[-1].get_color()  # cùng màu đường forecast vừa vẽ
+    ax.fill_between(
+        t, fut["q05"], fut["q95"], color=c, alpha=0.15, label="Forecast 5–95%"
+    )
+    if "q25" in fut.columns:
+        ax.fill_between(
+            t, fut["q25"], fut["q75"], color=c, alpha=0.3, label="Forecast 25–75%"
+        )
+
+
+def _finish(fig, save_path, show):
+    if save_path:
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        fig.savefig(save_path, dpi=150, bbox_inches="tight")
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def render_symbol(payload, W=90, H=7, save_path=None, show=False):
+    """History + backtest 1-step stitched + forecast H ngày của 1 mã."""
+    hist = payload["history_df"]
+    times, prices = pd.to_datetime(hist["time"]), hist["actual"].to_numpy()
+    bt = payload["backtest_df"].dropna(subset=["pred_1step"])
+    fut = payload["future_df"]
+    m = payload["metrics_backtest"]
+
+    fig = plt.figure(figsize=(11, 4.5))
+    plt.plot(times, prices, label="Actual (history)")
+    plt.plot(
+        pd.to_datetime(bt["time"]),
+        bt["pred_1step"],
+        linestyle="--",
+        label=f"1-step stitched (last {m['days']}d)",
+    )
+    plt.scatter([times.iloc[-1]], [prices[-1]], s=30, label="Last observed", zorder=3)
+    plt.plot(
+        pd.to_datetime(fut["time"]),
+        fut["pred_price"],
+        linestyle="--",
+        label=f"Forecast +{H}",
+    )
+    _plot_bands(plt.gca(), fut)
+
+    plt.title(
+        f"{payload['symbol']} | Walk-forward backtest + {H}-step forecast (W={W})"
+    )
+    plt.xlabel("Time")
+    plt.ylabel("Price")
+    plt.legend(loc="upper left")
+    fig.text(
+        0.01,
+        0.01,
+        _metrics_text(m),
+        fontsize=9,
+        ha="left",
+        va="bottom",
+        bbox=dict(boxstyle="round", fc="w", ec="0.7"),
+    )
+    plt.tight_layout()
+    _finish(fig, save_path, show)
+    return save_path
+
+
+def render_grid(payloads: List[dict], W=90, H=7, save_path=None, show=False):
+    """Lưới 3 cột (tối đa 9 mã) – phiên bản gọn để xem nhanh."""
+    payloads = payloads[:9]
+    n = len(payloads)
+    if n == 0:
+        return None
+
+    rows = int(np.ceil(n / 3))
+    fig, axes = plt.subplots(rows, 3, figsize=(18, 4.8 * rows), squeeze=False)
+    axes = axes.flatten()
+
+    for ax, pl in zip(axes, payloads):
+        hist = pl["history_df"]
+        t, p = pd.to_datetime(hist["time"]), hist["actual"].to_numpy()
+        bt = pl["backtest_df"].dropna(subset=["pred_1step"])
+        fut, m = pl["future_df"], pl["metrics_backtest"]
+
+        ax.plot(t, p, label="Actual", linewidth=1.0)
+        ax.plot(
+            pd.to_datetime(bt["time"]),
+            bt["pred_1step"],
+            linestyle="--",
+            linewidth=1.0,
+            label="1-step",
+        )
+        ax.scatter([t.iloc[-1]], [p[-1]], s=18)
+        ax.plot(
+            pd.to_datetime(fut["time"]),
+            fut["pred_price"],
+            linestyle="--",
+            linewidth=1.0,
+            label=f"+{H}",
+        )
+        _plot_bands(ax, fut)
+        ax.set_title(f"{pl['symbol']} | RMSE={m['rmse']:.2f}, MAPE={m['mape']:.2f}%")
+        ax.tick_params(axis="x", rotation=0)
+
+    # ẩn các ô thừa
+    for ax in axes[n:]:
+        ax.axis("off")
+
+    handles, labels = axes[0].get_legend_handles_labels()
+    fig.legend(handles, labels, loc="upper center", ncol=6)
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+    _finish(fig, save_path, show)
+    return save_path
+
+
+# ===================== API CŨ (nhận df_raw + result) =====================
+def plot_backtest_forecast_for_symbol(
+    df_raw,
+    symbol,
+    result,
+    target_col="close",
+    lookback_hist_plot=120,
+    W=90,
+    H=7,
+    save_path=None,
+    show=False,  # mặc định không hiện
+):
+    """
+    Vẽ biểu đồ: history + backtest 1-step stitched + forecast H ngày.
+    'result' là output từ infer_backtest_and_future_symbol(...)
+    """
+    payload = chart_payload(df_raw, symbol, result, target_col, lookback_hist_plot)
+    return render_symbol(payload, W=W, H=H, save_path=save_path, show=show)
+
+
+def plot_all_symbols_grid(
+    df_raw,
+    results_dict,
+    symbols=None,
+    target_col="close",
+    lookback_hist_plot=120,
+    W=90,
+    H=7,
+    save_path=None,
+    show=False,
+):
+    """Vẽ lưới 3x3 (tối đa 9 mã) – phiên bản gọn để xem nhanh."""
+    if symbols is None:
+        symbols = list(results_dict.keys())
+    payloads = [
+        chart_payload(df_raw, s, results_dict[s], target_col, lookback_hist_plot)
+        for s in symbols[:9]
+        if s in results_dict
+    ]
+    return render_grid(payloads, W=W, H=H, save_path=save_path, show=show)
+
+
+# ===================== VẼ SONG SONG =====================
+def default_workers() -> int:
+    """Chừa 1 lõi cho phần tính; máy 1 lõi -> 0 (vẽ tuần tự, pool chỉ tốn thêm)."""
+    return max(0, min(4, (os.cpu_count() or 1) - 1))
+
+
+class ChartRenderer:
+    """
+    renderer.submit(render_symbol, payload, ...) -> vẽ trong process con (Agg);
+    close() chờ tất cả và trả về danh sách file đã lưu. workers=0: vẽ ngay trong
+    process hiện tại (tuần tự). Lỗi vẽ 1 hình chỉ được in ra, không dừng phần còn lại.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = default_workers() if workers is None else int(workers)
+        self.pool = (
+            ProcessPoolExecutor(self.workers, mp_context=get_context("spawn"))
+            if self.workers > 0
+            else None
+        )
+        self.jobs: List = []
+        self.saved: List[str] = []
+
+    def submit(self, fn, *args, **kwargs):
+        if self.pool is None:
+            self._collect(fn.__name__, lambda: fn(*args, **kwargs))
+        else:
+            self.jobs.append((fn.__name__, self.pool.submit(fn, *args, **kwargs)))
+
+    def _collect(self, name, get):
+        try:
+            path = get()
+            if path:
+                self.saved.append(path)
+        except Exception as e:
+            print(f"[ERROR] {name}: {e}")
+
+    def close(self) -> List[str]:
+        for name, fut in self.jobs:
+            self._collect(name, fut.result)
+        self.jobs = []
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        return self.saved
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
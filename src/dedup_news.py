@@ -0,0 +1,220 @@
+# src/dedup_news.py
+from __future__ import annotations
+import re
+import hashlib
+import unicodedata
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# === Cấu hình MinHash/LSH ===
+SHINGLE_SIZE = 4  # số âm tiết/từ trong 1 shingle
+NUM_PERM = 128  # số hàm băm của chữ ký MinHash
+NUM_BANDS = 32  # số band LSH (NUM_PERM phải chia hết)
+NEAR_DUP_THRESHOLD = 0.8  # Jaccard ước lượng tối thiểu để coi là gần trùng
+
+_MERSENNE_P = np.uint64((1 << 31) - 1)
+RE_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+RE_SPACES = re.compile(r"\s+")
+
+
+# === Chuẩn hoá & băm chính xác ===
+def normalize_for_hash(text: str) -> str:
+    """NFC + lower + bỏ dấu câu + gộp khoảng trắng (để 2 bản copy khác định dạng vẫn trùng)."""
+    s = unicodedata.normalize("NFC", str(text or "")).lower()
+    s = RE_NON_WORD.sub(" ", s)
+    return RE_SPACES.sub(" ", s).strip()
+
+
+def exact_hash(text: str) -> str:
+    """Băm nội dung đã chuẩn hoá (blake2b 16 byte)."""
+    return hashlib.blake2b(
+        normalize_for_hash(text).encode("utf-8"), digest_size=16
+    ).hexdigest()
+
+
+# === MinHash ===
+def _shingle_ids(text: str, k: int = SHINGLE_SIZE) -> np.ndarray:
+    toks = normalize_for_hash(text).split()
+    if not toks:
+        return np.zeros(0, dtype=np.uint64)
+    if len(toks) < k:
+        grams = [" ".join(toks)]
+    else:
+        grams = [" ".join(toks[i : i + k]) for i in range(len(toks) - k + 1)]
+    ids = {zlib.crc32(g.encode("utf-8")) for g in grams}
+    return np.fromiter(ids, dtype=np.uint64, count=len(ids))
+
+
+def _make_permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_MERSENNE_P), size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, int(_MERSENNE_P), size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(
+    texts: List[str], num_perm: int = NUM_PERM, seed: int = 1
+) -> np.ndarray:
+    """
+    Chữ ký MinHash cho từng văn bản -> mảng (N, num_perm) uint64.
+    Hoán vị h(x) = (a*x + b) mod (2^31-1), x < 2^32 nên a*x không tràn uint64.
+    Văn bản rỗng nhận chữ ký toàn giá trị max (không khớp văn bản nào).
+    """
+    a, b = _make_permutations(num_perm, seed)
+    sigs = np.full((len(texts), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, t in enumerate(texts):
+        x = _shingle_ids(t) % _MERSENNE_P
+        if x.size == 0:
+            continue
+        sigs[i] = ((a[:, None] * x[None, :] + b[:, None]) % _MERSENNE_P).min(axis=1)
+    return sigs
+
+
+def lsh_candidate_pairs(sigs: np.ndarray, bands: int = NUM_BANDS):
+    """Chia chữ ký thành 'bands' dải; 2 văn bản chung 1 bucket ở bất kỳ dải nào là ứng viên."""
+    n, num_perm = sigs.shape
+    if num_perm % bands:
+        raise ValueError(f"num_perm={num_perm} không chia hết cho bands={bands}")
+    rows = num_perm // bands
+    pairs = set()
+    for bi in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        block = np.ascontiguousarray(sigs[:, bi * rows : (bi + 1) * rows])
+        for i in range(n):
+            buckets[block[i].tobytes()].append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for j in members[1:]:
+                pairs.add((members[0], j))
+    return pairs
+
+
+# === Union-find: mỗi cụm trùng -> 1 canonical (phần tử xuất hiện đầu tiên) ===
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent: np.ndarray, i: int, j: int):
+    ri, rj = _find(parent, i), _find(parent, j)
+    if ri != rj:
+        parent[max(ri, rj)] = min(ri, rj)
+
+
+def find_duplicate_groups(
+    texts: List[str],
+    threshold: float = NEAR_DUP_THRESHOLD,
+    num_perm: int = NUM_PERM,
+    bands: int = NUM_BANDS,
+    near: bool = True,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Trả về (canonical_pos, kind):
+      - canonical_pos[i]: vị trí văn bản đại diện của cụm chứa i (i nếu là bản gốc)
+      - kind[i]: '' (gốc), 'exact' (trùng hash), 'near' (gần trùng qua MinHash/LSH)
+    """
+    n = len(texts)
+    parent = np.arange(n)
+    kind = np.full(n, "", dtype=object)
+
+    # 1) Trùng chính xác
+    hashes = [exact_hash(t) for t in texts]
+    first_seen: Dict[str, int] = {}
+    for i, h in enumerate(hashes):
+        if h in first_seen:
+            parent[i] = first_seen[h]
+            kind[i] = "exact"
+        else:
+            first_seen[h] = i
+
+    # 2) Gần trùng: chỉ tính MinHash trên các bản đại diện của bước 1
+    if near:
+        reps = np.fromiter(first_seen.values(), dtype=np.int64)
+        sigs = minhash_signatures([texts[i] for i in reps], num_perm=num_perm)
+        for pi, pj in lsh_candidate_pairs(sigs, bands=bands):
+            jacc = float(np.mean(sigs[pi] == sigs[pj]))
+            if jacc >= threshold:
+                _union(parent, int(reps[pi]), int(reps[pj]))
+
+    canonical = np.array([_find(parent, i) for i in range(n)], dtype=np.int64)
+    near_mask = (canonical != np.arange(n)) & (kind == "")
+    kind[near_mask] = "near"
+    return canonical, kind
+
+
+# === Áp dụng cho DataFrame câu (output của pre_news) ===
+def dedup_sentences_df(
+    df_sent: pd.DataFrame,
+    article_col: str = "article_id",
+    text_col: str = "cau",
+    threshold: float = NEAR_DUP_THRESHOLD,
+) -> pd.DataFrame:
+    """
+    Input: DataFrame câu (article_id, date, ticket, cau, sent_idx)
+    Output: thêm các cột
+      - canonical_id: article_id đại diện (bài gốc) của cụm trùng
+      - dup_kind: '' | 'exact' | 'near'
+      - sent_hash: hash câu đã chuẩn hoá (model_sentiment chỉ chấm mỗi hash 1 lần)
+    """
+    if df_sent.empty:
+        out = df_sent.copy()
+        for c in ["canonical_id", "dup_kind", "sent_hash"]:
+            out[c] = pd.Series(dtype="object")
+        return out
+
+    # Ghép lại văn bản bài theo thứ tự câu để so trùng ở mức bài
+    order = ["sent_idx"] if "sent_idx" in df_sent.columns else []
+    art = (
+        df_sent.sort_values([article_col] + order)
+        .groupby(article_col, sort=False)[text_col]
+        .apply(lambda s: " ".join(s.astype(str)))
+    )
+    canonical_pos, kind = find_duplicate_groups(art.tolist(), threshold=threshold)
+    art_ids = art.index.to_numpy()
+    mapping = pd.DataFrame(
+        {
+            article_col: art_ids,
+            "canonical_id": art_ids[canonical_pos],
+            "dup_kind": kind,
+        }
+    )
+
+    out = df_sent.merge(mapping, on=article_col, how="left")
+    out["sent_hash"] = out[text_col].map(exact_hash)
+    return out
+
+
+def dedup_report(df_dedup: pd.DataFrame, article_col: str = "article_id") -> Dict:
+    arts = df_dedup.drop_duplicates(article_col)
+    return {
+        "articles": int(len(arts)),
+        "canonical_articles": int(arts["canonical_id"].nunique()),
+        "exact_dups": int((arts["dup_kind"] == "exact").sum()),
+        "near_dups": int((arts["dup_kind"] == "near").sum()),
+        "sentences": int(len(df_dedup)),
+        "unique_sentences": int(df_dedup["sent_hash"].nunique()),
+    }
+
+
+if __name__ == "__main__":
+    input_file = "/home/namphuong/course_materials/web/dataset/sentences_clean.csv"
+    output_file = "/home/namphuong/course_materials/web/dataset/sentences_dedup.csv"
+
+    if not pd.io.common.file_exists(input_file):
+        print(f"❌ Không tìm thấy file {input_file}. Hãy chạy pre_news trước.")
+    else:
+        df_sent = pd.read_csv(input_file, encoding="utf-8")
+        df_sent = df_sent.dropna(subset=["article_id", "cau"]).copy()
+
+        df_dedup = dedup_sentences_df(df_sent)
+        print("Thống kê trùng lặp:", dedup_report(df_dedup))
+
+        df_dedup.to_csv(output_file, index=False, encoding="utf-8")
+        print(f"✅ Đã lưu file câu đã gắn canonical_id tại {output_file}")
@@ -0,0 +1,188 @@
+# src/encoder_cache.py
+"""
+Cache đầu ra encoder (mu, logvar) theo cửa sổ, khoá (model, symbol, ngày cuối cửa sổ, W):
+  - RAM : LRU (OrderedDict) giới hạn số cửa sổ
+  - đĩa : 1 file SQLite, ghi theo lô sau mỗi lần encode -> sống qua các lần khởi động
+          API / các lần chạy evaluation; lần sau chỉ còn chạy decoder
+Mỗi mục lưu kèm digest nội dung cửa sổ đã scale: dữ liệu ngày cũ bị sửa (refresh, đổi
+scaler) -> lệch digest -> coi như miss và encode lại. model = hash file .keras gốc.
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+CACHE_NAME = "encoder_cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enc (
+    model       TEXT NOT NULL,          -- hash model gốc (forecaster.model_version)
+    symbol      TEXT NOT NULL,
+    end_date    TEXT NOT NULL,          -- ngày cuối cửa sổ (ISO)
+    w           INTEGER NOT NULL,
+    digest      BLOB NOT NULL,          -- blake2b nội dung cửa sổ (float32)
+    mu          BLOB NOT NULL,          -- float32 (L,)
+    logvar      BLOB NOT NULL,
+    inserted_at REAL NOT NULL,
+    PRIMARY KEY (model, symbol, end_date, w)
+);
+"""
+
+Key = Tuple[str, str, int]  # (symbol, end_date, W)
+
+
+def window_digest(window: np.ndarray) -> bytes:
+    a = np.ascontiguousarray(window, dtype="float32")
+    return hashlib.blake2b(a.tobytes(), digest_size=16).digest()
+
+
+class EncoderCache:
+    """
+    cache.encode(model, symbol, end_dates, windows) -> (mu, logvar) (B, L): tra RAM, rồi
+    SQLite, phần còn thiếu encode 1 lượt và ghi lại cả 2 tầng.
+    db_path=None: chỉ dùng RAM. on_lookup(hit, n): hook đếm hit/miss (vd. /metrics).
+    Dùng chung giữa các luồng (có khoá); model.encode chạy ngoài khoá.
+    """
+
+    def __init__(
+        self,
+        model_version: str,
+        db_path: Optional[str] = None,
+        max_items: int = 100_000,
+        on_lookup: Optional[Callable[[bool, int], None]] = None,
+    ):
+        self.model_version = model_version
+        self.max_items = int(max_items)
+        self.on_lookup = on_lookup
+        self.mem: "OrderedDict[Key, Tuple[bytes, np.ndarray, np.ndarray]]" = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+        self.hits = {"mem": 0, "disk": 0, "miss": 0}
+        self.conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            self.conn.commit()
+
+    # ---------- RAM ----------
+    def _remember(self, key: Key, digest: bytes, mu, logvar):
+        self.mem[key] = (digest, mu, logvar)
+        self.mem.move_to_end(key)
+        while len(self.mem) > self.max_items:
+            self.mem.popitem(last=False)
+
+    # ---------- đĩa ----------
+    def _load_disk(self, symbol: str, w: int, dates: List[str]):
+        out = {}
+        for i in range(0, len(dates), 500):  # giới hạn số tham số của SQLite
+            part = dates[i : i + 500]
+            rows = self.conn.execute(
+                "SELECT end_date, digest, mu, logvar FROM enc "
+                "WHERE model = ? AND symbol = ? AND w = ? "
+                f"AND end_date IN ({','.join('?' * len(part))})",
+                [self.model_version, symbol, w, *part],
+            )
+            for d, dg, mu, lv in rows:
+                out[d] = (
+                    bytes(dg),
+                    np.frombuffer(mu, dtype="float32"),
+                    np.frombuffer(lv, dtype="float32"),
+                )
+        return out
+
+    def _store_disk(self, symbol: str, w: int, rows):
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO enc VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (self.model_version, symbol, d, w, dg, mu.tobytes(), lv.tobytes(), now)
+                for d, dg, mu, lv in rows
+            ],
+        )
+        self.conn.commit()
+
+    # ---------- API ----------
+    def encode(
+        self, model, symbol: str, end_dates: Sequence[str], windows: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        windows = np.asarray(windows, dtype="float32")
+        B, w = len(windows), int(windows.shape[1])
+        dates = [str(d) for d in end_dates]
+        digests = [window_digest(x) for x in windows]
+        found: List = [None] * B
+
+        with self.lock:
+            todo = []
+            for i, (d, dg) in enumerate(zip(dates, digests)):
+                hit = self.mem.get((symbol, d, w))
+                if hit is not None and hit[0] == dg:
+                    self.mem.move_to_end((symbol, d, w))
+                    found[i] = hit[1:]
+                else:
+                    todo.append(i)
+            n_mem = B - len(todo)
+            if todo and self.conn is not None:
+                disk = self._load_disk(symbol, w, [dates[i] for i in todo])
+                rest = []
+                for i in todo:
+                    hit = disk.get(dates[i])
+                    if hit is not None and hit[0] == digests[i]:
+                        found[i] = hit[1:]
+                        self._remember((symbol, dates[i], w), *hit)
+                    else:
+                        rest.append(i)
+                todo = rest
+            n_disk = B - n_mem - len(todo)
+
+        if todo:  # encode phần thiếu 1 lượt, ngoài khoá
+            mu, logvar = model.encode(windows[todo])
+            mu = np.asarray(mu, dtype="float32")
+            logvar = np.asarray(logvar, dtype="float32")
+            rows = []
+            with self.lock:
+                for j, i in enumerate(todo):
+                    found[i] = (mu[j], logvar[j])
+                    self._remember((symbol, dates[i], w), digests[i], mu[j], logvar[j])
+                    rows.append((dates[i], digests[i], mu[j], logvar[j]))
+                if self.conn is not None:
+                    self._store_disk(symbol, w, rows)
+
+        with self.lock:
+            self.hits["mem"] += n_mem
+            self.hits["disk"] += n_disk
+            self.hits["miss"] += len(todo)
+        if self.on_lookup is not None:
+            if B - len(todo):
+                self.on_lookup(True, B - len(todo))
+            if todo:
+                self.on_lookup(False, len(todo))
+        return (
+            np.stack([f[0] for f in found]),
+            np.stack([f[1] for f in found]),
+        )
+
+    def stats(self) -> dict:
+        with self.lock:
+            out = dict(self.hits, items=len(self.mem))
+            if self.conn is not None:
+                out["disk_items"] = self.conn.execute(
+                    "SELECT COUNT(*) FROM enc WHERE model = ?", (self.model_version,)
+                ).fetchone()[0]
+        return out
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
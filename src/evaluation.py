@@ -1,13 +1,7 @@
 # evaluation.py
 import os
+import json
 import pandas as pd
-import numpy as np
-
-# Dùng backend không cần GUI (tránh popup cửa sổ)
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
 import os, warnings
 
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"  # tắt log của TensorFlow
@@ -18,180 +12,26 @@ warnings.filterwarnings("ignore")
 # ==== IMPORT từ Đoạn 1 ====
 from model_training import (
     prepare_infer_data,  # (không dùng trực tiếp ở đây nhưng giữ import nếu bạn cần nơi khác)
-    infer_backtest_and_future_symbol,  # sinh dự báo 1 mã + dict kết quả
+    infer_backtest_and_future_symbol,  # (giữ import: API 1 mã cho nơi khác)
     preprocess_multisymbol_df,  # preprocess multisymbol bạn đã viết
+    load_best_artifacts,
+    align_features_for_infer,
+)
+from metrics_and_backtest import compare_backtest, rolling_backtest
+from encoder_cache import CACHE_NAME, EncoderCache
+from forecaster import load_forecaster, model_version
+from features import column_affine, load_scaler
+from parallel_eval import (
+    evaluate_symbols,
+)  # backtest + forecast mọi mã (tuần tự/song song)
+from charts import (  # hàm vẽ tách riêng (không import TF) -> vẽ được trong process con
+    ChartRenderer,
+    chart_payload,
+    plot_all_symbols_grid,
+    plot_backtest_forecast_for_symbol,
+    render_grid,
+    render_symbol,
 )
-
-
-# ===================== CÁC HÀM VẼ =====================
-def _metrics_text(m):
-    return f"Backtest({m['days']}d)  RMSE={m['rmse']:.2f} | MAPE={m['mape']:.2f}%"
-
-
-def plot_backtest_forecast_for_symbol(
-    df_raw,
-    symbol,
-    result,
-    target_col="close",
-    lookback_hist_plot=120,
-    W=90,
-    H=7,
-    save_path=None,
-    show=False,  # mặc định không hiện
-):
-    """
-    Vẽ biểu đồ: history + backtest 1-step stitched + forecast H ngày.
-    'result' là output từ infer_backtest_and_future_symbol(...)
-    """
-    # --- dữ liệu lịch sử để vẽ phần "Actual (history)" ---
-    dfg = (
-        df_raw[df_raw["symbol"] == symbol]
-        .sort_values("time")
-        .reset_index(drop=True)
-        .copy()
-    )
-    dfg["time"] = pd.to_datetime(dfg["time"])
-    prices = dfg[target_col].to_numpy(dtype="float64", copy=False)
-    times = dfg["time"]
-
-    hist_start = max(0, len(dfg) - lookback_hist_plot)
-
-    # --- lấy backtest & forecast từ result ---
-    bt = result["backtest_df"].copy()
-    fut = result["future_df"].copy()
-    m = result["metrics_backtest"]
-
-    # --- vẽ ---
-    fig = plt.figure(figsize=(11, 4.5))
-
-    # history
-    plt.plot(times.iloc[hist_start:], prices[hist_start:], label="Actual (history)")
-
-    # 1-step stitched (backtest)
-    bt = bt.dropna(subset=["pred_1step"])
-    plt.plot(
-        pd.to_datetime(bt["time"]),
-        bt["pred_1step"],
-        linestyle="--",
-        label=f"1-step stitched (last {m['days']}d)",
-    )
-
-    # last observed
-    plt.scatter([times.iloc[-1]], [prices[-1]], s=30, label="Last observed", zorder=3)
-
-    # forecast +H
-    plt.plot(
-        pd.to_datetime(fut["time"]),
-        fut["pred_price"],
-        linestyle="--",
-        label=f"Forecast +{H}",
-    )
-
-    plt.title(f"{symbol} | Walk-forward backtest + {H}-step forecast (W={W})")
-    plt.xlabel("Time")
-    plt.ylabel("Price")
-    plt.legend(loc="upper left")
-
-    # metrics box
-    plt.gcf().text(
-        0.01,
-        0.01,
-        _metrics_text(m),
-        fontsize=9,
-        ha="left",
-        va="bottom",
-        bbox=dict(boxstyle="round", fc="w", ec="0.7"),
-    )
-
-    plt.tight_layout()
-
-    # Lưu và đóng
-    if save_path:
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        plt.savefig(save_path, dpi=150, bbox_inches="tight")
-    if show:
-        plt.show()
-    plt.close(fig)
-
-
-def plot_all_symbols_grid(
-    df_raw,
-    results_dict,
-    symbols=None,
-    target_col="close",
-    lookback_hist_plot=120,
-    W=90,
-    H=7,
-    save_path=None,
-    show=False,  # thêm tham số show
-):
-    """
-    Vẽ lưới 3x3 (tối đa 9 mã) – phiên bản gọn để xem nhanh.
-    """
-    if symbols is None:
-        symbols = list(results_dict.keys())
-    symbols = symbols[:9]
-
-    n = len(symbols)
-    if n == 0:
-        return
-
-    rows = int(np.ceil(n / 3))
-    fig, axes = plt.subplots(rows, 3, figsize=(18, 4.8 * rows), squeeze=False)
-    axes = axes.flatten()
-
-    for i, sym in enumerate(symbols):
-        ax = axes[i]
-        dfg = df_raw[df_raw["symbol"] == sym].sort_values("time").copy()
-        dfg["time"] = pd.to_datetime(dfg["time"])
-        p = dfg[target_col].to_numpy(dtype="float64", copy=False)
-        t = dfg["time"]
-        s = max(0, len(dfg) - lookback_hist_plot)
-
-        ax.plot(t.iloc[s:], p[s:], label="Actual", linewidth=1.0)
-
-        res = results_dict[sym]
-        bt, fut, m = (
-            res["backtest_df"].copy(),
-            res["future_df"].copy(),
-            res["metrics_backtest"],
-        )
-
-        bt = bt.dropna(subset=["pred_1step"])
-        ax.plot(
-            pd.to_datetime(bt["time"]),
-            bt["pred_1step"],
-            linestyle="--",
-            linewidth=1.0,
-            label="1-step",
-        )
-        ax.scatter([t.iloc[-1]], [p[-1]], s=18)
-        ax.plot(
-            pd.to_datetime(fut["time"]),
-            fut["pred_price"],
-            linestyle="--",
-            linewidth=1.0,
-            label=f"+{H}",
-        )
-
-        ax.set_title(f"{sym} | RMSE={m['rmse']:.2f}, MAPE={m['mape']:.2f}%")
-        ax.tick_params(axis="x", rotation=0)
-
-    # ẩn các ô thừa
-    for j in range(i + 1, rows * 3):
-        axes[j].axis("off")
-
-    handles, labels = axes[0].get_legend_handles_labels()
-    fig.legend(handles, labels, loc="upper center", ncol=6)
-    fig.tight_layout(rect=[0, 0, 1, 0.96])
-
-    # Lưu và đóng
-    if save_path:
-        os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        fig.savefig(save_path, dpi=150, bbox_inches="tight")
-    if show:
-        plt.show()
-    plt.close(fig)
 
 
 # ===================== PIPELINE CHẠY & LƯU =====================
@@ -205,47 +45,104 @@ def run_evaluation_and_save(
     W: int = 90,
     H: int = 7,
     save_metrics_csv: bool = True,
+    rolling_eval: bool = False,
+    rolling_stride: int = 1,
+    runtime: str = "keras",
+    mc_samples: int = 0,
+    seed: int | None = 0,
+    encoder_cache: bool = True,
+    plots: bool = True,
+    plot_workers: int | None = None,
+    workers: int = 0,
+    threads: int | None = None,
 ):
     """
     Chạy infer cho TẤT CẢ mã, lưu hình từng mã + grid, và (tuỳ chọn) lưu metrics CSV.
+    Tính toán và vẽ tách riêng: infer chỉ trả mảng/bảng; mỗi kết quả được đẩy ngay sang
+    ChartRenderer (process pool, Agg) nên metric/rolling không phải chờ vẽ.
+    plots=False: bỏ vẽ; plot_workers: số process vẽ (None = tự chọn, 0 = vẽ tuần tự
+    trong process hiện tại).
+    rolling_eval=True: thêm đánh giá rolling-origin (mọi origin, cách nhau rolling_stride
+    ngày) -> metrics_rolling_{overall,by_symbol,by_horizon,by_period}.csv.
+    runtime: keras | export | numpy | auto (xem forecaster.py).
+    mc_samples > 0: vẽ thêm dải phân vị forecast từ mc_samples mẫu latent; seed cố định
+    nhiễu lấy mẫu -> cột q.. và hình giống nhau giữa các lần chạy / workers=0 và > 0
+    (None = ngẫu nhiên; runtime keras lấy mẫu trong lớp Sampling, không theo seed).
+    encoder_cache (runtime export/numpy): tái dùng (mu, logvar) của các cửa sổ đã encode
+    ở lần chạy trước / từ API -> <best_dir>/encoder_cache.sqlite.
+    workers > 0: chia mã cho workers process (mỗi process nạp model 1 lần, đọc chung
+    ma trận đã scale qua mmap); threads: tổng số luồng cho mọi worker (mặc định = số
+    lõi, chia đều). Xem parallel_eval.py.
     """
     os.makedirs(save_dir, exist_ok=True)
+    # Tiền xử lý + căn cột 1 lần cho mọi mã; model nạp 1 lần (workers=0) hoặc 1 lần/worker
+    scaler = load_scaler(best_dir)
+    with open(os.path.join(best_dir, "config.json"), "r") as f:
+        config = json.load(f)
+    df_clean, _, _ = preprocess_multisymbol_df(df_raw, use_symbol_onehot=True)
+    df_clean, feature_cols = align_features_for_infer(df_clean, config)
+    if workers and column_affine(scaler, len(feature_cols)) is None:
+        print("[WARN] Scaler không tách được theo cột -> đánh giá tuần tự")
+        workers = 0
+    use_cache = encoder_cache and runtime != "keras"
+    cache = None
+    if workers:
+        model = best_dir
+    else:
+        model, _ = load_forecaster(best_dir, runtime)
+        if use_cache:
+            cache = EncoderCache(
+                model_version(best_dir), os.path.join(best_dir, CACHE_NAME)
+            )
+
+    renderer = ChartRenderer(plot_workers) if plots else None
 
     symbols = df_raw["symbol"].dropna().unique().tolist()
     results = {}
+    payloads = {}
     rows = []
 
-    for sym in symbols:
-        try:
-            out = infer_backtest_and_future_symbol(
-                df_raw=df_raw,
-                symbol=sym,
-                best_dir=best_dir,
-                preprocess_fn=preprocess_multisymbol_df,
-                lookback_hist_plot=lookback_hist_plot,
-                backtest_days=backtest_days,
-            )
-            results[sym] = out
-            m = out["metrics_backtest"]
-            rows.append({"symbol": sym, **m})
+    def on_result(sym, out):
+        # Gửi hình từng mã sang process vẽ ngay khi mã đó xong (không chờ)
+        if renderer is None:
+            return
+        payloads[sym] = chart_payload(df_raw, sym, out, target_col, lookback_hist_plot)
+        renderer.submit(
+            render_symbol,
+            payloads[sym],
+            W=int(W),
+            H=int(out["future_df"].shape[0]),  # H thực tế của mã
+            save_path=os.path.join(save_dir, f"{sym}.png"),
+        )
 
-            # Lưu hình từng mã
-            save_path = os.path.join(save_dir, f"{sym}.png")
-            # H thực tế có thể lấy theo out["future_df"].shape[0]
-            H_sym = int(out["future_df"].shape[0]) if "future_df" in out else int(H)
-            plot_backtest_forecast_for_symbol(
-                df_raw=df_raw,
-                symbol=sym,
-                result=out,
-                target_col=target_col,
-                lookback_hist_plot=lookback_hist_plot,
-                W=int(W),
-                H=H_sym,
-                save_path=save_path,
-                show=False,
-            )
-        except Exception as e:
-            print(f"[ERROR] {sym}: {e}")
+    outcomes = evaluate_symbols(
+        model,
+        df_clean,
+        feature_cols,
+        scaler,
+        config,
+        symbols,
+        workers=workers,
+        threads=threads,
+        runtime=runtime,
+        backtest_days=backtest_days,
+        lookback_hist_plot=lookback_hist_plot,
+        mc_samples=mc_samples,
+        seed=seed,
+        encoder_cache=use_cache if workers else cache,
+        on_result=on_result,
+    )
+    # Kết quả/lỗi theo đúng thứ tự symbols, bất kể worker nào xong trước
+    for sym, out, err in outcomes:
+        if err is not None:
+            print(f"[ERROR] {sym}: {err}")
+            continue
+        results[sym] = out
+        rows.append({"symbol": sym, **out["metrics_backtest"]})
+
+    if cache is not None:
+        print(f"Encoder cache: {cache.stats()}")
+        cache.close()
 
     # Lưu metrics
     metrics_path = None
@@ -255,36 +152,147 @@ def run_evaluation_and_save(
         metrics_df.to_csv(metrics_path, index=False)
         print(f"Đã lưu metrics: {os.path.abspath(metrics_path)}")
 
-    # Lưu grid 9 mã đầu (nếu có kết quả)
-    if results:
-        # Suy ra H mặc định từ 1 kết quả đầu
-        any_sym = next(iter(results.keys()))
-        H_any = (
-            int(results[any_sym]["future_df"].shape[0])
-            if "future_df" in results[any_sym]
-            else int(H)
+    if rolling_eval:
+        save_rolling_metrics(
+            df_raw, best_dir, save_dir, stride=rolling_stride, runtime=runtime
         )
 
+    if not results:
+        print("[WARN] Không có kết quả nào được tạo.")
+    if renderer is None:
+        return results
+
+    # Grid 9 mã đầu (nếu có kết quả)
+    if payloads:
         grid_path = os.path.join(save_dir, "grid_9_symbols.png")
-        plot_all_symbols_grid(
-            df_raw=df_raw,
-            results_dict=results,
-            symbols=symbols[:9],
-            target_col=target_col,
-            lookback_hist_plot=lookback_hist_plot,
+        # Suy ra H mặc định từ 1 kết quả đầu
+        H_any = int(next(iter(results.values()))["future_df"].shape[0])
+        renderer.submit(
+            render_grid,
+            [payloads[s] for s in symbols if s in payloads][:9],
             W=int(W),
             H=H_any,
             save_path=grid_path,
-            show=False,
         )
-        print(f"Đã lưu grid: {os.path.abspath(grid_path)}")
-    else:
-        print("[WARN] Không có kết quả nào được tạo.")
-
-    print(f"Đã lưu toàn bộ hình vào: {os.path.abspath(save_dir)}")
+    saved = renderer.close()  # chờ các process vẽ xong
+    print(f"Đã lưu {len(saved)} hình vào: {os.path.abspath(save_dir)}")
     return results
 
 
+def save_rolling_metrics(
+    df_raw, best_dir: str, save_dir: str, stride: int = 1, runtime: str = "keras"
+):
+    """Rolling-origin backtest cho tất cả mã (batch lớn) -> các bảng metric CSV."""
+    vae, scaler, config = load_best_artifacts(best_dir, runtime)
+    df_clean, _, _ = preprocess_multisymbol_df(df_raw, use_symbol_onehot=True)
+    df_clean, feature_cols = align_features_for_infer(df_clean, config)
+    tables = rolling_backtest(
+        vae,
+        df_clean,
+        feature_cols,
+        scaler,
+        config.get("TARGET_COL", "close"),
+        int(config.get("W", 90)),
+        int(config.get("H", 7)),
+        stride=stride,
+    )
+    paths = {}
+    for name, table in tables.items():
+        if isinstance(table, pd.DataFrame):
+            paths[name] = os.path.join(save_dir, f"metrics_rolling_{name}.csv")
+            table.to_csv(paths[name], index=False)
+    print(
+        f"Rolling backtest: {tables['n_windows']} cửa sổ -> "
+        f"{os.path.abspath(save_dir)}/metrics_rolling_*.csv"
+    )
+    return paths
+
+
+def _side_by_side(table: pd.DataFrame, index: str, names, cols=("rmse", "mape", "da")):
+    """Bảng dài (model, index, metric...) -> 1 dòng/index, cột '<metric>[<model>]'."""
+    wide = table.pivot(index=index, columns="model", values=list(cols))
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([cols, names]))
+    wide.columns = [f"{c}[{m}]" for c, m in wide.columns]
+    return wide.reset_index()
+
+
+def save_model_comparison(
+    df_raw,
+    best_dirs,
+    save_dir: str,
+    last_n: int = 60,
+    stride: int = 1,
+    horizon: int | None = None,
+    runtime: str = "keras",
+):
+    """
+    So sánh nhiều thư mục model (vd. các biến thể W/H khi tuning) trên cùng các cửa sổ
+    backtest: tiền xử lý 1 lần, căn cột 1 lần cho mỗi bộ feature_cols/scaler khác nhau,
+    cửa sổ dựng 1 lần cho mọi model cùng bộ đặc trưng (xem compare_backtest)
+    -> compare_overall.csv (1 dòng/model, theo rmse), compare_by_symbol.csv,
+    compare_by_horizon.csv (cột '<metric>[<model>]' cạnh nhau), compare_by_period.csv.
+    """
+    df_clean, _, _ = preprocess_multisymbol_df(df_raw, use_symbol_onehot=True)
+    groups, keys, models = [], {}, []
+    for d in best_dirs:
+        with open(os.path.join(d, "config.json"), "r") as f:
+            config = json.load(f)
+        scaler = load_scaler(d)
+        cols = config["feature_cols"]
+        affine = column_affine(scaler, len(cols))
+        key = (
+            tuple(cols),
+            id(scaler) if affine is None else b"".join(a.tobytes() for a in affine),
+        )
+        if key not in keys:  # bộ đặc trưng mới -> căn cột trên bản sao riêng
+            df_g, cols = align_features_for_infer(df_clean.copy(), config)
+            keys[key] = len(groups)
+            groups.append((df_g, cols, scaler))
+        name = os.path.basename(os.path.normpath(d))
+        if any(m["name"] == name for m in models):
+            name = f"{name}#{len(models)}"
+        models.append(
+            {
+                "name": name,
+                "vae": load_forecaster(d, runtime)[0],
+                "W": int(config.get("W", 90)),
+                "H": int(config.get("H", 7)),
+                "group": keys[key],
+                "target_col": config.get("TARGET_COL", "close"),
+            }
+        )
+    targets = {m["target_col"] for m in models}
+    if len(targets) > 1:
+        raise ValueError(f"Các model dự báo cột khác nhau: {sorted(targets)}")
+
+    tables = compare_backtest(
+        models, groups, targets.pop(), last_n=last_n, stride=stride, horizon=horizon
+    )
+    if tables["n_windows"] == 0:
+        print("[WARN] Không mã nào đủ dữ liệu cho W lớn nhất + horizon.")
+        return {}
+    os.makedirs(save_dir, exist_ok=True)
+    names = [m["name"] for m in models]
+    out = {
+        "overall": tables["overall"].sort_values("rmse").reset_index(drop=True),
+        "by_symbol": _side_by_side(tables["by_symbol"], "symbol", names),
+        "by_horizon": _side_by_side(tables["by_horizon"], "horizon", names),
+    }
+    if "by_period" in tables:
+        out["by_period"] = _side_by_side(tables["by_period"], "period", names)
+    paths = {}
+    for name, table in out.items():
+        paths[name] = os.path.join(save_dir, f"compare_{name}.csv")
+        table.to_csv(paths[name], index=False)
+    print(
+        f"So sánh {len(models)} model ({len(groups)} bộ đặc trưng), "
+        f"{tables['n_windows']} cửa sổ/model, {tables['horizon']} bước:"
+    )
+    print(out["overall"].to_string(index=False))
+    print(f"-> {os.path.abspath(save_dir)}/compare_*.csv")
+    return paths
+
+
 # ===================== CHẠY ĐÁNH GIÁ & LƯU =====================
 if __name__ == "__main__":
     # Đường dẫn model
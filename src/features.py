@@ -0,0 +1,269 @@
+# src/features.py
+"""
+Ma trận đặc trưng đầu vào model theo đúng thứ tự config['feature_cols'].
+Symbol được lưu gọn: khung dữ liệu giữ 1 cột số nguyên 'sym_id' (hoặc chỉ cột 'symbol')
+thay cho khối one-hot 'sym_*' dày đặc (float32, 1 cột/mã). Khối one-hot chỉ được bung ra
+trong batch đầu vào, bằng giá trị ĐÃ scale sẵn của 0/1 -> scaler chỉ chạy trên các cột số.
+Khung cũ còn đủ cột sym_* dày -> đi đường cũ (scaler.transform toàn bộ), kết quả như nhau.
+FastScaler: tham số scaler dạng float32 (x*a + b), transform tại chỗ; xuất ra
+<best_dir>/x_scaler.npz để runtime suy luận không cần sklearn/joblib.
+"""
+
+from __future__ import annotations
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SYM_PREFIX = "sym_"
+SYM_ID = "sym_id"
+SCALER_NAME = "x_scaler.npz"
+
+
+class FastScaler:
+    """
+    Scaler theo cột float32: x_scaled = x * a + b.
+    transform(X, out=X) chạy tại chỗ, không cấp phát, không qua kiểm tra đầu vào của
+    sklearn. Dùng thay scaler sklearn ở mọi chỗ nhận `scaler` (column_affine hiểu được).
+    """
+
+    def __init__(self, a, b, source_hash: str = ""):
+        self.a = np.asarray(a, dtype="float32")
+        self.b = np.asarray(b, dtype="float32")
+        self.source_hash = source_hash
+        self.n_features_in_ = len(self.a)
+
+    @classmethod
+    def from_sklearn(cls, scaler, n_features: int, source_hash: str = ""):
+        """None nếu scaler không tách được theo cột."""
+        affine = column_affine(scaler, n_features)
+        return None if affine is None else cls(*affine, source_hash=source_hash)
+
+    def transform(self, X, out: Optional[np.ndarray] = None) -> np.ndarray:
+        X = np.asarray(X, dtype="float32")
+        if X.shape[-1] != self.n_features_in_:
+            raise ValueError(f"Cần {self.n_features_in_} cột, nhận {X.shape[-1]}")
+        out = np.multiply(X, self.a, out=out)
+        return np.add(out, self.b, out=out)
+
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        with path.open("wb") as f:  # np.savez tự thêm đuôi .npz nếu truyền tên
+            np.savez(f, a=self.a, b=self.b, source_hash=np.array(self.source_hash))
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path, source_hash: Optional[str] = None):
+        """source_hash: hash x_scaler.pkl hiện tại -> lệch thì ValueError."""
+        with np.load(path) as z:
+            sc = cls(z["a"], z["b"], str(z["source_hash"]))
+        if source_hash is not None and sc.source_hash != source_hash:
+            raise ValueError(f"{path} được xuất từ scaler khác")
+        return sc
+
+
+def export_scaler(best_dir: str | Path, n_features: int) -> Optional[Path]:
+    """x_scaler.pkl -> <best_dir>/x_scaler.npz (float32); scaler không tách cột -> None."""
+    import joblib
+    from np_runtime import file_hash
+
+    best_dir = Path(best_dir)
+    pkl = best_dir / "x_scaler.pkl"
+    fast = FastScaler.from_sklearn(joblib.load(pkl), n_features, file_hash(pkl))
+    return None if fast is None else fast.save(best_dir / SCALER_NAME)
+
+
+def load_scaler(best_dir: str | Path):
+    """
+    Scaler cho suy luận: x_scaler.npz nếu khớp x_scaler.pkl (không import sklearn),
+    không thì joblib.load(x_scaler.pkl) rồi đổi sang FastScaler nếu tách được theo cột.
+    """
+    from np_runtime import file_hash
+
+    best_dir = Path(best_dir)
+    pkl = best_dir / "x_scaler.pkl"
+    h = file_hash(pkl)
+    npz = best_dir / SCALER_NAME
+    if npz.exists():
+        try:
+            return FastScaler.load(npz, source_hash=h)
+        except ValueError as e:
+            print(f"[features] Bỏ qua {npz.name}: {e}")
+    import joblib
+
+    scaler = joblib.load(pkl)
+    n = getattr(scaler, "n_features_in_", None)
+    fast = FastScaler.from_sklearn(scaler, n, h) if n else None
+    return fast if fast is not None else scaler
+
+
+def column_affine(scaler, n_features: int):
+    """
+    x_scaled = x * a + b theo từng cột cho các scaler của sklearn (Robust/Standard/MinMax/
+    MaxAbs) và FastScaler. Scaler khác -> None (phải gọi scaler.transform).
+    """
+    if isinstance(scaler, FastScaler):
+        return scaler.a.astype("float64"), scaler.b.astype("float64")
+    a = np.ones(n_features)
+    b = np.zeros(n_features)
+    if hasattr(scaler, "center_") or hasattr(scaler, "mean_"):  # Robust / Standard
+        center = getattr(scaler, "center_", None)
+        if center is None:
+            center = getattr(scaler, "mean_", None)
+        scale = getattr(scaler, "scale_", None)
+        if scale is not None:
+            a = 1.0 / np.asarray(scale, dtype="float64")
+        if center is not None:
+            b = -np.asarray(center, dtype="float64") * a
+        return a, b
+    if hasattr(scaler, "min_") and hasattr(scaler, "scale_"):  # MinMax
+        return np.asarray(scaler.scale_, "float64"), np.asarray(scaler.min_, "float64")
+    if hasattr(scaler, "max_abs_"):  # MaxAbs
+        return 1.0 / np.asarray(scaler.scale_, "float64"), b
+    return None
+
+
+def onehot_cols(feature_cols: Sequence[str]) -> List[str]:
+    return [c for c in feature_cols if c.startswith(SYM_PREFIX)]
+
+
+def symbol_ids(symbols, feature_cols: Sequence[str]) -> np.ndarray:
+    """Mã -> vị trí trong khối sym_* của feature_cols (int16, -1 = mã lạ -> one-hot 0)."""
+    pos = {c[len(SYM_PREFIX) :]: k for k, c in enumerate(onehot_cols(feature_cols))}
+    s = pd.Series(symbols).astype(str).str.upper()
+    return s.map(pos).fillna(-1).to_numpy(dtype="int16")
+
+
+class FeatureLayout:
+    """
+    Tách feature_cols thành khối số (dense) + khối one-hot; lưu sẵn affine của scaler cho
+    khối số và giá trị đã scale của 0/1 cho từng cột one-hot.
+    fast = scaler tách được theo cột (hoặc không scale) -> không cần scaler.transform.
+    """
+
+    def __init__(self, feature_cols: Sequence[str], scaler=None):
+        self.feature_cols = list(feature_cols)
+        F = len(self.feature_cols)
+        is_sym = np.array([c.startswith(SYM_PREFIX) for c in self.feature_cols])
+        self.dense_pos = np.flatnonzero(~is_sym)
+        self.sym_pos = np.flatnonzero(is_sym)
+        self.dense_cols = [self.feature_cols[j] for j in self.dense_pos]
+        self.scaler = scaler
+        self.affine = column_affine(scaler, F) if scaler is not None else None
+        self.fast = scaler is None or self.affine is not None
+        if self.affine is not None:
+            a, b = self.affine
+            self.dense_a = a[self.dense_pos].astype("float32")
+            self.dense_b = b[self.dense_pos].astype("float32")
+            self.sym_off = b[self.sym_pos].astype("float32")
+            self.sym_on = (a + b)[self.sym_pos].astype("float32")
+        else:
+            self.sym_off = np.zeros(len(self.sym_pos), dtype="float32")
+            self.sym_on = np.ones(len(self.sym_pos), dtype="float32")
+
+    def ids(self, df: pd.DataFrame) -> np.ndarray:
+        if SYM_ID in df.columns:
+            return df[SYM_ID].to_numpy(dtype="int16")
+        return symbol_ids(df["symbol"], self.feature_cols)
+
+    def dense(self, df: pd.DataFrame, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        (N, Fd) khối số, đã scale nếu có affine (thô nếu không). Chép từng cột vào out
+        (cấp mới nếu None) rồi scale tại chỗ -> không có mảng trung gian.
+        """
+        if out is None:
+            out = np.empty((len(df), len(self.dense_cols)), dtype="float32")
+        for j, c in enumerate(self.dense_cols):
+            out[:, j] = df[c].to_numpy(copy=False)
+        if self.affine is not None:
+            out *= self.dense_a
+            out += self.dense_b
+        return out
+
+    def sym_block(self, ids: np.ndarray) -> np.ndarray:
+        """(n, Fs) khối one-hot (đã scale nếu có affine) cho từng id; -1 -> toàn 'off'."""
+        out = np.tile(self.sym_off, (len(ids), 1))
+        rows = np.flatnonzero(ids >= 0)
+        out[rows, ids[rows]] = self.sym_on[ids[rows]]
+        return out
+
+    def assemble(self, dense: np.ndarray, sym: np.ndarray) -> np.ndarray:
+        """Ghép (..., Fd) + (..., Fs) (broadcast được) -> (..., F) theo thứ tự feature_cols."""
+        out = np.empty(dense.shape[:-1] + (len(self.feature_cols),), dtype="float32")
+        out[..., self.dense_pos] = dense
+        out[..., self.sym_pos] = sym
+        return out
+
+    def matrix(self, df: pd.DataFrame, scaled: bool = True) -> np.ndarray:
+        """(N, F) float32 theo thứ tự feature_cols; scaled=False -> giá trị thô (one-hot 0/1)."""
+        if not scaled:
+            raw = FeatureLayout(self.feature_cols)
+            return raw.assemble(raw.dense(df), raw.sym_block(raw.ids(df)))
+        if not self.fast:  # scaler không tách theo cột: dựng thô rồi transform
+            return self.scaler.transform(self.matrix(df, scaled=False)).astype(
+                "float32", copy=False
+            )
+        return self.assemble(self.dense(df), self.sym_block(self.ids(df)))
+
+
+_LAYOUTS: Dict[Tuple, FeatureLayout] = {}
+_LOCK = threading.Lock()
+
+
+def get_layout(feature_cols: Sequence[str], scaler=None) -> FeatureLayout:
+    """FeatureLayout dùng lại theo (feature_cols, scaler) -> chỉ tính affine 1 lần."""
+    key = (tuple(feature_cols), id(scaler))
+    with _LOCK:
+        lay = _LAYOUTS.get(key)
+        if lay is None or lay.scaler is not scaler:
+            lay = _LAYOUTS[key] = FeatureLayout(feature_cols, scaler)
+        return lay
+
+
+def feature_matrix(
+    df: pd.DataFrame, feature_cols: Sequence[str], scaler: Optional[object] = None
+) -> np.ndarray:
+    """
+    (N, F) float32 đầu vào model; scaler=None -> giá trị thô.
+    Khung có đủ mọi cột (kể cả sym_* dày) -> scaler.transform như cũ; thiếu cột sym_*
+    -> bung one-hot từ 'sym_id'/'symbol'.
+    """
+    if all(c in df.columns for c in feature_cols):
+        X = df[list(feature_cols)].to_numpy(dtype="float32")
+        return (
+            X if scaler is None else scaler.transform(X).astype("float32", copy=False)
+        )
+    return get_layout(feature_cols, scaler).matrix(df, scaled=scaler is not None)
+
+
+def window_batch(
+    df: pd.DataFrame,
+    feature_cols: Sequence[str],
+    scaler,
+    ends: Sequence[int],
+    window: int,
+) -> np.ndarray:
+    """
+    (B, W, F) float32 các cửa sổ đã scale df.iloc[e-W:e] (e trong ends) của 1 mã.
+    Chỉ scale các dòng nằm trong cửa sổ; khối one-hot bung thẳng vào batch.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    ends = np.asarray(ends)
+    lo = int(ends.min()) - window
+    part = df.iloc[lo : int(ends.max())]
+    lay = get_layout(feature_cols, scaler)
+    compact = not all(c in df.columns for c in feature_cols)
+    if not (compact and lay.fast):
+        X = feature_matrix(part, feature_cols, scaler)
+        return sliding_window_view(X, window, axis=0)[ends - window - lo].transpose(
+            0, 2, 1
+        )
+    D = sliding_window_view(lay.dense(part), window, axis=0)[ends - window - lo]
+    ids = lay.ids(part)
+    if (ids == ids[0]).all():  # 1 mã: khối one-hot như nhau ở mọi dòng
+        return lay.assemble(D.transpose(0, 2, 1), lay.sym_block(ids[:1]))
+    S = sliding_window_view(lay.sym_block(ids), window, axis=0)[ends - window - lo]
+    return lay.assemble(D.transpose(0, 2, 1), S.transpose(0, 2, 1))
@@ -0,0 +1,172 @@
+# src/forecaster.py
+"""
+Chọn runtime chạy model dự báo trong 1 thư mục best_dir (cấu hình bằng tham số / env):
+  keras  : best_vae.keras gốc (Sampling ngẫu nhiên, Model.predict)
+  export : <best_dir>/infer_model (tf.function, z = mu)          -> infer_export.py
+  numpy  : <best_dir>/vae_numpy.npz, KHÔNG import TensorFlow     -> np_runtime.py
+  auto   : export nếu có & khớp model gốc, rồi numpy, cuối cùng keras
+Mọi runtime đều có .predict(X, verbose=0, batch_size=None) -> (B, H, 1) như keras.
+forecast_windows: dự báo 1 lô cửa sổ (export/numpy: z = mu, encoder qua EncoderCache nếu có).
+Dự báo phân phối (Monte Carlo trong không gian latent): sample_returns / price_paths /
+forecast_bands.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from np_runtime import file_hash
+
+RUNTIMES = ("auto", "keras", "export", "numpy")
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def source_model_path(best_dir: str | Path) -> Path:
+    best_dir = Path(best_dir)
+    path = best_dir / "best_vae.keras"
+    return path if path.exists() else best_dir / "final_vae.keras"
+
+
+def model_version(best_dir: str | Path) -> str:
+    """Định danh model = hash file .keras gốc (khoá của EncoderCache)."""
+    return file_hash(source_model_path(best_dir))
+
+
+def has_latent(model) -> bool:
+    """export/numpy có encode/decode riêng; keras gốc thì không."""
+    return hasattr(model, "encode") and hasattr(model, "decode")
+
+
+def _load_keras(best_dir: Path):
+    from model_training import KLDivergenceLayer, Sampling
+    from tensorflow.keras.models import load_model
+
+    return load_model(
+        source_model_path(best_dir),
+        custom_objects={"Sampling": Sampling, "KLDivergenceLayer": KLDivergenceLayer},
+        compile=False,
+    )
+
+
+def _load_export(best_dir: Path):
+    from infer_export import INFER_DIRNAME, load_inference
+
+    return load_inference(
+        best_dir / INFER_DIRNAME, source_model=source_model_path(best_dir)
+    )
+
+
+def _load_numpy(best_dir: Path):
+    from np_runtime import NUMPY_NAME, load_numpy_vae
+
+    return load_numpy_vae(
+        best_dir / NUMPY_NAME, source_hash=file_hash(source_model_path(best_dir))
+    )
+
+
+_LOADERS = {"keras": _load_keras, "export": _load_export, "numpy": _load_numpy}
+
+
+def load_forecaster(best_dir: str | Path, runtime: str = "auto") -> Tuple[object, str]:
+    """
+    Nạp model theo runtime -> (model, runtime thực dùng).
+    runtime cụ thể mà thiếu/lệch artifact -> lỗi; auto thì thử lần lượt export, numpy, keras.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"runtime không hợp lệ: {runtime} (có: {', '.join(RUNTIMES)})")
+    best_dir = Path(best_dir)
+    if runtime != "auto":
+        return _LOADERS[runtime](best_dir), runtime
+    for name in ("export", "numpy"):
+        try:
+            return _LOADERS[name](best_dir), name
+        except (ImportError, OSError, ValueError) as e:
+            print(f"[forecaster] Bỏ qua runtime {name}: {e}")
+    return _load_keras(best_dir), "keras"
+
+
+def forecast_windows(
+    model,
+    windows: np.ndarray,
+    cache=None,
+    symbol: Optional[str] = None,
+    end_dates: Optional[Sequence[str]] = None,
+):
+    """
+    (B, W, F) -> (y (B, H, 1), latent (mu, logvar) | None) trong 1 lượt.
+    export/numpy: z = mu; cache (EncoderCache) + symbol/end_dates -> cửa sổ đã gặp chỉ
+    chạy decoder. keras gốc: predict (Sampling ngẫu nhiên), không có latent.
+    """
+    windows = np.asarray(windows, dtype="float32")
+    if not has_latent(model):
+        return model.predict(windows, verbose=0), None
+    if cache is not None:
+        mu, logvar = cache.encode(model, symbol, end_dates, windows)
+    else:
+        mu, logvar = model.encode(windows)
+    return model.decode(mu), (mu, logvar)
+
+
+# ====== Monte Carlo ======
+def sample_returns(
+    model,
+    X: Optional[np.ndarray],
+    k: int,
+    seed: Optional[int] = None,
+    batch_size: int = 4096,
+    latent=None,
+) -> np.ndarray:
+    """
+    K mẫu log-return cho mỗi cửa sổ: (B, W, F) -> (K, B, H).
+    export/numpy: encode 1 lần (hoặc dùng latent=(mu, logvar) có sẵn, vd. từ cache),
+    z = mu + exp(logvar/2)*eps (seed -> tái lập được), decoder 1 lượt cho K*B dòng.
+    keras gốc (không có encode/decode): lớp Sampling rút nhiễu riêng mỗi dòng -> lặp
+    cửa sổ K lần rồi predict 1 lần.
+    """
+    if has_latent(model):
+        mu, logvar = latent if latent is not None else model.encode(X)
+        mu, logvar = np.asarray(mu), np.asarray(logvar)
+        B = len(mu)
+        eps = np.random.default_rng(seed).standard_normal(
+            (k,) + mu.shape, dtype="float32"
+        )
+        z = mu[None] + np.exp(0.5 * logvar)[None] * eps  # (K, B, L)
+        y = model.decode(z.reshape(k * B, -1))
+    else:
+        X = np.asarray(X, dtype="float32")
+        B = len(X)
+        y = model.predict(np.tile(X, (k, 1, 1)), verbose=0, batch_size=batch_size)
+    return np.asarray(y).reshape(k, B, -1)
+
+
+def price_paths(rets: np.ndarray, p0) -> np.ndarray:
+    """(K, B, H) log-return + giá cuối (B,) -> (K, B, H) đường giá (cumsum rồi exp)."""
+    p0 = np.asarray(p0, dtype="float64").reshape(1, -1, 1)
+    return p0 * np.exp(np.cumsum(rets, axis=-1, dtype="float64"))
+
+
+def band_columns(quantiles: Sequence[float] = QUANTILES):
+    """0.05 -> 'q05', 0.5 -> 'q50' (tên cột trong future_df)."""
+    return [f"q{round(q * 100):02d}" for q in quantiles]
+
+
+def forecast_bands(
+    model,
+    X: np.ndarray,
+    p0,
+    k: int = 200,
+    quantiles: Sequence[float] = QUANTILES,
+    seed: Optional[int] = None,
+    latent=None,
+) -> Dict[str, np.ndarray]:
+    """
+    Dải phân vị giá theo từng bước horizon: {'q05': (B, H), ..., 'mean': (B, H)}.
+    X: (B, W, F) đã scale; p0: giá cuối mỗi cửa sổ (B,); latent: (mu, logvar) có sẵn.
+    """
+    paths = price_paths(sample_returns(model, X, k, seed, latent=latent), p0)
+    qs = np.quantile(paths, quantiles, axis=0)  # (Q, B, H)
+    out = dict(zip(band_columns(quantiles), qs))
+    out["mean"] = paths.mean(axis=0)
+    return out
@@ -0,0 +1,347 @@
+# src/infer_export.py
+"""
+Xuất VAE (best_vae.keras) thành model CHỈ-SUY-LUẬN để phục vụ:
+  - encoder -> z_mu -> decoder (bỏ KLDivergenceLayer/add_loss, bỏ Sampling ngẫu nhiên)
+  - tuỳ chọn lấy mẫu: z = mu + exp(0.5*logvar) * eps, K mẫu trong 1 lần decoder
+  - mỗi endpoint là tf.function với input_signature cố định (1 lần trace), tuỳ chọn XLA
+Artifact: <best_dir>/infer_model/ (SavedModel) + infer_meta.json (W, H, F, hash model gốc),
+và <best_dir>/vae_numpy.npz cho runtime NumPy thuần (src/np_runtime.py).
+"""
+
+from __future__ import annotations
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import tensorflow as tf
+
+from np_runtime import NUMPY_NAME, file_hash, load_numpy_vae
+
+INFER_DIRNAME = "infer_model"
+META_NAME = "infer_meta.json"
+
+
+def split_encoder_decoder(vae):
+    """
+    Tách VAE thành encoder (x -> mu, logvar) và decoder (z -> y) dùng chung trọng số.
+    Dựa vào tên lớp lúc train: z_mu, z_logvar, z (Sampling); các lớp sau z là 1 chuỗi.
+    """
+    names = [l.name for l in vae.layers]
+    for n in ("z_mu", "z_logvar", "z"):
+        if n not in names:
+            raise ValueError(f"Model thiếu lớp '{n}' (có: {names})")
+    encoder = tf.keras.Model(
+        vae.inputs,
+        [vae.get_layer("z_mu").output, vae.get_layer("z_logvar").output],
+        name="encoder",
+    )
+    latent = int(vae.get_layer("z_mu").output.shape[-1])
+    z_in = tf.keras.Input(shape=(latent,), name="z_in")
+    h = z_in
+    for layer in vae.layers[names.index("z") + 1 :]:
+        h = layer(h)
+    decoder = tf.keras.Model(z_in, h, name="decoder")
+    return encoder, decoder
+
+
+class InferenceVAE:
+    """
+    Các endpoint (x: (B, W, F) float32):
+      mean(x) -> (B, H, 1)         dự báo tất định từ z = mu
+      sample(x, k) -> (k, B, H, 1) k mẫu latent, 1 lần decoder cho k*B dòng
+      encode(x) -> (mu, logvar)    decode(z) -> (B, H, 1)
+    """
+
+    ENDPOINTS = ("mean", "sample", "encode", "decode")
+
+    def __init__(self, vae, xla: bool = False):
+        self.encoder, self.decoder = split_encoder_decoder(vae)
+        _, W, F = vae.inputs[0].shape
+        latent = int(self.encoder.outputs[0].shape[-1])
+        x_spec = tf.TensorSpec([None, int(W), int(F)], tf.float32, name="x")
+        z_spec = tf.TensorSpec([None, latent], tf.float32, name="z")
+        k_spec = tf.TensorSpec([], tf.int32, name="k")
+        fn = lambda f, *sig: tf.function(  # noqa: E731
+            f, input_signature=list(sig), jit_compile=xla or None
+        )
+        self.mean = fn(self._mean, x_spec)
+        self.sample = fn(self._sample, x_spec, k_spec)
+        self.encode = fn(self._encode, x_spec)
+        self.decode = fn(self._decode, z_spec)
+
+    def _encode(self, x):
+        mu, logvar = self.encoder(x, training=False)
+        return mu, logvar
+
+    def _decode(self, z):
+        return self.decoder(z, training=False)
+
+    def _mean(self, x):
+        mu, _ = self.encoder(x, training=False)
+        return self.decoder(mu, training=False)
+
+    def _sample(self, x, k):
+        mu, logvar = self.encoder(x, training=False)
+        B, L = tf.shape(mu)[0], tf.shape(mu)[1]
+        eps = tf.random.normal(tf.stack([k, B, L]))
+        z = mu[None] + tf.exp(0.5 * logvar)[None] * eps  # (k, B, L)
+        y = self.decoder(tf.reshape(z, [-1, L]), training=False)  # (k*B, H, 1)
+        return tf.reshape(y, tf.concat([[k, B], tf.shape(y)[1:]], axis=0))
+
+    def save(self, path: str | Path):
+        """
+        Ghi SavedModel qua keras ExportArchive: tự gom mọi biến mà các endpoint dùng
+        (kể cả trạng thái seed của LSTM), không cần custom_objects khi nạp.
+        """
+        archive = tf.keras.export.ExportArchive()
+        archive.track(self.encoder)
+        archive.track(self.decoder)
+        for name in self.ENDPOINTS:
+            fn = getattr(self, name)
+            fn.get_concrete_function()  # trace 1 lần theo input_signature
+            archive.add_endpoint(name, fn)
+        archive.write_out(str(path), verbose=False)
+
+
+def mean_reference(vae, X: np.ndarray) -> np.ndarray:
+    """Chạy chính model gốc với Sampling trả về mu (tắt nhiễu) -> mốc so parity."""
+    z_layer = vae.get_layer("z")
+    z_layer.call = lambda inputs, *a, **k: inputs[0]
+    try:
+        return np.asarray(vae(X, training=False))
+    finally:
+        del z_layer.call
+
+
+def check_parity(vae, infer, X: np.ndarray, atol: float = 1e-5) -> float:
+    """So mean(x) của model xuất với model gốc (z = mu); lệch > atol -> AssertionError."""
+    ref = mean_reference(vae, X)
+    got = infer.predict(X)
+    diff = float(np.max(np.abs(ref - got))) if ref.size else 0.0
+    if not np.isfinite(diff) or diff > atol:
+        raise AssertionError(f"Lệch parity {diff:.3g} > {atol:g}")
+    return diff
+
+
+class LoadedInference:
+    """Model xuất đã nạp: predict/sample/encode/decode nhận & trả np.ndarray float32."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        with open(self.path / META_NAME, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.module = tf.saved_model.load(str(self.path))
+        self.W, self.H, self.F = self.meta["W"], self.meta["H"], self.meta["F"]
+
+    def predict(self, X, verbose=0, batch_size: Optional[int] = None) -> np.ndarray:
+        """(B, W, F) -> (B, H, 1); nhận verbose/batch_size như keras Model.predict."""
+        X = tf.constant(X, tf.float32)
+        if batch_size is None or X.shape[0] <= batch_size:
+            return self.module.mean(X).numpy()
+        return np.concatenate(
+            [
+                self.module.mean(X[i : i + batch_size]).numpy()
+                for i in range(0, X.shape[0], batch_size)
+            ]
+        )
+
+    def sample(self, X, k: int) -> np.ndarray:
+        return self.module.sample(tf.constant(X, tf.float32), tf.constant(k)).numpy()
+
+    def encode(self, X):
+        mu, logvar = self.module.encode(tf.constant(X, tf.float32))
+        return mu.numpy(), logvar.numpy()
+
+    def decode(self, Z) -> np.ndarray:
+        return self.module.decode(tf.constant(Z, tf.float32)).numpy()
+
+
+def load_inference(
+    path: str | Path, source_model: Optional[str | Path] = None
+) -> LoadedInference:
+    """
+    Nạp model xuất. source_model: file .keras gốc -> kiểm tra hash, lệch thì ValueError
+    (artifact xuất từ model cũ).
+    """
+    infer = LoadedInference(path)
+    if source_model is not None:
+        h = file_hash(source_model)
+        if infer.meta.get("source_hash") != h:
+            raise ValueError(f"{path} được xuất từ model khác {source_model}")
+    return infer
+
+
+def _layer_spec(layer):
+    """Cấu hình + trọng số 1 lớp keras cho np_runtime; lớp không ảnh hưởng suy luận -> None."""
+    cls, cfg = type(layer).__name__, layer.get_config()
+    if cls in ("InputLayer", "Dropout"):
+        return None
+    if cls == "TimeDistributed":
+        layer, cls = layer.layer, type(layer.layer).__name__
+        cfg = layer.get_config()
+        if cls != "Dense":
+            raise ValueError(f"TimeDistributed({cls}) chưa hỗ trợ")
+    if cls == "Conv1D":
+        if tuple(cfg["strides"]) != (1,) or cfg["groups"] != 1:
+            raise ValueError(f"{layer.name}: chỉ hỗ trợ strides=1, groups=1")
+        if cfg["data_format"] != "channels_last":
+            raise ValueError(f"{layer.name}: chỉ hỗ trợ channels_last")
+        spec = {
+            "kind": "conv1d",
+            "padding": cfg["padding"],
+            "dilation": int(cfg["dilation_rate"][0]),
+            "activation": cfg["activation"],
+            "use_bias": cfg["use_bias"],
+        }
+    elif cls == "LayerNormalization":
+        if list(cfg["axis"]) not in ([-1], [len(layer.input.shape) - 1]):
+            raise ValueError(f"{layer.name}: chỉ hỗ trợ chuẩn hoá trục cuối")
+        if cfg.get("rms_scaling"):
+            raise ValueError(f"{layer.name}: rms_scaling chưa hỗ trợ")
+        spec = {
+            "kind": "layer_norm",
+            "epsilon": float(cfg["epsilon"]),
+            "center": cfg["center"],
+            "scale": cfg["scale"],
+        }
+    elif cls == "LSTM":
+        if cfg["go_backwards"] or cfg["stateful"] or cfg["return_state"]:
+            raise ValueError(
+                f"{layer.name}: go_backwards/stateful/return_state chưa hỗ trợ"
+            )
+        spec = {
+            "kind": "lstm",
+            "return_sequences": cfg["return_sequences"],
+            "activation": cfg["activation"],
+            "recurrent_activation": cfg["recurrent_activation"],
+            "use_bias": cfg["use_bias"],
+        }
+    elif cls == "Dense":
+        spec = {
+            "kind": "dense",
+            "activation": cfg["activation"],
+            "use_bias": cfg["use_bias"],
+        }
+    elif cls == "RepeatVector":
+        spec = {"kind": "repeat", "n": int(cfg["n"])}
+    else:
+        raise ValueError(f"Lớp {layer.name} ({cls}) chưa hỗ trợ trong np_runtime")
+    weights = [np.asarray(w, dtype="float32") for w in layer.get_weights()]
+    return {"name": layer.name, "n_weights": len(weights), **spec}, weights
+
+
+def export_numpy(vae, out_path: str | Path, source_hash: str = "") -> Path:
+    """
+    Ghi spec (JSON) + trọng số float32 của VAE vào 1 file .npz cho np_runtime:
+    encoder = các lớp trước z_mu (phải là 1 chuỗi), decoder = các lớp sau z (Sampling).
+    """
+    names = [l.name for l in vae.layers]
+    i_mu, i_z = names.index("z_mu"), names.index("z")
+    arrays, prev = {}, None
+
+    def collect(layers, chain=True):
+        nonlocal prev
+        out = []
+        for layer in layers:
+            if chain and prev is not None and layer.input is not prev.output:
+                raise ValueError(f"{layer.name}: model không phải 1 chuỗi lớp")
+            prev = layer
+            res = _layer_spec(layer)
+            if res is None:
+                continue
+            spec, weights = res
+            for j, w in enumerate(weights):
+                arrays[f"{spec['name']}/{j}"] = w
+            out.append(spec)
+        return out
+
+    encoder = collect(vae.layers[:i_mu])
+    z_mu = collect([vae.get_layer("z_mu")])[0]
+    z_logvar = collect([vae.get_layer("z_logvar")], chain=False)[0]
+    prev = None
+    decoder = collect(vae.layers[i_z + 1 :])
+    _, W, F = vae.inputs[0].shape
+    spec = {
+        "W": int(W),
+        "H": int(vae.outputs[0].shape[1]),
+        "F": int(F),
+        "latent": int(vae.get_layer("z_mu").output.shape[-1]),
+        "source_hash": source_hash,
+        "encoder": encoder,
+        "z_mu": z_mu,
+        "z_logvar": z_logvar,
+        "decoder": decoder,
+    }
+    out_path = Path(out_path)
+    np.savez(out_path, __spec__=np.array(json.dumps(spec)), **arrays)
+    return out_path
+
+
+def export_inference(
+    best_dir: str | Path,
+    out_dir: Optional[str | Path] = None,
+    xla: bool = False,
+    n_check: int = 64,
+    atol: float = 1e-5,
+    numpy_runtime: bool = True,
+) -> Path:
+    """
+    Nạp best_vae.keras (hoặc final_vae.keras) trong best_dir, xuất model chỉ-suy-luận
+    vào out_dir (mặc định <best_dir>/infer_model) rồi nạp lại và kiểm tra parity trên
+    n_check cửa sổ ngẫu nhiên. numpy_runtime: xuất thêm <best_dir>/vae_numpy.npz
+    (parity float32 với atol 1e-4). Luôn xuất kèm scaler float32 <best_dir>/x_scaler.npz.
+    """
+    from features import export_scaler
+
+    from model_training import load_best_artifacts
+
+    best_dir = Path(best_dir)
+    out_dir = Path(out_dir) if out_dir else best_dir / INFER_DIRNAME
+    src = best_dir / "best_vae.keras"
+    if not src.exists():
+        src = best_dir / "final_vae.keras"
+    vae, _, config = load_best_artifacts(str(best_dir))
+    _, W, F = (int(d) if d else None for d in vae.inputs[0].shape)
+    H = int(vae.outputs[0].shape[1])
+
+    module = InferenceVAE(vae, xla=xla)
+    module.save(out_dir)
+    meta = {
+        "W": W,
+        "H": H,
+        "F": F,
+        "latent": int(module.encoder.outputs[0].shape[-1]),
+        "xla": bool(xla),
+        "source": src.name,
+        "source_hash": file_hash(src),
+        "feature_cols": config.get("feature_cols", []),
+        "exported": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    X = np.random.default_rng(0).normal(size=(n_check, W, F)).astype("float32")
+    with open(out_dir / META_NAME, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    diff = check_parity(vae, LoadedInference(out_dir), X, atol=atol)
+    meta["parity_max_abs_diff"] = diff
+    with open(out_dir / META_NAME, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    print(f"Đã xuất model suy luận -> {os.path.abspath(out_dir)} (parity {diff:.2e})")
+
+    if numpy_runtime:
+        np_path = export_numpy(vae, best_dir / NUMPY_NAME, meta["source_hash"])
+        diff = check_parity(vae, load_numpy_vae(np_path), X, atol=max(atol, 1e-4))
+        print(
+            f"Đã xuất runtime NumPy -> {os.path.abspath(np_path)} (parity {diff:.2e})"
+        )
+    sc_path = export_scaler(best_dir, F)
+    if sc_path is not None:
+        print(f"Đã xuất scaler float32 -> {os.path.abspath(sc_path)}")
+    return out_dir
+
+
+if __name__ == "__main__":
+    BEST_DIR = "/home/namphuong/course_materials/web/web/best_model"
+    export_inference(BEST_DIR)
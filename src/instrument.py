@@ -0,0 +1,272 @@
+# src/instrument.py
+from __future__ import annotations
+import csv
+import functools
+import inspect
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+try:  # psutil là tuỳ chọn: không có thì đọc /proc (Linux) hoặc ru_maxrss
+    import psutil
+
+    _PROC = psutil.Process()
+except Exception:  # pragma: no cover
+    _PROC = None
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> int:
+    """RSS hiện tại của process."""
+    if _PROC is not None:
+        return _PROC.memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except OSError:
+        if resource is None:
+            return 0
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r if sys.platform == "darwin" else r * 1024
+
+
+def n_rows(obj) -> Optional[int]:
+    """Số dòng của DataFrame/array/list; tuple -> phần tử đầu; không đo được -> None."""
+    if isinstance(obj, tuple) and obj:
+        obj = obj[0]
+    if obj is None or isinstance(obj, (str, bytes, os.PathLike, dict)):
+        return None
+    shape = getattr(obj, "shape", None)
+    if shape:
+        return int(shape[0])
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+# ====== Bộ ghi: gộp theo (bước, tên hàm) ======
+class _Span:
+    __slots__ = ("name", "step", "t0", "c0", "peak", "rows_in", "rows_out")
+
+    def __init__(self, name, step, rows_in):
+        self.name = name
+        self.step = step
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak = rss_bytes()
+        self.t0 = time.perf_counter()
+        self.c0 = time.process_time()
+
+
+class Recorder:
+    """
+    Thu số đo của các bước pipeline và các hàm nóng (thread-safe).
+    Mỗi (bước, tên) gộp thành 1 dòng: số lần gọi, wall/CPU tổng, peak RSS, rows vào/ra.
+    - CPU là process_time (toàn process): các bước chạy song song thì CPU của chúng chồng lên nhau
+    - peak RSS lấy mẫu bởi 1 thread nền mỗi `interval` giây trong lúc span đang mở
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.stats: Dict[tuple, Dict[str, Any]] = {}
+        self.active: List[_Span] = []
+        self.local = threading.local()
+        self.started = time.time()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    # --- lấy mẫu RSS ---
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_bytes()
+            with self.lock:
+                for sp in self.active:
+                    if rss > sp.peak:
+                        sp.peak = rss
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    # --- bước hiện tại của thread (pipeline đặt khi chạy 1 bước) ---
+    @property
+    def step(self) -> str:
+        return getattr(self.local, "step", "")
+
+    @contextmanager
+    def span(
+        self, name: str, rows_in: Optional[int] = None, step: Optional[str] = None
+    ):
+        """with rec.span("vae.predict", rows_in=len(X)) as sp: ...; sp.rows_out = len(y)"""
+        self._ensure_sampler()
+        sp = _Span(name, self.step if step is None else step, rows_in)
+        with self.lock:
+            self.active.append(sp)
+        try:
+            yield sp
+        finally:
+            wall = time.perf_counter() - sp.t0
+            cpu = time.process_time() - sp.c0
+            rss = rss_bytes()
+            with self.lock:
+                self.active.remove(sp)
+                st = self.stats.setdefault(
+                    (sp.step, sp.name),
+                    {
+                        "step": sp.step,
+                        "name": sp.name,
+                        "calls": 0,
+                        "wall_s": 0.0,
+                        "cpu_s": 0.0,
+                        "peak_rss_mb": 0.0,
+                        "rows_in": None,
+                        "rows_out": None,
+                    },
+                )
+                st["calls"] += 1
+                st["wall_s"] += wall
+                st["cpu_s"] += cpu
+                st["peak_rss_mb"] = max(st["peak_rss_mb"], max(sp.peak, rss) / 2**20)
+                for k in ("rows_in", "rows_out"):
+                    v = getattr(sp, k)
+                    if v is not None:
+                        st[k] = (st[k] or 0) + int(v)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        with self.lock:
+            out = [dict(st) for st in self.stats.values()]
+        for st in out:
+            st["wall_s"] = round(st["wall_s"], 4)
+            st["cpu_s"] = round(st["cpu_s"], 4)
+            st["peak_rss_mb"] = round(st["peak_rss_mb"], 1)
+            n = st["rows_in"] if st["rows_in"] is not None else st["rows_out"]
+            st["rows_per_s"] = (
+                round(n / st["wall_s"], 1)
+                if n is not None and st["wall_s"] > 0
+                else None
+            )
+        return out
+
+    def write_report(self, path: str | Path, extra: Optional[Dict[str, Any]] = None):
+        """
+        Ghi báo cáo run: <path>.json (kèm thông tin máy) và <path>.csv (1 dòng / (bước, tên)).
+        path có thể có đuôi .json/.csv hoặc không.
+        """
+        path = Path(path)
+        base = path.with_suffix("") if path.suffix in (".json", ".csv") else path
+        base.parent.mkdir(parents=True, exist_ok=True)
+        rows = self.rows()
+        meta = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            **(extra or {}),
+        }
+        with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump({"run": meta, "records": rows}, f, ensure_ascii=False, indent=2)
+        cols = [
+            "step",
+            "name",
+            "calls",
+            "wall_s",
+            "cpu_s",
+            "peak_rss_mb",
+            "rows_in",
+            "rows_out",
+            "rows_per_s",
+        ]
+        with open(base.with_suffix(".csv"), "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=cols)
+            w.writeheader()
+            w.writerows(rows)
+        return base.with_suffix(".json"), base.with_suffix(".csv")
+
+
+RECORDER = Recorder()
+
+
+def span(name: str, rows_in: Optional[int] = None):
+    return RECORDER.span(name, rows_in=rows_in)
+
+
+def timed(name: Optional[str] = None, rows_arg: int = 0):
+    """
+    Decorator cho hàm nóng: ghi wall/CPU/peak RSS; rows vào = n_rows(tham số thứ rows_arg,
+    truyền theo vị trí hay theo tên đều được), rows ra = n_rows(kết quả).
+    """
+
+    def deco(fn: Callable):
+        label = name or fn.__qualname__
+        arg_name = list(inspect.signature(fn).parameters)[rows_arg]
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if len(args) > rows_arg:
+                rows_in = n_rows(args[rows_arg])
+            else:
+                rows_in = n_rows(kwargs.get(arg_name))
+            with RECORDER.span(label, rows_in=rows_in) as sp:
+                out = fn(*args, **kwargs)
+                sp.rows_out = n_rows(out)
+            return out
+
+        return wrapper
+
+    return deco
+
+
+# ====== Profile từng bước (tuỳ chọn) ======
+@contextmanager
+def profiled(out_dir: Optional[str | Path], label: str, tool: str = "cprofile"):
+    """
+    Profile khối lệnh trong thread hiện tại và ghi ra out_dir:
+      cprofile   -> <label>.prof (xem bằng snakeviz / pstats)
+      pyinstrument -> <label>.html (cần pip install pyinstrument; thiếu thì dùng cProfile)
+    out_dir=None -> không làm gì.
+    """
+    if not out_dir:
+        yield
+        return
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    Profiler = None
+    if tool == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("⚠️  Chưa cài pyinstrument -> dùng cProfile")
+    if Profiler is not None:
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            (out_dir / f"{label}.html").write_text(prof.output_html(), encoding="utf-8")
+        return
+
+    import cProfile
+
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(str(out_dir / f"{label}.prof"))
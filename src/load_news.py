@@ -5,15 +5,28 @@ import json
 import pandas as pd
 from typing import Iterable, List, Optional
 
+from news_store import DEFAULT_STORE, NewsStore, ensure_migrated
+
 
 def read_data_folders(
     root_dir: str = "dataset/data_news",
     target_folders: Optional[Iterable[str]] = None,
+    store_path: Optional[str] = None,
 ) -> pd.DataFrame:
     """
     Đọc tất cả file JSON/CSV trong các thư mục con và ghép lại.
     Thêm cột 'folder' = tên thư mục con. KHÔNG xử lý nội dung.
+    Có store_path (news_store.sqlite đã tồn tại) -> đọc 1 file SQLite thay vì từng file JSON;
+    JSON cũ trong root_dir chưa được migrate (theo dấu trong store) thì nạp vào trước.
     """
+    if store_path and os.path.exists(store_path):
+        store = NewsStore(store_path)
+        try:
+            ensure_migrated(store, root_dir, "article")
+            return store.read("article", target_folders)
+        finally:
+            store.close()
+
     if target_folders is None:
         target_folders = [
             d
@@ -188,17 +201,27 @@ def clean_news_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-# Ví dụ chạy nhanh
-if __name__ == "__main__":
-    root_dir = "dataset/data_news/"
-    target_folders = ["vnz", "itc", "cmc", "fpt", "gas", "sgt", "oil", "plx", "pvg"]
+NEWS_FOLDERS = ["vnz", "itc", "cmc", "fpt", "gas", "sgt", "oil", "plx", "pvg"]
+
 
-    raw = read_data_folders(root_dir, target_folders)
+def load_clean_news(
+    root_dir: str = "dataset/data_news/",
+    target_folders: Optional[Iterable[str]] = NEWS_FOLDERS,
+    store_path: Optional[str] = DEFAULT_STORE,
+) -> pd.DataFrame:
+    """Đọc (ưu tiên kho gộp) + làm sạch -> bảng (content, ngay_dang, source) cho pre_news."""
+    raw = read_data_folders(root_dir, target_folders, store_path=store_path)
     print("Raw shape:", raw.shape)
 
     data = clean_news_dataframe(raw)
     data = data[["content", "ngay_dang", "source"]]
-    data = data.dropna(subset=["content", "ngay_dang", "source"]).reset_index(drop=True)
+    return data.dropna(subset=["content", "ngay_dang", "source"]).reset_index(drop=True)
+
+
+# Ví dụ chạy nhanh
+if __name__ == "__main__":
+    # Ưu tiên kho gộp (python src/news_store.py để migrate từ các file JSON cũ)
+    data = load_clean_news("dataset/data_news/", NEWS_FOLDERS, DEFAULT_STORE)
     print("Clean shape:", data.shape)
     print(data.head())
 
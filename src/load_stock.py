@@ -1,19 +1,114 @@
+import json
+import os
 from pathlib import Path
+
+import numpy as np
 import pandas as pd
 
+MANIFEST_VERSION = 1
+
+
+def _manifest_path(out_csv: Path) -> Path:
+    return out_csv.with_name(out_csv.name + ".manifest.json")
+
+
+def _load_manifest(path: Path) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            m = json.load(f)
+        if m.get("version") == MANIFEST_VERSION:
+            return m
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def _file_sig(f: Path) -> dict:
+    st = f.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_csv(f: Path) -> pd.DataFrame:
+    try:
+        return pd.read_csv(f)
+    except UnicodeDecodeError:
+        # fallback nếu file không phải UTF-8
+        return pd.read_csv(f, encoding="latin1")
+
+
+def _merge_sorted(old_blk, new_blk, time_col):
+    """
+    Trộn 2 khối đã sắp theo time của cùng 1 mã (new thắng khi trùng time), O(n) —
+    không sort lại. Trường hợp thường gặp (chỉ thêm đuôi) là nối thẳng.
+    """
+    if old_blk.empty:
+        return new_blk
+    if new_blk.empty:
+        return old_blk
+    if new_blk[time_col].iloc[0] > old_blk[time_col].iloc[-1]:
+        return pd.concat([old_blk, new_blk], ignore_index=True)
+    old_blk = old_blk[~old_blk[time_col].isin(new_blk[time_col])]
+    o, m = len(old_blk), len(new_blk)
+    pos = np.searchsorted(
+        old_blk[time_col].to_numpy(), new_blk[time_col].to_numpy(), side="right"
+    )
+    dest_new = pos + np.arange(m)
+    take = np.empty(o + m, dtype=np.int64)
+    is_old = np.ones(o + m, dtype=bool)
+    is_old[dest_new] = False
+    take[is_old] = np.arange(o)
+    take[dest_new] = o + np.arange(m)
+    both = pd.concat([old_blk, new_blk], ignore_index=True)
+    return both.iloc[take].reset_index(drop=True)
+
+
+def _read_stock_csv(f: Path, parse_date_col: str) -> pd.DataFrame:
+    df = _read_csv(f)
+    if "symbol" not in df.columns:
+        df["symbol"] = f.name.split("_history_")[0]
+    if parse_date_col in df.columns:
+        df[parse_date_col] = pd.to_datetime(df[parse_date_col], errors="coerce")
+    return df
+
+
+def _write_manifest(man_path: Path, rows: int, sym_max: dict, files: dict):
+    with open(man_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "version": MANIFEST_VERSION,
+                "rows": int(rows),
+                "symbols": {s: str(t.date()) for s, t in sorted(sym_max.items())},
+                "files": files,
+            },
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
 
 def merge_stock_csvs(
     input_dir: str | Path = "/home/namphuong/course_materials/web/dataset/stock",
     out_csv: str | Path = "/home/namphuong/course_materials/web/dataset/data.csv",
     parse_date_col: str = "time",
     add_source_col: bool = True,
+    full_rebuild: bool = False,
 ) -> Path:
     """
-    Gộp tất cả *.csv trong input_dir thành 1 file CSV duy nhất.
-    - Chuẩn hoá cột thời gian -> datetime (nếu có)
-    - Thêm cột 'source_file' (tên file) để truy vết (có thể tắt)
-    - Bỏ trùng hoàn toàn (duplicate rows)
-    - Sắp xếp theo symbol, time nếu có các cột này
+    Gộp tất cả *.csv trong input_dir thành 1 file CSV duy nhất (gộp tăng dần).
+    - Manifest <out_csv>.manifest.json ghi các file đã gộp (size, mtime, khoảng ngày) và
+      ngày cuối đã gộp của từng mã -> lần sau chỉ đọc file mới/đã đổi; không có gì đổi
+      thì không đọc/ghi lại data.csv
+    - File đã gộp mà đổi: coi là được nối thêm đuôi -> chỉ lấy dòng sau max_time cũ của
+      file (sửa dòng cũ trong file đã gộp -> full_rebuild=True)
+    - Mọi dòng mới đều sau ngày cuối đã gộp của mã: nối thẳng vào cuối data.csv (mode "a"),
+      không đọc lại data.csv. Trong data.csv, dòng của 1 mã luôn tăng dần theo time
+      nhưng các mã có thể xen nhau ở phần đuôi đã nối (bước 3 sắp lại theo symbol, time)
+    - Có dòng chèn vào giữa lịch sử (backfill): đọc data.csv, trộn lại đúng khối của các
+      mã bị ảnh hưởng (file mtime mới hơn thắng khi trùng (symbol, time)), ghi lại
+      data.csv theo (symbol, time)
+    - File bị xoá khỏi input_dir: các dòng đã gộp vẫn giữ (append-only), mục của file
+      bị xoá khỏi manifest
+    full_rebuild=True: bỏ qua manifest, gộp lại từ đầu.
     Trả về đường dẫn file đầu ra.
     """
     input_dir = Path(input_dir)
@@ -22,32 +117,94 @@ def merge_stock_csvs(
     if not files:
         raise FileNotFoundError(f"Không tìm thấy CSV trong: {input_dir}")
 
-    frames = []
-    for f in files:
-        try:
-            df = pd.read_csv(f)
-        except UnicodeDecodeError:
-            # fallback nếu file không phải UTF-8
-            df = pd.read_csv(f, encoding="latin1")
-        # chuẩn hoá cột thời gian nếu tồn tại
-        if parse_date_col in df.columns:
-            df[parse_date_col] = pd.to_datetime(df[parse_date_col], errors="coerce")
-        frames.append(df)
+    man_path = _manifest_path(out_csv)
+    manifest = {} if full_rebuild or not out_csv.exists() else _load_manifest(man_path)
+    merged_files = manifest.get("files", {})
+    sym_max = {s: pd.Timestamp(t) for s, t in manifest.get("symbols", {}).items()}
 
-    # Hợp nhất outer để không mất cột nào nếu schema khác nhau giữa các file
-    merged = pd.concat(frames, ignore_index=True, join="outer")
+    changed = [
+        f for f in files if merged_files.get(f.name, {}).get("sig") != _file_sig(f)
+    ]
+    names = {f.name for f in files}
+    gone = [n for n in merged_files if n not in names]
+    if manifest and not changed:
+        if gone:  # chỉ có file bị xoá: dòng đã gộp giữ nguyên, chỉ dọn manifest
+            files_left = {n: e for n, e in merged_files.items() if n not in gone}
+            _write_manifest(man_path, manifest.get("rows", 0), sym_max, files_left)
+        return out_csv
 
-    # Bỏ trùng hoàn toàn (mọi cột giống nhau)
-    merged = merged.drop_duplicates()
+    # Đọc file mới/đổi; file mtime mới hơn đứng sau -> thắng khi trùng khoá
+    changed.sort(key=lambda f: f.stat().st_mtime_ns)
+    frames, entries = [], {}
+    for f in changed:
+        df = _read_stock_csv(f, parse_date_col)
+        t = df[parse_date_col].dropna()
+        entries[f.name] = {
+            "sig": _file_sig(f),
+            "rows": int(len(df)),
+            "min_time": None if t.empty else str(t.min().date()),
+            "max_time": None if t.empty else str(t.max().date()),
+        }
+        prev_max = merged_files.get(f.name, {}).get("max_time")
+        if prev_max is not None:  # phần đầu file đã nằm trong data.csv
+            df = df[df[parse_date_col] > pd.Timestamp(prev_max)]
+        frames.append(df)
+    merged_files = {
+        n: e for n, e in {**merged_files, **entries}.items() if n not in gone
+    }
 
-    # Sắp xếp nếu có các cột liên quan
-    sort_cols = [c for c in ["symbol", parse_date_col] if c in merged.columns]
-    if sort_cols:
-        merged = merged.sort_values(sort_cols)
+    key = ["symbol", parse_date_col]
+    new = pd.concat(frames, ignore_index=True, join="outer")
+    new = new.drop_duplicates(subset=key, keep="last")
+    new = new.sort_values(key, kind="stable").reset_index(drop=True)
+    groups = dict(tuple(new.groupby("symbol", sort=False)))
 
-    # Ghi ra CSV
     out_csv.parent.mkdir(parents=True, exist_ok=True)
-    merged.to_csv(out_csv, index=False)
+    if manifest:
+        header = list(pd.read_csv(out_csv, nrows=0).columns)
+        # NaT (mã mới) so sánh ra False -> coi là đuôi
+        tail = ~(new[parse_date_col] <= new["symbol"].map(sym_max))
+        if tail.all() and set(new.columns) <= set(header):
+            if len(new):
+                new.reindex(columns=header).to_csv(
+                    out_csv, mode="a", header=False, index=False
+                )
+            for sym, g in groups.items():
+                t = g[parse_date_col].max()
+                if pd.notna(t):
+                    sym_max[sym] = max(t, sym_max.get(sym, t))
+            _write_manifest(
+                man_path, manifest.get("rows", 0) + len(new), sym_max, merged_files
+            )
+            return out_csv
+
+        old = pd.read_csv(out_csv, parse_dates=[parse_date_col])
+        cols = header + [c for c in new.columns if c not in header]
+        blocks = {}
+        # mã không có dòng mới giữ nguyên khối; mã có dòng mới trộn 1 lần với khối của nó
+        for sym, blk in old.groupby("symbol", sort=False):
+            if sym in groups:
+                blk = _merge_sorted(
+                    blk.reset_index(drop=True),
+                    groups[sym].reset_index(drop=True),
+                    parse_date_col,
+                )
+            blocks[sym] = blk
+        for sym in groups.keys() - blocks.keys():
+            blocks[sym] = groups[sym]
+        merged = pd.concat(
+            [blocks[s] for s in sorted(blocks)], ignore_index=True, join="outer"
+        )[cols]
+    else:
+        merged = new
+
+    # Ghi ra CSV (file tạm + replace để không bao giờ để lại data.csv dở dang)
+    tmp = out_csv.with_name(out_csv.name + ".tmp")
+    merged.to_csv(tmp, index=False)
+    os.replace(tmp, out_csv)
+
+    sym_max = merged.groupby("symbol")[parse_date_col].max().dropna().to_dict()
+    _write_manifest(man_path, len(merged), sym_max, merged_files)
     return out_csv
 
 
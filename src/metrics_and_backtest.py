@@ -1,16 +1,274 @@
 # metrics_and_backtest.py
 import numpy as np
+import pandas as pd
+
+from features import feature_matrix, get_layout, window_batch
+from instrument import span
+
+METRIC_COLS = ["n", "rmse", "mape", "da", "ta", "sda"]
+_AXES = ("symbol", "origin", "horizon")  # trục của mảng (S, O, H)
+_LABELS = ("symbol", "origin", "period", "horizon")  # cột nhóm của bảng kết quả
 
 
 def _safe_div(a, b):
     return a / np.clip(b, 1e-12, None)
 
 
+def _as_paths(actual, pred, p0):
+    """
+    Đưa về dạng (S, O, H): S mã × O điểm gốc dự báo × H bước.
+    actual/pred: (H,), (O, H) hoặc (S, O, H); p0 (giá ngay trước bước 1): (), (O,) hoặc (S, O).
+    """
+    a = np.asarray(actual, dtype="float64")
+    p = np.asarray(pred, dtype="float64")
+    if a.shape != p.shape:
+        raise ValueError(f"actual {a.shape} và pred {p.shape} khác shape")
+    if not 1 <= a.ndim <= 3:
+        raise ValueError(f"Cần mảng 1-D/2-D/3-D, nhận {a.ndim}-D")
+    lead = (1,) * (3 - a.ndim)
+    a = a.reshape(lead + a.shape)
+    p = p.reshape(lead + p.shape)
+    p0 = np.asarray(p0, dtype="float64")[..., np.newaxis]
+    return a, p, np.broadcast_to(p0, a.shape[:2] + (1,))
+
+
+def metric_sums(actual, pred, p0):
+    """
+    Phần đóng góp của từng điểm (S, O, H) vào mọi metric — cộng theo trục nào thì
+    được metric gộp theo trục đó. NaN ở actual/pred/p0 -> điểm (và các cặp/bộ ba
+    chứa nó) bị loại, nên có thể đệm NaN khi các mã có số origin khác nhau.
+      - n, se, ape: số điểm hợp lệ, bình phương sai số, |sai số %|
+      - da_*: chiều bước h (so với h-1; bước 1 so với p0)
+      - ta_*, sda_*: cần 3 điểm liên tiếp, gán vào bước cuối của bộ ba (bước 1 luôn 0)
+    """
+    a, p, p0 = _as_paths(actual, pred, p0)
+    ok = np.isfinite(a) & np.isfinite(p)
+    err = np.where(ok, p - a, 0.0)
+    sums = {
+        "n": ok,
+        "se": err**2,
+        "ape": np.abs(_safe_div(err, np.where(ok, a, 1.0))),
+    }
+
+    # ghép p0 vào đầu: chuỗi H+1 điểm
+    a_ext = np.concatenate([p0, a], axis=-1)
+    p_ext = np.concatenate([p0, p], axis=-1)
+    ok_ext = np.concatenate([np.isfinite(p0), ok], axis=-1)
+    with np.errstate(invalid="ignore"):
+        a_dir = np.sign(np.diff(a_ext, axis=-1))  # (S,O,H)
+        p_dir = np.sign(np.diff(p_ext, axis=-1))
+        a_slope = np.sign(a_ext[..., 2:] - a_ext[..., :-2])  # (S,O,H-1)
+        p_slope = np.sign(p_ext[..., 2:] - p_ext[..., :-2])
+    ok2 = ok_ext[..., 1:] & ok_ext[..., :-1]
+    ok3 = ok2[..., 1:] & ok2[..., :-1]
+
+    pad = np.zeros(a.shape[:2] + (1,), dtype=bool)
+    sums["da_hit"] = ok2 & (a_dir == p_dir)
+    sums["da_n"] = ok2
+    turn_hit = (a_dir[..., 1:] != a_dir[..., :-1]) == (
+        p_dir[..., 1:] != p_dir[..., :-1]
+    )
+    sums["ta_hit"] = np.concatenate([pad, ok3 & turn_hit], axis=-1)
+    sums["ta_n"] = np.concatenate([pad, ok3], axis=-1)
+    sums["sda_hit"] = np.concatenate([pad, ok3 & (a_slope == p_slope)], axis=-1)
+    sums["sda_n"] = sums["ta_n"]
+    return sums
+
+
+def _ratios(tot):
+    """Tổng đóng góp -> metric (mẫu = 0 -> NaN)."""
+    n = np.asarray(tot["n"], dtype="float64")
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "n": n.astype("int64"),
+            "rmse": np.sqrt(np.asarray(tot["se"]) / n),
+            "mape": np.asarray(tot["ape"]) / n * 100.0,
+            "da": np.asarray(tot["da_hit"]) / np.asarray(tot["da_n"]),
+            "ta": np.asarray(tot["ta_hit"]) / np.asarray(tot["ta_n"]),
+            "sda": np.asarray(tot["sda_hit"]) / np.asarray(tot["sda_n"]),
+        }
+
+
+def reduce_metrics(sums, by=("symbol",)):
+    """Cộng các phần đóng góp qua các trục KHÔNG nằm trong `by` rồi chia -> metric."""
+    axes = tuple(i for i, ax in enumerate(_AXES) if ax not in by)
+    return _ratios({k: np.sum(v, axis=axes, dtype="float64") for k, v in sums.items()})
+
+
+def evaluate_paths(
+    actual, pred, p0, by=("symbol",), symbols=None, origins=None, period="M"
+) -> pd.DataFrame:
+    """
+    Tính RMSE, MAPE, DA, TA, SDA cho cả khối dự báo bằng vài phép reduce NumPy.
+      actual, pred: (H,), (O, H) hoặc (S, O, H) — giá thật / giá dự báo
+      p0: giá quan sát cuối trước bước 1 của mỗi đường dự báo, shape (), (O,) hoặc (S, O)
+      by: các trục giữ lại, tập con của ("symbol", "origin", "period", "horizon");
+          () = gộp tất cả (pooled), ("symbol",) = mỗi mã 1 dòng, ("horizon",) = theo bước
+      symbols: nhãn S mã; origins: nhãn O điểm gốc, (O,) hoặc (S, O)
+      period: tần suất pandas ("M", "Q", "Y"...) khi by có "period" (origins phải là thời gian)
+    Trả về bảng tidy: cột theo `by` + METRIC_COLS; bỏ các dòng không có điểm hợp lệ.
+    """
+    return _table(metric_sums(actual, pred, p0), by, symbols, origins, period)
+
+
+def _table(sums, by, symbols=None, origins=None, period="M") -> pd.DataFrame:
+    """evaluate_paths trên metric_sums đã tính sẵn (dùng lại cho nhiều cách nhóm)."""
+    unknown = set(by) - set(_LABELS)
+    if unknown:
+        raise ValueError(f"Trục không hợp lệ: {sorted(unknown)} (có: {_LABELS})")
+    if "period" in by and origins is None:
+        raise ValueError("by='period' cần origins là thời gian")
+    by = tuple(ax for ax in _LABELS if ax in by)
+    # period = nhóm các origin -> giữ trục origin rồi groupby
+    keep = tuple(ax for ax in _AXES if ax in by or (ax == "origin" and "period" in by))
+    S, O, H = sums["n"].shape
+    axes = tuple(i for i, ax in enumerate(_AXES) if ax not in keep)
+    tot = {k: np.sum(v, axis=axes, dtype="float64").ravel() for k, v in sums.items()}
+    shape = tuple({"symbol": S, "origin": O, "horizon": H}[ax] for ax in keep)
+    grid = np.indices(shape).reshape(len(keep), -1) if keep else np.zeros((0, 1), int)
+
+    cols = {}
+    for ax, idx in zip(keep, grid):
+        if ax == "symbol":
+            cols[ax] = np.asarray(symbols if symbols is not None else range(S))[idx]
+        elif ax == "origin":
+            if origins is None:
+                cols[ax] = idx
+            else:
+                org = np.asarray(origins)
+                if org.ndim == 2:  # mỗi mã 1 dãy origin riêng
+                    s_idx = grid[keep.index("symbol")] if "symbol" in keep else 0
+                    cols[ax] = org[s_idx, idx]
+                else:
+                    cols[ax] = org[idx]
+        else:
+            cols[ax] = idx + 1  # bước 1..H
+
+    if "period" in by:
+        org = pd.DatetimeIndex(pd.to_datetime(cols.pop("origin")))
+        cols["period"] = org.to_period(period).astype(str)
+        g = pd.DataFrame({**{ax: cols[ax] for ax in by}, **tot})
+        g = g[g["n"] > 0].groupby(list(by), sort=True).sum().reset_index()
+        cols = {ax: g[ax].to_numpy() for ax in by}
+        tot = {k: g[k].to_numpy() for k in sums}
+
+    res = _ratios(tot)
+    out = pd.DataFrame(
+        {**{ax: cols[ax] for ax in by}, **{k: np.ravel(res[k]) for k in METRIC_COLS}}
+    )
+    return out[out["n"] > 0].reset_index(drop=True)
+
+
+def path_metrics(actual, pred, p0) -> dict:
+    """Metric gộp của 1 (hoặc nhiều) đường dự báo -> dict {n, rmse, mape, da, ta, sda}."""
+    res = reduce_metrics(metric_sums(actual, pred, p0), by=())
+    return {k: (int(v) if k == "n" else float(v)) for k, v in res.items()}
+
+
+def backtest_and_forecast_symbol(
+    vae,
+    symbol,
+    windows_fn,
+    prices,
+    times,
+    W,
+    H,
+    backtest_days=60,
+    lookback_hist_plot=120,
+    mc_samples=0,
+    encoder_cache=None,
+    seed=None,
+):
+    """
+    Walk-forward backtest 1-step (stitched) trên 'backtest_days' ngày cuối của 1 mã rồi
+    forecast H ngày, chỉ trên mảng có sẵn (không nạp model/tiền xử lý):
+    windows_fn(ends) -> (B, W, F) cửa sổ đã scale kết thúc ở ends; prices (T,) float64;
+    times (T,) Series datetime. Trả về dict backtest_df / future_df / metrics_backtest /
+    history_df như infer_backtest_and_future_symbol. seed: nhiễu Monte Carlo của dải
+    phân vị (cùng seed -> cùng q.., không phụ thuộc thứ tự/process chạy các mã).
+    """
+    from forecaster import forecast_bands, forecast_windows
+
+    T = len(prices)
+    if T < W + backtest_days + 1:
+        raise ValueError(f"{symbol}: cần >= {W + backtest_days + 1} dòng, hiện có {T}")
+
+    # Vùng backtest: chuỗi dự báo 1-step stitched cho 'backtest_days' ngày cuối
+    start_bt_idx = max(T - backtest_days, W)  # đủ cửa sổ W trước ngày dự báo đầu tiên
+
+    # cửa sổ kết thúc ở t-1 dự báo ngày t (e = t); cửa sổ cuối (e = T) cho forecast
+    ends = np.arange(start_bt_idx, T + 1)
+    windows = windows_fn(ends)
+    end_dates = [t.isoformat() for t in times.iloc[ends - 1]]
+    # Dự báo H bước log-return cho mọi cửa sổ trong 1 lượt; bước 1 để stitch
+    with span("vae.predict", rows_in=len(ends)):
+        y, latent = forecast_windows(
+            vae, windows, encoder_cache, str(symbol).upper(), end_dates
+        )
+    # chuyển log-return -> giá: giá ngày trước * exp(r1)
+    pred_bt_1step = np.asarray(
+        prices[ends[:-1] - 1] * np.exp(y[:-1, 0, 0]), dtype="float64"
+    )
+    actual_bt = prices[start_bt_idx:]
+    times_bt = times[start_bt_idx:]
+
+    # Metrics trên backtest
+    valid = np.isfinite(pred_bt_1step)
+    if not np.any(valid):
+        raise RuntimeError("Không có dự báo hợp lệ trong vùng backtest.")
+    first_valid_pos = int(np.flatnonzero(valid)[0])
+    # p0: giá ngay trước điểm so sánh đầu tiên
+    p0 = float(prices[start_bt_idx + first_valid_pos - 1])
+
+    # các điểm từ dự báo hợp lệ đầu tiên; NaN phía sau được evaluate_paths bỏ qua
+    m = path_metrics(actual_bt[first_valid_pos:], pred_bt_1step[first_valid_pos:], p0)
+    metrics = {k: m[k] for k in ("rmse", "mape", "da", "ta", "sda")}
+    metrics = {"days": m["n"], **metrics}
+
+    # Forecast H ngày tương lai từ điểm cuối
+    last_price = float(prices[-1])
+    pred_future = last_price * np.exp(np.cumsum(y[-1, :, 0], dtype="float64"))
+    bands = {}
+    if mc_samples > 0:
+        # K mẫu latent cho cửa sổ cuối -> phân vị giá theo từng bước
+        with span("vae.sample", rows_in=mc_samples):
+            bands = forecast_bands(
+                vae,
+                windows[-1:],
+                [last_price],
+                k=mc_samples,
+                seed=seed,
+                latent=None if latent is None else (latent[0][-1:], latent[1][-1:]),
+            )
+
+    # thời gian tương lai (ước lượng theo tần suất 2 điểm cuối)
+    freq = times.iloc[-1] - times.iloc[-2] if T >= 2 else pd.Timedelta(0)
+    if freq <= pd.Timedelta(0):
+        freq = pd.Timedelta(days=1)
+    fut_times = [times.iloc[-1] + (i + 1) * freq for i in range(H)]
+
+    hist_start = max(0, T - lookback_hist_plot)
+    df_bt = pd.DataFrame(
+        {"time": times_bt.values, "actual": actual_bt, "pred_1step": pred_bt_1step}
+    )
+    df_fut = pd.DataFrame({"time": fut_times, "pred_price": pred_future})
+    for name, v in bands.items():
+        df_fut["mc_mean" if name == "mean" else name] = v[0]
+    df_hist = pd.DataFrame(
+        {"time": times.iloc[hist_start:].values, "actual": prices[hist_start:]}
+    )
+    return {
+        "backtest_df": df_bt,
+        "future_df": df_fut,
+        "metrics_backtest": metrics,
+        "history_df": df_hist,
+    }
+
+
+# ====== API cũ cho 1 chuỗi 1-D (giữ để tương thích) ======
 def compute_rmse_mape(actual_prices, pred_prices):
-    err = pred_prices - actual_prices
-    rmse = float(np.sqrt(np.mean(err**2)))
-    mape = float(np.mean(np.abs(_safe_div(err, actual_prices))) * 100.0)
-    return rmse, mape
+    m = path_metrics(actual_prices, pred_prices, np.nan)
+    return m["rmse"], m["mape"]
 
 
 def compute_da(actual_prices, pred_prices, p0):
@@ -18,9 +276,7 @@ def compute_da(actual_prices, pred_prices, p0):
     DA: tỷ lệ đúng chiều tăng/giảm theo từng bước.
     p0 = giá quan sát cuối cùng ngay trước horizon (mốc để lấy chênh lệch bước đầu tiên)
     """
-    a = np.concatenate([[p0], actual_prices])
-    p = np.concatenate([[p0], pred_prices])
-    return float(np.mean(np.sign(np.diff(a)) == np.sign(np.diff(p))))
+    return path_metrics(actual_prices, pred_prices, p0)["da"]
 
 
 def compute_ta(actual_prices, pred_prices, p0):
@@ -28,15 +284,7 @@ def compute_ta(actual_prices, pred_prices, p0):
     TA: đúng điểm đổi chiều (sign đổi giữa 2 bước liên tiếp).
     Cần >= 3 điểm trong horizon, nếu không trả về NaN.
     """
-    a = np.concatenate([[p0], actual_prices])
-    p = np.concatenate([[p0], pred_prices])
-    if len(a) < 3 or len(p) < 3:
-        return float("nan")
-    a_dir = np.sign(np.diff(a))
-    p_dir = np.sign(np.diff(p))
-    a_turn = a_dir[1:] != a_dir[:-1]
-    p_turn = p_dir[1:] != p_dir[:-1]
-    return float(np.mean(a_turn == p_turn))
+    return path_metrics(actual_prices, pred_prices, p0)["ta"]
 
 
 def compute_sda(actual_prices, pred_prices, p0):
@@ -45,76 +293,357 @@ def compute_sda(actual_prices, pred_prices, p0):
     So sánh dấu của 'độ dốc' 2-bước: sign(x_{t+1} - x_{t-1}) giữa actual & predicted.
     Cần >= 3 điểm trong horizon, nếu không trả về NaN.
     """
-    a = np.concatenate([[p0], actual_prices])
-    p = np.concatenate([[p0], pred_prices])
-    if len(a) < 3 or len(p) < 3:
-        return float("nan")
-    a_slope = np.sign(a[2:] - a[:-2])
-    p_slope = np.sign(p[2:] - p[:-2])
-    return float(np.mean(a_slope == p_slope))
+    return path_metrics(actual_prices, pred_prices, p0)["sda"]
 
 
-def backtest_multi_symbol(vae, df, feature_cols, scaler, target_col, window, horizon):
+def _agg_details(table: pd.DataFrame):
+    """Bảng theo symbol -> (trung bình các mã, {symbol: metric})."""
+    cols = ["rmse", "mape", "da", "ta", "sda"]
+    details = {
+        r["symbol"]: {k: float(r[k]) for k in cols}
+        for r in table.to_dict(orient="records")
+    }
+    agg = {k: float(np.nanmean(table[k])) if len(table) else np.nan for k in cols}
+    return agg, details
+
+
+def rolling_backtest(
+    vae,
+    df,
+    feature_cols,
+    scaler,
+    target_col,
+    window,
+    horizon,
+    stride=1,
+    last_n=None,
+    batch_size=1024,
+    mem_budget_mb=256,
+    period="M",
+):
     """
-    - Với mỗi symbol: lấy cửa sổ (W) ngay TRƯỚC H ngày cuối, dự báo H bước (log-return).
-    - Dựng giá bằng exp(r).
-    - Tính RMSE, MAPE, DA, TA, SDA cho từng symbol, rồi lấy trung bình.
+    Đánh giá rolling-origin: với mỗi mã, mọi điểm gốc e (cửa sổ X[e-W:e] -> dự báo giá
+    e..e+H-1), cách nhau `stride` ngày tính ngược từ origin cuối (trùng mode="last");
+    last_n: chỉ lấy last_n origin cuối của mỗi mã.
+    - Cửa sổ là strided view (sliding_window_view), không copy cả khối (N, W, F)
+    - Khung gọn (sym_id): chỉ scale khối số (N, Fd); one-hot ghi thẳng vào buffer
+    - Gom cửa sổ của nhiều mã vào 1 buffer cố định ~mem_budget_mb rồi vae.predict(batch_size)
+    Trả về dict: overall, by_symbol, by_horizon, by_period (cần cột time) + n_windows.
     """
-    rmses, mapes, das, tas, sdas = [], [], [], [], []
-    details = {}
+    from numpy.lib.stride_tricks import sliding_window_view
 
+    lay = get_layout(feature_cols, scaler)
+    compact = lay.fast and not all(c in df.columns for c in feature_cols)
+    syms, views, sym_rows, origin_idx, actuals, p0s, origins = ([] for _ in range(7))
+    has_time = "time" in df.columns
     for sym, dfg in df.groupby("symbol"):
-        n = len(dfg)
-        if n < window + horizon:
+        T = len(dfg)
+        if T < window + horizon:
             continue
+        if compact:  # (T, Fd) + 1 dòng one-hot (đã scale) của mã
+            X_all = lay.dense(dfg)
+            sym_rows.append(lay.sym_block(lay.ids(dfg)[:1])[0])
+        else:
+            X_all = feature_matrix(dfg, feature_cols, scaler)
+        prices = dfg[target_col].to_numpy(dtype="float64", copy=False)
+        idx = np.arange(T - horizon, window - 1, -stride)[::-1]
+        if last_n:
+            idx = idx[-last_n:]
+        syms.append(sym)
+        # views[s][k] = X_all[k : k+W]  -> cửa sổ của origin e là views[s][e - W]
+        views.append(sliding_window_view(X_all, window, axis=0).transpose(0, 2, 1))
+        origin_idx.append(idx)
+        actuals.append(sliding_window_view(prices, horizon)[idx])  # (n, H)
+        p0s.append(prices[idx - 1])
+        if has_time:
+            origins.append(pd.to_datetime(dfg["time"]).to_numpy()[idx - 1])
+        else:
+            origins.append(idx - 1)
 
-        X_all = scaler.transform(
-            dfg[feature_cols].to_numpy(dtype="float32", copy=False)
-        )
-        bt_window = X_all[-horizon - window : -horizon]  # (W,F)
-        if bt_window.shape[0] != window:
+    if len(syms) == 0:
+        return {"n_windows": 0}
+
+    S, O = len(syms), max(len(i) for i in origin_idx)
+    n_feat = len(feature_cols)
+    actual = np.full((S, O, horizon), np.nan)
+    pred_rets = np.full((S, O, horizon), np.nan)
+    p0 = np.full((S, O), np.nan)
+    if has_time:
+        org = np.full((S, O), np.datetime64("NaT"), dtype="datetime64[ns]")
+    else:
+        org = np.full((S, O), -1)
+    for s in range(S):
+        n = len(origin_idx[s])
+        actual[s, :n] = actuals[s]
+        p0[s, :n] = p0s[s]
+        org[s, :n] = origins[s]
+
+    # chunk: số cửa sổ vừa ngân sách bộ nhớ (buffer float32 W×F mỗi cửa sổ)
+    chunk = max(1, int(mem_budget_mb * 2**20 // (window * n_feat * 4)))
+    chunk = min(chunk, sum(len(i) for i in origin_idx))
+    buf = np.empty((chunk, window, n_feat), dtype="float32")
+    pending, fill = [], 0
+
+    def flush():
+        with span("vae.predict", rows_in=fill):
+            r = vae.predict(buf[:fill], batch_size=batch_size, verbose=0)[:, :, 0]
+        pos = 0
+        for s, lo, hi in pending:
+            pred_rets[s, lo:hi] = r[pos : pos + hi - lo]
+            pos += hi - lo
+
+    for s, idx in enumerate(origin_idx):
+        lo = 0
+        while lo < len(idx):
+            k = min(len(idx) - lo, chunk - fill)
+            if compact:
+                out = buf[fill : fill + k]
+                out[..., lay.dense_pos] = views[s][idx[lo : lo + k] - window]
+                out[..., lay.sym_pos] = sym_rows[s]
+            else:
+                np.take(
+                    views[s],
+                    idx[lo : lo + k] - window,
+                    axis=0,
+                    out=buf[fill : fill + k],
+                )
+            pending.append((s, lo, lo + k))
+            fill += k
+            lo += k
+            if fill == chunk:
+                flush()
+                pending, fill = [], 0
+    if fill:
+        flush()
+
+    pred = p0[..., None] * np.exp(np.cumsum(pred_rets, axis=-1))
+    sums = metric_sums(actual, pred, p0)
+    kw = {"symbols": syms, "origins": org, "period": period}
+    tables = {
+        "n_windows": int(np.isfinite(p0).sum()),
+        "overall": _table(sums, (), **kw),
+        "by_symbol": _table(sums, ("symbol",), **kw),
+        "by_horizon": _table(sums, ("horizon",), **kw),
+    }
+    if has_time:
+        tables["by_period"] = _table(sums, ("period",), **kw)
+    return tables
+
+
+def compare_backtest(
+    models,
+    groups,
+    target_col,
+    last_n=60,
+    stride=1,
+    horizon=None,
+    batch_size=1024,
+    mem_budget_mb=256,
+    period="M",
+):
+    """
+    So sánh nhiều model trên CÙNG các điểm gốc backtest (rolling-origin như
+    rolling_backtest).
+      models: [{"name", "vae", "W", "H", "group"}]; group = chỉ số trong groups
+      groups: [(df, feature_cols, scaler)] — 1 khung đã căn cột cho mỗi bộ đặc trưng
+              khác nhau (cùng số dòng mỗi mã); model cùng đặc trưng dùng chung 1 group
+    - Origin chung: mọi e có đủ cửa sổ W lớn nhất và đủ `horizon` (mặc định = H nhỏ
+      nhất) ngày thật phía sau; last_n origin cuối mỗi mã, cách nhau stride ngày
+    - Mỗi group: ma trận đã scale tính 1 lần/mã; cửa sổ dài nhất của group dựng 1 lần
+      mỗi chunk (~mem_budget_mb), model W nhỏ hơn dùng view [:, -W:] của cùng khối
+    - Mọi model dự báo trên khối đó (vae.predict theo batch_size); metric chỉ tính trên
+      `horizon` bước đầu để các model H khác nhau so được với nhau
+    Trả về dict: overall (1 dòng/model), by_symbol, by_horizon, by_period (cần cột
+    time) — bảng dài có cột model — + n_windows, horizon.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    if not models:
+        raise ValueError("Cần ít nhất 1 model để so sánh")
+    Hc = min(int(m["H"]) for m in models)
+    if horizon is not None:
+        if int(horizon) > Hc:
+            raise ValueError(f"horizon={horizon} lớn hơn H nhỏ nhất ({Hc})")
+        Hc = int(horizon)
+    W_max = max(int(m["W"]) for m in models)
+    W_group = [
+        max([int(m["W"]) for m in models if m["group"] == g], default=0)
+        for g in range(len(groups))
+    ]
+
+    # origin chung, tính trên khung của group đầu (mọi group cùng dòng)
+    base = groups[0][0]
+    has_time = "time" in base.columns
+    syms, origin_idx, actuals, p0s, origins = ([] for _ in range(5))
+    for sym, dfg in base.groupby("symbol"):
+        T = len(dfg)
+        if T < W_max + Hc:
+            continue
+        prices = dfg[target_col].to_numpy(dtype="float64", copy=False)
+        idx = np.arange(T - Hc, W_max - 1, -stride)[::-1]
+        if last_n:
+            idx = idx[-last_n:]
+        syms.append(sym)
+        origin_idx.append(idx)
+        actuals.append(sliding_window_view(prices, Hc)[idx])
+        p0s.append(prices[idx - 1])
+        if has_time:
+            origins.append(pd.to_datetime(dfg["time"]).to_numpy()[idx - 1])
+        else:
+            origins.append(idx - 1)
+    if len(syms) == 0:
+        return {"n_windows": 0, "horizon": Hc}
+
+    # views[g][s][k] = X_all[k : k+W_g] của mã s -> cửa sổ của origin e là [e - W_g]
+    views = []
+    for g, (df, feature_cols, scaler) in enumerate(groups):
+        if W_group[g] == 0:
+            views.append(None)
             continue
+        frames = dict(tuple(df.groupby("symbol")))
+        vs = []
+        for sym in syms:
+            X_all = feature_matrix(frames[sym], feature_cols, scaler)
+            vs.append(sliding_window_view(X_all, W_group[g], axis=0).transpose(0, 2, 1))
+        views.append(vs)
 
-        # dự báo log-return rồi dựng giá
-        pred_rets = vae.predict(bt_window[np.newaxis], verbose=0)[0, :, 0]  # (H,)
-        start_price = float(dfg[target_col].iloc[-horizon - 1])
+    # mọi cặp (mã, origin) trải phẳng, theo thứ tự mã
+    sym_of = np.concatenate([np.full(len(i), s) for s, i in enumerate(origin_idx)])
+    pos_of = np.concatenate([np.arange(len(i)) for i in origin_idx])
+    ends = np.concatenate(origin_idx)
+    B = len(ends)
+    preds = {m["name"]: np.empty((B, Hc), dtype="float64") for m in models}
 
-        pred_prices = [start_price]
-        for r in pred_rets:
-            pred_prices.append(pred_prices[-1] * np.exp(float(r)))
-        pred_prices = np.asarray(pred_prices[1:], dtype="float64")  # (H,)
+    n_feat = max(len(fc) for _, fc, _ in groups)
+    chunk = max(1, int(mem_budget_mb * 2**20 // (W_max * n_feat * 4)))
+    for lo in range(0, B, chunk):
+        hi = min(B, lo + chunk)
+        # đoạn liền nhau của cùng 1 mã trong chunk
+        cuts = lo + np.flatnonzero(np.diff(sym_of[lo:hi])) + 1
+        runs = list(zip([lo, *cuts], [*cuts, hi]))
+        for g, vs in enumerate(views):
+            if vs is None:
+                continue
+            Wg = W_group[g]
+            block = np.empty((hi - lo, Wg, len(groups[g][1])), dtype="float32")
+            for a, b in runs:
+                np.take(
+                    vs[sym_of[a]], ends[a:b] - Wg, axis=0, out=block[a - lo : b - lo]
+                )
+            for m in models:
+                if m["group"] != g:
+                    continue
+                W = int(m["W"])
+                with span("vae.predict", rows_in=hi - lo):
+                    r = m["vae"].predict(
+                        block[:, Wg - W :], batch_size=batch_size, verbose=0
+                    )
+                preds[m["name"]][lo:hi] = r[:, :Hc, 0]
 
-        actual_prices = (
-            dfg[target_col].iloc[-horizon:].to_numpy(dtype="float64", copy=False)
-        )
+    S, O = len(syms), max(len(i) for i in origin_idx)
+    actual = np.full((S, O, Hc), np.nan)
+    p0 = np.full((S, O), np.nan)
+    if has_time:
+        org = np.full((S, O), np.datetime64("NaT"), dtype="datetime64[ns]")
+    else:
+        org = np.full((S, O), -1)
+    for s in range(S):
+        n = len(origin_idx[s])
+        actual[s, :n] = actuals[s]
+        p0[s, :n] = p0s[s]
+        org[s, :n] = origins[s]
 
-        rmse, mape = compute_rmse_mape(actual_prices, pred_prices)
-        da = compute_da(actual_prices, pred_prices, p0=start_price)
-        ta = compute_ta(actual_prices, pred_prices, p0=start_price)
-        sda = compute_sda(actual_prices, pred_prices, p0=start_price)
+    kw = {"symbols": syms, "origins": org, "period": period}
+    names = {"overall": (), "by_symbol": ("symbol",), "by_horizon": ("horizon",)}
+    if has_time:
+        names["by_period"] = ("period",)
+    parts = {k: [] for k in names}
+    for m in models:
+        pred_rets = np.full((S, O, Hc), np.nan)
+        pred_rets[sym_of, pos_of] = preds[m["name"]]
+        pred = p0[..., None] * np.exp(np.cumsum(pred_rets, axis=-1))
+        sums = metric_sums(actual, pred, p0)
+        for k, by in names.items():
+            t = _table(sums, by, **kw)
+            t.insert(0, "model", m["name"])
+            if k == "overall":
+                t.insert(1, "W", int(m["W"]))
+                t.insert(2, "H", int(m["H"]))
+            parts[k].append(t)
 
-        rmses.append(rmse)
-        mapes.append(mape)
-        das.append(da)
-        tas.append(ta)
-        sdas.append(sda)
+    tables = {k: pd.concat(v, ignore_index=True) for k, v in parts.items()}
+    tables["n_windows"] = B
+    tables["horizon"] = Hc
+    return tables
 
-        details[sym] = {"rmse": rmse, "mape": mape, "da": da, "ta": ta, "sda": sda}
 
-    if len(rmses) == 0:
+def backtest_multi_symbol(
+    vae,
+    df,
+    feature_cols,
+    scaler,
+    target_col,
+    window,
+    horizon,
+    mode="last",
+    **rolling_kw,
+):
+    """
+    mode="last":
+    - Với mỗi symbol: lấy cửa sổ (W) ngay TRƯỚC H ngày cuối, dự báo H bước (log-return).
+      Các cửa sổ được gom thành 1 batch (S, W, F) -> 1 lần vae.predict.
+    - Dựng giá bằng exp(cumsum(r)).
+    - Tính RMSE, MAPE, DA, TA, SDA cho từng symbol (evaluate_paths), rồi lấy trung bình.
+    mode="rolling": mọi origin của mỗi mã (rolling_backtest, nhận stride/last_n/
+    batch_size/mem_budget_mb); metric từng mã gộp trên tất cả origin.
+    """
+    if mode == "rolling":
+        tables = rolling_backtest(
+            vae, df, feature_cols, scaler, target_col, window, horizon, **rolling_kw
+        )
+        if tables["n_windows"] == 0:
+            return {
+                "rmse": np.inf,
+                "mape": np.inf,
+                "da": np.nan,
+                "ta": np.nan,
+                "sda": np.nan,
+            }, {}
+        return _agg_details(tables["by_symbol"])
+    if mode != "last":
+        raise ValueError(f"mode không hợp lệ: {mode} (last | rolling)")
+
+    syms, windows, p0s, actuals = [], [], [], []
+    for sym, dfg in df.groupby("symbol"):
+        if len(dfg) < window + horizon:
+            continue
+        prices = dfg[target_col].to_numpy(dtype="float64", copy=False)
+        syms.append(sym)
+        end = [len(dfg) - horizon]
+        windows.append(window_batch(dfg, feature_cols, scaler, end, window)[0])  # (W,F)
+        p0s.append(prices[-horizon - 1])
+        actuals.append(prices[-horizon:])
+
+    if len(syms) == 0:
         return {
             "rmse": np.inf,
             "mape": np.inf,
             "da": np.nan,
             "ta": np.nan,
             "sda": np.nan,
-        }, details
-
-    agg = {
-        "rmse": float(np.mean(rmses)),
-        "mape": float(np.mean(mapes)),
-        "da": float(np.mean(das)),
-        "ta": float(np.nanmean(tas)),
-        "sda": float(np.nanmean(sdas)),
-    }
-    return agg, details
+        }, {}
+
+    # dự báo log-return cả batch rồi dựng giá
+    with span("vae.predict", rows_in=len(windows)):
+        pred_rets = vae.predict(np.stack(windows), verbose=0)[:, :, 0]  # (S,H)
+    p0s = np.asarray(p0s, dtype="float64")
+    pred_prices = p0s[:, None] * np.exp(np.cumsum(pred_rets.astype("float64"), axis=1))
+
+    table = evaluate_paths(
+        np.stack(actuals)[:, None, :],  # (S,1,H)
+        pred_prices[:, None, :],
+        p0s[:, None],
+        by=("symbol",),
+        symbols=syms,
+    )
+    return _agg_details(table)
@@ -6,6 +6,8 @@ import numpy as np
 import pandas as pd
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
+from instrument import timed
+
 # ====== 1. Load PhoBERT model ======
 MODEL_NAME = "wonrax/phobert-base-vietnamese-sentiment"
 tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
@@ -14,6 +16,7 @@ model.eval()
 
 
 # ====== 2. Chấm điểm sentiment cho list câu ======
+@timed("score_sentences_vi")
 def score_sentences_vi(texts, batch_size=32, max_length=256, device=None):
     device = device or ("cuda" if torch.cuda.is_available() else "cpu")
     model.to(device)
@@ -66,13 +69,50 @@ def compute_article_sentiment_from_df(
     return pd.DataFrame(rows)
 
 
-# ====== 4. Tính sentiment trung bình theo NGÀY ======
-def compute_daily_sentiment_from_df(df_articles_with_date, date_col="date"):
-    return (
-        df_articles_with_date.groupby(date_col)[["p_neg", "p_neu", "p_pos"]]
-        .mean()
-        .reset_index()
+# ====== 3b. Sentiment theo bài, tái dùng điểm cho bản trùng (sau dedup_news) ======
+def compute_article_sentiment_dedup(
+    df_sent: pd.DataFrame,
+    article_col="article_id",
+    text_col="cau",
+    canonical_col="canonical_id",
+    hash_col="sent_hash",
+) -> pd.DataFrame:
+    """
+    Giống compute_article_sentiment_from_df nhưng:
+      - chỉ chấm câu của bài canonical (bản trùng lấy lại điểm của bài gốc)
+      - mỗi câu (theo sent_hash) chỉ đưa qua PhoBERT 1 lần, gom batch toàn bộ
+    df_sent cần các cột canonical_id, sent_hash (output của dedup_news.dedup_sentences_df).
+    """
+    canon = df_sent[df_sent[article_col] == df_sent[canonical_col]]
+    uniq = canon.drop_duplicates(hash_col)
+    P = score_sentences_vi(uniq[text_col].astype(str).tolist())
+    scores = pd.DataFrame(P, columns=["p_neg", "p_neu", "p_pos"])
+    scores[hash_col] = uniq[hash_col].to_numpy()
+
+    per_sent = canon[[article_col, hash_col]].merge(scores, on=hash_col, how="left")
+    agg = per_sent.groupby(article_col)[["p_neg", "p_neu", "p_pos"]].mean()
+
+    # Bài không còn câu nào -> mặc định NEG (giữ quy ước cũ)
+    arts = df_sent[[article_col, canonical_col]].drop_duplicates(article_col)
+    out = arts.merge(agg, left_on=canonical_col, right_index=True, how="left").fillna(
+        {"p_neg": 1.0, "p_neu": 0.0, "p_pos": 0.0}
     )
+    out["compound"] = out["p_pos"] - out["p_neg"]
+    return out.reset_index(drop=True)
+
+
+# ====== 4. Tính sentiment trung bình theo NGÀY ======
+def compute_daily_sentiment_from_df(
+    df_articles_with_date, date_col="date", canonical_col=None
+):
+    """
+    Trung bình p_neg/p_neu/p_pos theo ngày.
+    Nếu có canonical_col: mỗi cụm bài trùng chỉ tính 1 lần/ngày (tránh bài đăng lại kéo lệch trung bình).
+    """
+    df = df_articles_with_date
+    if canonical_col and canonical_col in df.columns:
+        df = df.drop_duplicates([date_col, canonical_col])
+    return df.groupby(date_col)[["p_neg", "p_neu", "p_pos"]].mean().reset_index()
 
 
 # ====== 5. Xuất JSON ======
@@ -85,35 +125,113 @@ def export_daily_json(df_daily, out_path, date_col="date"):
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
 
-# ====== 6. Main: chạy thử pipeline ======
-if __name__ == "__main__":
-    input_csv = "/home/namphuong/course_materials/web/dataset/sentences_clean.csv"
-    df_sent = pd.read_csv(input_csv)
+# ====== 5b. Sentiment theo (symbol, ngày) + số bài ======
+STORE_COLS = ["symbol", "time", "p_neg", "p_neu", "p_pos", "n_articles"]
+
+
+def compute_symbol_daily_sentiment(
+    df_articles, symbol_col="ticket", date_col="date", canonical_col=None
+) -> pd.DataFrame:
+    """
+    Trung bình p_neg/p_neu/p_pos theo (symbol, ngày) kèm n_articles.
+    Bài trùng (cùng canonical_col) chỉ tính 1 lần cho mỗi (symbol, ngày).
+    """
+    df = df_articles
+    if canonical_col and canonical_col in df.columns:
+        df = df.drop_duplicates([symbol_col, date_col, canonical_col])
+    out = (
+        df.groupby([symbol_col, date_col])
+        .agg(
+            p_neg=("p_neg", "mean"),
+            p_neu=("p_neu", "mean"),
+            p_pos=("p_pos", "mean"),
+            n_articles=("p_neg", "size"),
+        )
+        .reset_index()
+        .rename(columns={symbol_col: "symbol", date_col: "time"})
+    )
+    out["symbol"] = out["symbol"].astype(str).str.strip().str.upper()
+    out["time"] = pd.to_datetime(out["time"], errors="coerce")
+    out = out.dropna(subset=["time"])
+    out[["p_neg", "p_neu", "p_pos"]] = out[["p_neg", "p_neu", "p_pos"]].astype(
+        "float32"
+    )
+    out["n_articles"] = out["n_articles"].astype("int32")
+    return out.sort_values(["symbol", "time"]).reset_index(drop=True)[STORE_COLS]
+
 
+def export_sentiment_store(df_sym_daily, out_path):
+    """Ghi bảng (symbol, time, p_neg, p_neu, p_pos, n_articles): .parquet (cần pyarrow) hoặc .csv"""
+    out_path = str(out_path)
+    if out_path.endswith(".parquet"):
+        df_sym_daily.to_parquet(out_path, index=False)
+    else:
+        df_sym_daily.to_csv(out_path, index=False, date_format="%Y-%m-%d")
+
+
+# ====== 6. Chạy cả chuỗi trên DataFrame câu (dùng cho main / pipeline) ======
+def run_sentiment(df_sent: pd.DataFrame, out_json=None, out_store=None):
+    """
+    Câu (article_id, date, ticket, cau[, canonical_id, sent_hash]) -> sentiment bài, ngày, (mã, ngày).
+    Ghi JSON theo ngày và bảng theo từng mã nếu có đường dẫn. Trả về (art_df, daily_df, sym_daily_df).
+    """
     # Làm sạch cơ bản
     df_sent = df_sent.dropna(subset=["article_id", "date", "cau"]).copy()
     df_sent["cau"] = df_sent["cau"].astype(str)
 
-    print(f"Loaded {len(df_sent)} sentences from {input_csv}")
-
-    # 1) Sentiment cho từng article
-    art_df = compute_article_sentiment_from_df(
-        df_sent, article_col="article_id", text_col="cau"
-    )
+    # 1) Sentiment cho từng article (tái dùng điểm cho bản trùng nếu đã dedup)
+    has_dedup = {"canonical_id", "sent_hash"}.issubset(df_sent.columns)
+    if has_dedup:
+        art_df = compute_article_sentiment_dedup(
+            df_sent, article_col="article_id", text_col="cau"
+        )
+    else:
+        art_df = compute_article_sentiment_from_df(
+            df_sent, article_col="article_id", text_col="cau"
+        )
 
     # 2) Gắn lại cột ngày
     art_df = art_df.merge(
-        df_sent[["article_id", "date"]].drop_duplicates(),
+        df_sent[["article_id", "date", "ticket"]].drop_duplicates("article_id"),
         on="article_id",
         how="left",
     )
 
     # 3) Tính sentiment theo ngày
-    daily_df = compute_daily_sentiment_from_df(art_df, date_col="date")
+    daily_df = compute_daily_sentiment_from_df(
+        art_df, date_col="date", canonical_col="canonical_id" if has_dedup else None
+    )
 
     # 4) Xuất ra file JSON
+    if out_json:
+        export_daily_json(daily_df, out_json)
+
+    # 5) Bảng sentiment theo từng mã (pre_stock ưu tiên dùng nếu tồn tại)
+    sym_daily_df = compute_symbol_daily_sentiment(
+        art_df,
+        symbol_col="ticket",
+        date_col="date",
+        canonical_col="canonical_id" if has_dedup else None,
+    )
+    if out_store:
+        export_sentiment_store(sym_daily_df, out_store)
+    return art_df, daily_df, sym_daily_df
+
+
+# ====== 7. Main: chạy thử pipeline ======
+if __name__ == "__main__":
+    input_csv = "/home/namphuong/course_materials/web/dataset/sentences_dedup.csv"
+    if not pd.io.common.file_exists(input_csv):
+        # chưa chạy dedup_news -> dùng câu chưa gắn canonical_id
+        input_csv = "/home/namphuong/course_materials/web/dataset/sentences_clean.csv"
+    df_sent = pd.read_csv(input_csv)
+    print(f"Loaded {len(df_sent)} sentences from {input_csv}")
+
     out_json = "/home/namphuong/course_materials/web/dataset/daily_scores_vi.json"
-    export_daily_json(daily_df, out_json)
+    out_store = (
+        "/home/namphuong/course_materials/web/dataset/daily_scores_by_symbol.csv"
+    )
+    art_df, daily_df, sym_daily_df = run_sentiment(df_sent, out_json, out_store)
 
     print("Article-level sentiment:")
     print(art_df.head())
@@ -122,3 +240,4 @@ if __name__ == "__main__":
     print(daily_df.head())
 
     print(f"✅ Saved daily sentiment to {out_json}")
+    print(f"✅ Saved per-symbol sentiment to {out_store}")
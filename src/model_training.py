@@ -13,7 +13,10 @@ import tensorflow as tf
 from tensorflow.keras import layers
 from tensorflow.keras import backend as K
 from tensorflow.keras.models import load_model
-from metrics_and_backtest import compute_rmse_mape, compute_da, compute_ta, compute_sda
+from metrics_and_backtest import backtest_and_forecast_symbol
+from instrument import timed
+from forecaster import load_forecaster
+from features import SYM_ID, SYM_PREFIX, feature_matrix, symbol_ids, window_batch
 import matplotlib.pyplot as plt
 
 
@@ -42,13 +45,15 @@ class KLDivergenceLayer(layers.Layer):
 # -----------------------------
 # 2) Load mô hình, scaler, config
 # -----------------------------
-def load_best_artifacts(best_dir: str):
+def load_best_artifacts(best_dir: str, runtime: str = "keras"):
     """
     Nạp best model + scaler + config từ thư mục best_overall (hoặc tương đương).
     Yêu cầu tồn tại:
       - config.json (chứa W, H, TARGET_COL, feature_cols, ...)
       - x_scaler.pkl (sklearn scaler với .transform)
       - best_vae.keras (ưu tiên) hoặc final_vae.keras
+    runtime: keras (mặc định) | export | numpy | auto — xem forecaster.py; mọi runtime
+    đều có .predict(X, verbose=0) như keras.
     Trả về: (model_vae, scaler, config_dict)
     """
     cfg_path = os.path.join(best_dir, "config.json")
@@ -70,25 +75,28 @@ def load_best_artifacts(best_dir: str):
         config = json.load(f)
     scaler = joblib.load(scl_path)
 
-    vae = load_model(
-        model_path,
-        custom_objects={"Sampling": Sampling, "KLDivergenceLayer": KLDivergenceLayer},
-        compile=False,
-    )
+    vae, _ = load_forecaster(best_dir, runtime)
     return vae, scaler, config
 
 
 # -----------------------------
 # 3) Hàm tiền xử lý đa mã (dựa đúng code bạn đã gửi)
 # -----------------------------
+@timed("preprocess_multisymbol_df")
 def preprocess_multisymbol_df(
-    df_raw: pd.DataFrame, use_symbol_onehot: bool = True, clip_abs: float = 1e12
+    df_raw: pd.DataFrame,
+    use_symbol_onehot: bool = True,
+    clip_abs: float = 1e12,
+    dense_onehot: bool = False,
 ):
     """
     - Tính chỉ báo theo từng symbol
     - ret = log-return (log(close_{t+1}/close_t))  -> phù hợp exp(r)
     - Làm sạch NaN/±inf (ffill/bfill trong từng symbol), kẹp biên, ép float32
-    - (tuỳ chọn) thêm one-hot symbol để mô hình phân biệt mã
+    - (tuỳ chọn) one-hot symbol để mô hình phân biệt mã: feature_cols vẫn có các tên
+      sym_* (đúng thứ tự như config.json) nhưng df chỉ giữ cột số nguyên 'sym_id';
+      khối one-hot được bung trong batch đầu vào (features.feature_matrix).
+      dense_onehot=True: thêm luôn các cột sym_* float32 dày như bản cũ.
     Trả về:
       df: DataFrame đã clean, sort theo (symbol,time)
       feature_cols: danh sách cột đặc trưng (KHÔNG gồm 'ret')
@@ -210,13 +218,16 @@ def preprocess_multisymbol_df(
     # ---- One-hot symbol (tuỳ chọn) ----
     symbol_onehot_cols: List[str] = []
     if use_symbol_onehot:
-        sym_ohe = pd.get_dummies(df["symbol"], prefix="sym", dtype="float32")
-        symbol_onehot_cols = list(sym_ohe.columns)
-        df = pd.concat([df, sym_ohe], axis=1)
+        codes = df["symbol"].astype("category").cat
+        symbol_onehot_cols = [f"{SYM_PREFIX}{s}" for s in codes.categories]
+        df[SYM_ID] = codes.codes.astype("int16")  # thứ tự như pd.get_dummies
+        if dense_onehot:
+            sym_ohe = pd.get_dummies(df["symbol"], prefix="sym", dtype="float32")
+            df = pd.concat([df, sym_ohe], axis=1)
         feature_cols = feature_cols + symbol_onehot_cols
 
     # Guard hữu hạn
-    X_check = df[feature_cols].to_numpy()
+    X_check = df[[c for c in feature_cols if c in df.columns]].to_numpy()
     y_check = df["ret"].to_numpy()
     assert (
         np.isfinite(X_check).all() and np.isfinite(y_check).all()
@@ -231,13 +242,20 @@ def preprocess_multisymbol_df(
 def align_features_for_infer(df_clean: pd.DataFrame, config: Dict[str, Any]):
     """
     Đảm bảo df_clean có đủ và đúng thứ tự cột trong config['feature_cols'].
-    Nếu thiếu cột (ví dụ one-hot symbol không xuất hiện ở batch hiện tại) thì thêm cột=0.0
+    Cột số thiếu thì thêm cột=0.0. Khối one-hot sym_* không được thêm dày: 'sym_id' được
+    đánh lại theo thứ tự sym_* trong config (mã không có trong config -> -1, one-hot 0);
+    lấy ma trận đầu vào bằng features.feature_matrix(df, feature_cols, scaler).
     """
     feature_cols = config["feature_cols"]
-    for c in feature_cols:
+    dense_cols = [
+        c for c in feature_cols if not c.startswith(SYM_PREFIX) or c in df_clean.columns
+    ]
+    for c in dense_cols:
         if c not in df_clean.columns:
             df_clean[c] = 0.0
-    df_clean[feature_cols] = df_clean[feature_cols].astype("float32")
+    df_clean[dense_cols] = df_clean[dense_cols].astype("float32")
+    if len(dense_cols) < len(feature_cols):
+        df_clean[SYM_ID] = symbol_ids(df_clean["symbol"], feature_cols)
     return df_clean, feature_cols
 
 
@@ -267,9 +285,7 @@ def prepare_infer_data(
     df_aligned, feature_cols = align_features_for_infer(df_clean, config)
 
     # scale
-    X_scaled = scaler.transform(
-        df_aligned[feature_cols].to_numpy(dtype="float32", copy=False)
-    )
+    X_scaled = feature_matrix(df_aligned, feature_cols, scaler)
 
     return vae, scaler, config, df_aligned, feature_cols, X_scaled
 
@@ -281,6 +297,11 @@ def infer_backtest_and_future_symbol(
     preprocess_fn,
     lookback_hist_plot: int = 120,  # số ngày lịch sử để vẽ
     backtest_days: int = 60,  # số ngày dùng để backtest stitched
+    runtime: str = "keras",  # keras | export | numpy | auto (forecaster.py)
+    mc_samples: int = 0,  # > 0: dải phân vị Monte Carlo cho forecast
+    seed=None,  # seed nhiễu Monte Carlo (None = ngẫu nhiên mỗi lần)
+    encoder_cache=None,  # EncoderCache (encoder_cache.py), chỉ dùng với export/numpy
+    plot: bool = True,  # False: chỉ tính (evaluation vẽ riêng qua charts.py)
 ):
     """
     Walk-forward backtest 1-step (stitched) trên 'backtest_days' ngày cuối của 1 symbol,
@@ -288,13 +309,14 @@ def infer_backtest_and_future_symbol(
       - backtest_df: time, actual, pred_1step
       - future_df: time, pred_price
       - metrics_backtest: {days, rmse, mape, da, ta, sda}
+      - history_df: time, actual ('lookback_hist_plot' ngày cuối, để vẽ)
     Yêu cầu tồn tại các hàm:
       load_best_artifacts, align_features_for_infer,
-      compute_rmse_mape, compute_da, compute_ta, compute_sda.
+      backtest_and_forecast_symbol (metrics_and_backtest).
     """
 
     # 1) Nạp artifacts & config từ thư mục best
-    vae, scaler, config = load_best_artifacts(best_dir)
+    vae, scaler, config = load_best_artifacts(best_dir, runtime)
     W = int(config.get("W", 90))
     H = int(config.get("H", 7))
     TARGET_COL = config.get("TARGET_COL", "close")
@@ -316,90 +338,52 @@ def infer_backtest_and_future_symbol(
             f"{symbol}: cần >= {W + backtest_days + 1} dòng, hiện có {len(dfg)}"
         )
 
-    # 4) Scale toàn bộ đặc trưng của symbol
-    X_all = scaler.transform(dfg[feature_cols].to_numpy(dtype="float32", copy=False))
-    prices = dfg[TARGET_COL].to_numpy(dtype="float64", copy=False)
-    times = pd.to_datetime(dfg["time"])
-
-    # 5) Xác định vùng backtest: chuỗi dự báo 1-step stitched cho 'backtest_days' ngày cuối
-    start_bt_idx = len(dfg) - backtest_days
-    if start_bt_idx - W < 0:
-        start_bt_idx = W  # đảm bảo đủ cửa sổ W trước ngày dự báo đầu tiên
-
-    pred_bt_1step = []
-    for t in range(start_bt_idx, len(dfg)):
-        s = t - W
-        e = t  # dự báo cho ngày index t dựa vào cửa sổ kết thúc ở t-1
-        window = X_all[s:e]  # (W, F)
-        # Dự báo H bước log-return; lấy bước 1 ngày tới để stitch
-        pred_rets = vae.predict(window[np.newaxis], verbose=0)[0, :, 0]
-        p0 = float(prices[e - 1])
-        p1 = p0 * np.exp(float(pred_rets[0]))  # chuyển log-return -> giá
-        pred_bt_1step.append(p1)
-
-    pred_bt_1step = np.asarray(pred_bt_1step, dtype="float64")
-    actual_bt = prices[start_bt_idx:]
-    times_bt = times[start_bt_idx:]
-
-    # 6) Metrics trên backtest
-    valid = np.isfinite(pred_bt_1step)
-    if not np.any(valid):
-        raise RuntimeError("Không có dự báo hợp lệ trong vùng backtest.")
-    first_valid_pos = int(np.flatnonzero(valid)[0])
-    # p0: giá ngay trước điểm so sánh đầu tiên
-    p0 = float(prices[start_bt_idx + first_valid_pos - 1])
-
-    actual_eval = actual_bt[valid]
-    pred_eval = pred_bt_1step[valid]
-
-    rmse_bt, mape_bt = compute_rmse_mape(actual_eval, pred_eval)
-    da_bt = compute_da(actual_eval, pred_eval, p0=p0)
-    ta_bt = compute_ta(actual_eval, pred_eval, p0=p0)
-    sda_bt = compute_sda(actual_eval, pred_eval, p0=p0)
-
-    metrics = {
-        "days": int(len(actual_eval)),
-        "rmse": float(rmse_bt),
-        "mape": float(mape_bt),
-        "da": float(da_bt),
-        "ta": float(ta_bt),
-        "sda": float(sda_bt),
-    }
-
-    # 7) Forecast H ngày tương lai từ điểm cuối
-    last_window = X_all[-W:]  # (W, F)
-    pred_rets_fut = vae.predict(last_window[np.newaxis], verbose=0)[0, :, 0]
-    last_price = float(prices[-1])
-
-    pred_future = [last_price]
-    for r in pred_rets_fut:
-        pred_future.append(pred_future[-1] * np.exp(float(r)))
-    pred_future = np.array(pred_future[1:], dtype="float64")  # (H,)
-
-    # thời gian tương lai (ước lượng theo tần suất 2 điểm cuối)
-    if len(times) >= 2:
-        freq = times.iloc[-1] - times.iloc[-2]
-        if freq <= pd.Timedelta(0):
-            freq = pd.Timedelta(days=1)
-    else:
-        freq = pd.Timedelta(days=1)
-    fut_times = [times.iloc[-1] + (i + 1) * freq for i in range(H)]
+    # 4-7) Backtest stitched + metrics + forecast H ngày (metrics_and_backtest.py);
+    #      chỉ scale đúng các dòng trong cửa sổ, one-hot bung thẳng vào batch
+    out = backtest_and_forecast_symbol(
+        vae,
+        symbol,
+        lambda ends: window_batch(dfg, feature_cols, scaler, ends, W),
+        dfg[TARGET_COL].to_numpy(dtype="float64", copy=False),
+        pd.to_datetime(dfg["time"]),
+        W,
+        H,
+        backtest_days=backtest_days,
+        lookback_hist_plot=lookback_hist_plot,
+        mc_samples=mc_samples,
+        encoder_cache=encoder_cache,
+        seed=seed,
+    )
 
     # 8) Vẽ biểu đồ: lịch sử + 1-step stitched + forecast H ngày
-    hist_start = max(0, len(dfg) - lookback_hist_plot)
+    if plot:
+        _plot_infer_result(symbol, out, W, H)
+    return out
+
+
+def _plot_infer_result(symbol, out, W, H):
+    """Hình của infer_backtest_and_future_symbol(plot=True): vẽ rồi plt.show()."""
+    hist, fut, metrics = out["history_df"], out["future_df"], out["metrics_backtest"]
+    bt = out["backtest_df"].dropna(subset=["pred_1step"])
+    t_hist, p_hist = pd.to_datetime(hist["time"]), hist["actual"].to_numpy()
+    fut_times, pred_future = pd.to_datetime(fut["time"]), fut["pred_price"]
     plt.figure(figsize=(11, 4.5))
     # Lịch sử
-    plt.plot(times.iloc[hist_start:], prices[hist_start:], label="Actual (history)")
+    plt.plot(t_hist, p_hist, label="Actual (history)")
     # Backtest 1-step stitched
     plt.plot(
-        times_bt[valid],
-        pred_bt_1step[valid],
+        pd.to_datetime(bt["time"]),
+        bt["pred_1step"],
         linestyle="--",
         label=f"1-step stitched (last {metrics['days']}d)",
     )
     # Điểm cuối + Forecast
-    plt.scatter([times.iloc[-1]], [last_price], s=30, label="Last observed", zorder=3)
-    plt.plot(fut_times, pred_future, linestyle="--", label=f"Forecast +{H}")
+    plt.scatter([t_hist.iloc[-1]], [p_hist[-1]], s=30, label="Last observed", zorder=3)
+    (line,) = plt.plot(fut_times, pred_future, linestyle="--", label=f"Forecast +{H}")
+    if "q05" in fut.columns:
+        c = line.get_color()
+        plt.fill_between(fut_times, fut["q05"], fut["q95"], color=c, alpha=0.15)
+        plt.fill_between(fut_times, fut["q25"], fut["q75"], color=c, alpha=0.3)
 
     plt.title(f"{symbol} | Walk-forward backtest + {H}-step forecast (W={W})")
     plt.xlabel("Time")
@@ -422,13 +406,6 @@ def infer_backtest_and_future_symbol(
     plt.tight_layout()
     plt.show()
 
-    # 9) Kết quả trả về
-    df_bt = pd.DataFrame(
-        {"time": times_bt.values, "actual": actual_bt, "pred_1step": pred_bt_1step}
-    )
-    df_fut = pd.DataFrame({"time": fut_times, "pred_price": pred_future})
-    return {"backtest_df": df_bt, "future_df": df_fut, "metrics_backtest": metrics}
-
 
 # -----------------------------
 # 6) Ví dụ sử dụng (comment minh họa)
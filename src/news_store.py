@@ -0,0 +1,255 @@
+# src/news_store.py
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+DEFAULT_STORE = "dataset/news_store.sqlite"
+
+# kind: 'link' (output crawl/link_news) | 'article' (output crawl/data_news)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    kind        TEXT NOT NULL,
+    source      TEXT NOT NULL,          -- tên thư mục cũ: fpt, gas, cmc, ...
+    url         TEXT NOT NULL,          -- khoá; bản ghi không có url dùng 'sha:<hash>'
+    page        TEXT,                   -- file/trang gốc (data_page_3.json, ...)
+    title       TEXT,
+    pub_date    TEXT,
+    payload     TEXT NOT NULL,          -- bản ghi gốc (JSON, cả content) để đọc lại y nguyên
+    empty       INTEGER NOT NULL,       -- 1: crawl lỗi (không title/content) -> được ghi đè
+    inserted_at REAL NOT NULL,
+    PRIMARY KEY (kind, source, url)
+);
+CREATE INDEX IF NOT EXISTS idx_news_source ON news (kind, source);
+CREATE TABLE IF NOT EXISTS meta (
+    key         TEXT PRIMARY KEY,       -- vd. 'migrated:article:<thư mục JSON cũ>'
+    value       TEXT NOT NULL
+);
+"""
+
+
+def _record_key(rec: Dict) -> str:
+    url = rec.get("url")
+    if isinstance(url, str) and url.strip():
+        return url.strip()
+    raw = json.dumps(rec, ensure_ascii=False, sort_keys=True, default=str)
+    return "sha:" + hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _is_empty(rec: Dict) -> int:
+    return int(not any(_text(rec.get(c)) for c in ("title", "content")))
+
+
+def _text(v) -> Optional[str]:
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return None
+    return str(v)
+
+
+class NewsStore:
+    """
+    Kho tin tức gộp (1 file SQLite) thay cho hàng nghìn file page_N.json nhỏ.
+    - Khoá (kind, source, url); ghi kiểu append: bản đã có thì bỏ qua (replace=True để ghi đè),
+      riêng bản crawl lỗi (rỗng) được thay bằng lần crawl thành công sau
+    - Lưu nguyên bản ghi gốc ở cột payload -> read() trả lại đúng các cột như khi đọc JSON
+    - Dùng chung giữa các luồng (có khoá), mỗi lần add() là 1 transaction
+    """
+
+    def __init__(self, db_path: str = DEFAULT_STORE):
+        self.db_path = str(db_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def add(
+        self,
+        kind: str,
+        source: str,
+        records: Iterable[Dict],
+        page: Optional[str] = None,
+        replace: bool = False,
+    ) -> int:
+        """Ghi 1 lô bản ghi (list dict như trong file JSON). Trả về số dòng mới/ghi đè."""
+        now = time.time()
+        rows = []
+        for rec in records:
+            if not isinstance(rec, dict):
+                continue
+            rows.append(
+                (
+                    kind,
+                    source,
+                    _record_key(rec),
+                    page,
+                    _text(rec.get("title")),
+                    _text(rec.get("ngay_dang") or rec.get("pub_date")),
+                    json.dumps(rec, ensure_ascii=False, default=str),
+                    _is_empty(rec),
+                    now,
+                )
+            )
+        if not rows:
+            return 0
+        cond = "" if replace else "WHERE news.empty = 1 AND excluded.empty = 0"
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT INTO news VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(kind, source, url) DO UPDATE SET page = excluded.page, "
+                "title = excluded.title, pub_date = excluded.pub_date, "
+                "payload = excluded.payload, empty = excluded.empty, "
+                f"inserted_at = excluded.inserted_at {cond}",
+                rows,
+            )
+            self.conn.commit()
+            return self.conn.total_changes - before
+
+    def sources(self, kind: str) -> List[str]:
+        with self.lock:
+            return [
+                r[0]
+                for r in self.conn.execute(
+                    "SELECT DISTINCT source FROM news WHERE kind = ? ORDER BY source",
+                    (kind,),
+                )
+            ]
+
+    def read(
+        self, kind: str = "article", sources: Optional[Iterable[str]] = None
+    ) -> pd.DataFrame:
+        """
+        Đọc lại bản ghi gốc + cột 'folder' = source (giống load_news.read_data_folders).
+        Thứ tự: source, page, thứ tự ghi.
+        """
+        sql = "SELECT source, payload FROM news WHERE kind = ?"
+        params: List = [kind]
+        if sources is not None:
+            sources = list(sources)
+            if not sources:
+                return pd.DataFrame()
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            params += sources
+        sql += " ORDER BY source, page, rowid"
+        with self.lock:
+            cur = self.conn.execute(sql, params)
+            rows = []
+            for source, payload in cur:
+                rec = json.loads(payload)
+                rec["folder"] = source
+                rows.append(rec)
+        return pd.DataFrame(rows)
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                f"{k}/{s}": n
+                for k, s, n in self.conn.execute(
+                    "SELECT kind, source, COUNT(*) FROM news GROUP BY kind, source"
+                )
+            }
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# ====== Migrate 1 lần: cây thư mục JSON/CSV cũ -> store ======
+def _load_records(file_path: str) -> List[Dict]:
+    if file_path.lower().endswith(".json"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return [data]
+        return (
+            [r for r in data if isinstance(r, dict)] if isinstance(data, list) else []
+        )
+    try:
+        df = pd.read_csv(file_path, encoding="utf-8", low_memory=False)
+    except UnicodeDecodeError:
+        df = pd.read_csv(file_path, encoding="latin1", low_memory=False)
+    return df.to_dict(orient="records")
+
+
+def _migrated_key(root_dir: str, kind: str) -> str:
+    return f"migrated:{kind}:{os.path.realpath(root_dir)}"
+
+
+def migrate_folder_tree(store: NewsStore, root_dir: str, kind: str) -> Dict[str, int]:
+    """
+    Nạp mọi file .json/.csv trong root_dir/<source>/ vào store (source = tên thư mục con).
+    Chạy lại an toàn: bản ghi đã có (cùng url) bị bỏ qua. Xong thì ghi dấu vào bảng meta.
+    """
+    counts: Dict[str, int] = {}
+    if not os.path.isdir(root_dir):
+        return counts
+    for source in sorted(os.listdir(root_dir)):
+        folder = os.path.join(root_dir, source)
+        if not os.path.isdir(folder):
+            continue
+        n = 0
+        for file in sorted(os.listdir(folder)):
+            if not file.lower().endswith((".json", ".csv")):
+                continue
+            path = os.path.join(folder, file)
+            try:
+                n += store.add(kind, source, _load_records(path), page=file)
+            except Exception as e:
+                print(f"❌ Lỗi đọc {path}: {e}")
+        counts[source] = n
+    store.set_meta(_migrated_key(root_dir, kind), str(time.time()))
+    return counts
+
+
+def ensure_migrated(store: NewsStore, root_dir: str, kind: str) -> Optional[Dict]:
+    """
+    Migrate root_dir vào store nếu store chưa có dấu đã migrate thư mục đó. Xét theo dấu
+    trong bảng meta, KHÔNG theo việc file SQLite đã tồn tại (crawler có thể đã tạo file
+    khi ghi lần đầu). Trả về số bản ghi mới theo source, None nếu đã migrate trước đó.
+    """
+    if not os.path.isdir(root_dir) or store.get_meta(_migrated_key(root_dir, kind)):
+        return None
+    print(f"    Migrate 1 lần {root_dir} ({kind}) -> {store.db_path}")
+    return migrate_folder_tree(store, root_dir, kind)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(
+        description="Gộp dataset/link_news + data_news vào SQLite"
+    )
+    ap.add_argument("--store", default=DEFAULT_STORE)
+    ap.add_argument("--link-dir", default="dataset/link_news")
+    ap.add_argument("--data-dir", default="dataset/data_news")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    store = NewsStore(args.store)
+    links = migrate_folder_tree(store, args.link_dir, "link")
+    arts = migrate_folder_tree(store, args.data_dir, "article")
+    print(f"link mới: {sum(links.values())} | article mới: {sum(arts.values())}")
+    print(f"✅ Đã migrate vào {args.store} trong {time.perf_counter() - t0:.1f}s")
+    store.close()
@@ -0,0 +1,231 @@
+# src/np_runtime.py
+"""
+Chạy VAE dự báo bằng NumPy thuần (không import TensorFlow): đọc trọng số + cấu hình lớp
+xuất từ best_vae.keras (infer_export.export_numpy -> vae_numpy.npz), forward theo batch
+float32. Cùng giao diện với model xuất TF: predict / sample / encode / decode.
+Hỗ trợ các lớp có trong model: Conv1D, LayerNormalization, LSTM, Dense, RepeatVector,
+TimeDistributed(Dense).
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+NUMPY_NAME = "vae_numpy.npz"
+
+
+def file_hash(path: str | Path) -> str:
+    """blake2b nội dung file model gốc -> phát hiện artifact xuất từ model cũ."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+# ====== Hàm kích hoạt ======
+def _sigmoid(x):
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _elu(x):
+    return np.where(x > 0, x, np.expm1(np.minimum(x, 0.0)))
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": _relu,
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+    "elu": _elu,
+}
+
+
+def _act(name: str):
+    if name not in ACTIVATIONS:
+        raise ValueError(f"Chưa hỗ trợ activation '{name}' (có: {list(ACTIVATIONS)})")
+    return ACTIVATIONS[name]
+
+
+# ====== Các lớp (x: float32, batch ở trục 0) ======
+def conv1d(x, kernel, bias, padding="causal", dilation=1, activation="linear"):
+    """x (B, T, Cin), kernel (K, Cin, Cout); stride 1. Cộng dồn K phép matmul theo tap."""
+    K = kernel.shape[0]
+    span = (K - 1) * dilation
+    if padding == "causal":
+        x = np.pad(x, ((0, 0), (span, 0), (0, 0)))
+    elif padding == "same":
+        x = np.pad(x, ((0, 0), (span // 2, span - span // 2), (0, 0)))
+    elif padding != "valid":
+        raise ValueError(f"Chưa hỗ trợ padding '{padding}'")
+    T = x.shape[1] - span
+    out = x[:, 0:T] @ kernel[0]
+    for k in range(1, K):
+        out += x[:, k * dilation : k * dilation + T] @ kernel[k]
+    if bias is not None:
+        out += bias
+    return _act(activation)(out)
+
+
+def layer_norm(x, gamma, beta, epsilon=1e-3):
+    mean = x.mean(axis=-1, keepdims=True)
+    var = np.square(x - mean).mean(axis=-1, keepdims=True)
+    out = (x - mean) / np.sqrt(var + epsilon)
+    if gamma is not None:
+        out *= gamma
+    if beta is not None:
+        out += beta
+    return out
+
+
+def lstm(
+    x,
+    kernel,
+    recurrent,
+    bias,
+    return_sequences=False,
+    activation="tanh",
+    recurrent_activation="sigmoid",
+):
+    """
+    x (B, T, F) -> (B, U) hoặc (B, T, U). Thứ tự cổng như Keras: i, f, c, o.
+    Phần x @ kernel tính 1 lần cho mọi bước; vòng lặp chỉ còn h @ recurrent.
+    """
+    B, T, _ = x.shape
+    U = recurrent.shape[0]
+    act, rec_act = _act(activation), _act(recurrent_activation)
+    xw = x @ kernel
+    if bias is not None:
+        xw += bias
+    h = np.zeros((B, U), dtype=x.dtype)
+    c = np.zeros((B, U), dtype=x.dtype)
+    seq = np.empty((B, T, U), dtype=x.dtype) if return_sequences else None
+    for t in range(T):
+        z = xw[:, t] + h @ recurrent
+        i = rec_act(z[:, :U])
+        f = rec_act(z[:, U : 2 * U])
+        g = act(z[:, 2 * U : 3 * U])
+        o = rec_act(z[:, 3 * U :])
+        c = f * c + i * g
+        h = o * act(c)
+        if seq is not None:
+            seq[:, t] = h
+    return seq if return_sequences else h
+
+
+def dense(x, kernel, bias, activation="linear"):
+    out = x @ kernel
+    if bias is not None:
+        out += bias
+    return _act(activation)(out)
+
+
+def _apply(spec: dict, w: List[np.ndarray], x):
+    kind = spec["kind"]
+    if kind == "conv1d":
+        return conv1d(
+            x,
+            w[0],
+            w[1] if spec["use_bias"] else None,
+            spec["padding"],
+            spec["dilation"],
+            spec["activation"],
+        )
+    if kind == "layer_norm":
+        it = iter(w)
+        gamma = next(it) if spec["scale"] else None
+        beta = next(it) if spec["center"] else None
+        return layer_norm(x, gamma, beta, spec["epsilon"])
+    if kind == "lstm":
+        return lstm(
+            x,
+            w[0],
+            w[1],
+            w[2] if spec["use_bias"] else None,
+            spec["return_sequences"],
+            spec["activation"],
+            spec["recurrent_activation"],
+        )
+    if kind == "dense":  # Dense / TimeDistributed(Dense): matmul trên trục cuối
+        return dense(x, w[0], w[1] if spec["use_bias"] else None, spec["activation"])
+    if kind == "repeat":
+        return np.repeat(x[:, None, :], spec["n"], axis=1)
+    raise ValueError(f"Lớp không hỗ trợ: {kind}")
+
+
+# ====== Model ======
+class NumpyVAE:
+    """
+    Forward encoder -> (mu, logvar) -> decoder bằng NumPy float32.
+    predict(X) dùng z = mu (tất định) như model xuất TF; sample(X, k) lấy k mẫu latent.
+    """
+
+    def __init__(self, spec: dict, weights: Dict[str, np.ndarray]):
+        self.spec = spec
+        self.W, self.H, self.F = spec["W"], spec["H"], spec["F"]
+        self.meta = spec
+
+        def take(layers):
+            return [
+                (l, [weights[f"{l['name']}/{j}"] for j in range(l["n_weights"])])
+                for l in layers
+            ]
+
+        self.encoder = take(spec["encoder"])
+        self.z_mu = take([spec["z_mu"]])[0]
+        self.z_logvar = take([spec["z_logvar"]])[0]
+        self.decoder = take(spec["decoder"])
+
+    def _run(self, layers, x):
+        for spec, w in layers:
+            x = _apply(spec, w, x)
+        return x
+
+    def encode(self, X):
+        h = self._run(self.encoder, np.asarray(X, dtype="float32"))
+        return _apply(*self.z_mu, h), _apply(*self.z_logvar, h)
+
+    def decode(self, Z) -> np.ndarray:
+        return self._run(self.decoder, np.asarray(Z, dtype="float32"))
+
+    def predict(self, X, verbose=0, batch_size: Optional[int] = None) -> np.ndarray:
+        """(B, W, F) -> (B, H, 1); nhận verbose/batch_size như keras Model.predict."""
+        X = np.asarray(X, dtype="float32")
+        if batch_size is None or len(X) <= batch_size:
+            return self.decode(self.encode(X)[0])
+        return np.concatenate(
+            [
+                self.decode(self.encode(X[i : i + batch_size])[0])
+                for i in range(0, len(X), batch_size)
+            ]
+        )
+
+    def sample(self, X, k: int, rng=None) -> np.ndarray:
+        """k mẫu z = mu + exp(0.5*logvar)*eps, decoder 1 lần cho k*B dòng -> (k, B, H, 1)."""
+        rng = np.random.default_rng() if rng is None else rng
+        mu, logvar = self.encode(X)
+        eps = rng.standard_normal((k,) + mu.shape, dtype="float32")
+        z = mu[None] + np.exp(0.5 * logvar)[None] * eps
+        y = self.decode(z.reshape(-1, mu.shape[-1]))
+        return y.reshape((k, mu.shape[0]) + y.shape[1:])
+
+
+def load_numpy_vae(path: str | Path, source_hash: Optional[str] = None) -> NumpyVAE:
+    """
+    Nạp vae_numpy.npz (spec JSON + trọng số). source_hash: hash file .keras hiện tại ->
+    ValueError nếu file được xuất từ model khác.
+    """
+    with np.load(path, allow_pickle=False) as z:
+        spec = json.loads(str(z["__spec__"]))
+        weights = {k: z[k] for k in z.files if k != "__spec__"}
+    if source_hash is not None and spec.get("source_hash") != source_hash:
+        raise ValueError(f"{path} được xuất từ model khác")
+    return NumpyVAE(spec, weights)
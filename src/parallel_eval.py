@@ -0,0 +1,303 @@
+# src/parallel_eval.py
+"""
+Đánh giá theo mã (backtest stitched + forecast H ngày) cho cả universe:
+  - process chính tiền xử lý + scale 1 lần; workers > 0: ghi khối số đã scale (N, Fd)
+    float32, giá, thời gian ra các file .npy trong 1 thư mục tạm -> worker mở bằng
+    np.load(mmap_mode="r"): mọi worker đọc chung page cache, không pickle bản sao dữ liệu
+  - mỗi worker (ProcessPoolExecutor, spawn) nạp model đúng 1 lần ở initializer
+  - tổng số luồng có trần: `threads` chia đều cho các worker (OMP/MKL/OpenBLAS + TF
+    intra/inter op) -> không tranh lõi khi chạy nhiều process TF cùng lúc
+  - kết quả + lỗi trả về theo đúng thứ tự symbols (không phụ thuộc mã nào xong trước)
+workers=0: cùng đường tính trong process hiện tại (model nạp 1 lần, không mmap).
+"""
+
+from __future__ import annotations
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import get_layout, window_batch
+from metrics_and_backtest import backtest_and_forecast_symbol
+from scaled_store import ScaledStore
+
+THREAD_ENV = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+    "TF_NUM_INTEROP_THREADS",
+)
+
+Outcome = Tuple[str, Optional[dict], Optional[str]]  # (symbol, kết quả, lỗi)
+
+
+# ====== Dữ liệu chung (mmap) ======
+class SharedInputs:
+    """
+    Đầu vào của mọi mã nối liền theo thứ tự symbols: dense (N, Fd) đã scale, prices (N,),
+    times (N,) int64 ns; offsets (S+1,) chia dòng theo mã; sym_rows (S, Fs) one-hot đã
+    scale của từng mã. build() ghi thẳng vào file .npy (open_memmap), open() mở lại
+    read-only bằng mmap.
+    """
+
+    FILES = ("dense", "sym_rows", "prices", "times")
+
+    def __init__(self, symbols, offsets, arrays: Dict[str, np.ndarray]):
+        self.symbols = list(symbols)
+        self.offsets = np.asarray(offsets)
+        self.dense = arrays["dense"]
+        self.sym_rows = arrays["sym_rows"]
+        self.prices = arrays["prices"]
+        self.times = arrays["times"]
+
+    @classmethod
+    def build(
+        cls,
+        frames: Sequence[Tuple[str, pd.DataFrame]],
+        feature_cols: Sequence[str],
+        scaler,
+        target_col: str,
+        path: str | Path,
+    ) -> "SharedInputs":
+        lay = get_layout(feature_cols, scaler)
+        if lay.affine is None:
+            raise ValueError(
+                "Cần scaler tách được theo cột để chia sẻ ma trận đã scale"
+            )
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        offsets = np.cumsum([0] + [len(g) for _, g in frames])
+        N, S = int(offsets[-1]), len(frames)
+
+        def mm(name, dtype, shape):
+            return np.lib.format.open_memmap(
+                path / f"{name}.npy", mode="w+", dtype=dtype, shape=shape
+            )
+
+        arrays = {
+            "dense": mm("dense", "float32", (N, len(lay.dense_cols))),
+            "sym_rows": mm("sym_rows", "float32", (S, len(lay.sym_pos))),
+            "prices": mm("prices", "float64", (N,)),
+            "times": mm("times", "int64", (N,)),
+        }
+        for k, (_, g) in enumerate(frames):
+            lo, hi = offsets[k], offsets[k + 1]
+            lay.dense(g, out=arrays["dense"][lo:hi])  # scale thẳng vào file
+            arrays["prices"][lo:hi] = g[target_col].to_numpy(dtype="float64")
+            arrays["times"][lo:hi] = (
+                pd.to_datetime(g["time"]).to_numpy("M8[ns]").view("int64")
+            )
+            if len(g):
+                arrays["sym_rows"][k] = lay.sym_block(lay.ids(g.iloc[:1]))[0]
+        for a in arrays.values():
+            a.flush()
+        symbols = [s for s, _ in frames]
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"symbols": symbols, "offsets": offsets.tolist()}, f)
+        return cls(symbols, offsets, arrays)
+
+    @classmethod
+    def open(cls, path: str | Path) -> "SharedInputs":
+        path = Path(path)
+        with open(path / "meta.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {n: np.load(path / f"{n}.npy", mmap_mode="r") for n in cls.FILES}
+        return cls(meta["symbols"], meta["offsets"], arrays)
+
+    def series(self, k: int):
+        """(prices (T,), times Series) của mã thứ k (view trên mmap)."""
+        lo, hi = self.offsets[k], self.offsets[k + 1]
+        return self.prices[lo:hi], pd.Series(pd.to_datetime(self.times[lo:hi]))
+
+    def store(self, feature_cols, scaler) -> ScaledStore:
+        """ScaledStore có ma trận của từng mã là view trên mmap (không copy)."""
+        mats = {}
+        for k, sym in enumerate(self.symbols):
+            lo, hi = self.offsets[k], self.offsets[k + 1]
+            if hi > lo:
+                mats[sym] = (
+                    self.dense[lo:hi],
+                    self.sym_rows[k],
+                    int(self.times[hi - 1]),
+                )
+        return ScaledStore(get_layout(feature_cols, scaler), "", mats)
+
+
+# ====== Worker ======
+_CTX: dict = {}
+
+
+def _limit_tf_threads(n: int):
+    """Trần luồng TF trong worker; phải gọi trước khi TF khởi tạo runtime."""
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return
+    try:
+        tf.config.threading.set_intra_op_parallelism_threads(n)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    except RuntimeError:  # TF đã khởi tạo
+        pass
+
+
+def _init_worker(best_dir, runtime, shared_dir, feature_cols, scaler, params, threads):
+    from encoder_cache import CACHE_NAME, EncoderCache
+    from forecaster import load_forecaster, model_version
+
+    if runtime != "numpy":
+        _limit_tf_threads(threads)
+    model, _ = load_forecaster(best_dir, runtime)
+    inputs = SharedInputs.open(shared_dir)
+    cache = None
+    if params.pop("encoder_cache", False):
+        # mỗi worker 1 kết nối SQLite (WAL) tới cùng file cache
+        cache = EncoderCache(
+            model_version(best_dir), os.path.join(best_dir, CACHE_NAME)
+        )
+    _CTX.update(
+        model=model,
+        inputs=inputs,
+        store=inputs.store(feature_cols, scaler),
+        cache=cache,
+        params=params,
+    )
+
+
+def _eval_shared(k: int) -> Outcome:
+    inputs, store, p = _CTX["inputs"], _CTX["store"], _CTX["params"]
+    sym = inputs.symbols[k]
+    try:
+        prices, times = inputs.series(k)
+        out = backtest_and_forecast_symbol(
+            _CTX["model"],
+            sym,
+            lambda ends: store.windows(sym, ends, p["W"], times),
+            prices,
+            times,
+            encoder_cache=_CTX["cache"],
+            **p,
+        )
+        return sym, out, None
+    except Exception as e:  # lỗi 1 mã không dừng cả lượt
+        return sym, None, f"{type(e).__name__}: {e}"
+
+
+@contextmanager
+def _thread_env(n: int):
+    """Đặt biến môi trường giới hạn luồng -> process con (spawn) kế thừa lúc khởi động."""
+    old = {k: os.environ.get(k) for k in THREAD_ENV}
+    os.environ.update({k: str(n) for k in THREAD_ENV})
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    try:
+        yield
+    finally:
+        for k, v in old.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+# ====== API ======
+def symbol_frames(df_clean: pd.DataFrame, symbols: Sequence[str]):
+    """[(symbol, khung đã sắp theo time)] theo đúng thứ tự symbols (thiếu -> khung rỗng)."""
+    groups = dict(tuple(df_clean.groupby("symbol", sort=False)))
+    empty = df_clean.iloc[:0]
+    return [
+        (s, groups.get(s, empty).sort_values("time").reset_index(drop=True))
+        for s in symbols
+    ]
+
+
+def evaluate_symbols(
+    model_or_best_dir,
+    df_clean: pd.DataFrame,
+    feature_cols: Sequence[str],
+    scaler,
+    config: dict,
+    symbols: Sequence[str],
+    workers: int = 0,
+    threads: Optional[int] = None,
+    runtime: str = "keras",
+    backtest_days: int = 60,
+    lookback_hist_plot: int = 120,
+    mc_samples: int = 0,
+    seed: Optional[int] = None,
+    encoder_cache=None,
+    on_result: Optional[Callable[[str, dict], None]] = None,
+) -> List[Outcome]:
+    """
+    [(symbol, kết quả | None, lỗi | None)] theo đúng thứ tự symbols.
+    workers=0: model_or_best_dir là model đã nạp, encoder_cache là EncoderCache | None.
+    workers>0: model_or_best_dir là best_dir (mỗi worker tự nạp), encoder_cache là bool.
+    on_result(symbol, kết quả) được gọi ngay khi 1 mã xong (vd. đẩy sang ChartRenderer).
+    threads: tổng số luồng cho mọi worker (mặc định = số lõi); workers > threads thì
+    chỉ chạy `threads` worker.
+    """
+    W, H = int(config.get("W", 90)), int(config.get("H", 7))
+    target_col = config.get("TARGET_COL", "close")
+    params = dict(
+        W=W,
+        H=H,
+        backtest_days=backtest_days,
+        lookback_hist_plot=lookback_hist_plot,
+        mc_samples=mc_samples,
+        seed=seed,
+    )
+    frames = symbol_frames(df_clean, symbols)
+    outcomes: List[Optional[Outcome]] = [None] * len(frames)
+
+    def done(k, outcome):
+        outcomes[k] = outcome
+        if outcome[1] is not None and on_result is not None:
+            on_result(outcome[0], outcome[1])
+
+    if workers <= 0:
+        for k, (sym, g) in enumerate(frames):
+            try:
+                out = backtest_and_forecast_symbol(
+                    model_or_best_dir,
+                    sym,
+                    lambda ends: window_batch(g, feature_cols, scaler, ends, W),
+                    g[target_col].to_numpy(dtype="float64", copy=False),
+                    pd.to_datetime(g["time"]),
+                    encoder_cache=encoder_cache,
+                    **params,
+                )
+                done(k, (sym, out, None))
+            except Exception as e:
+                done(k, (sym, None, f"{type(e).__name__}: {e}"))
+        return outcomes
+
+    threads = int(threads or os.cpu_count() or 1)
+    workers = min(workers, threads)  # mỗi worker >= 1 luồng -> giữ trần tổng `threads`
+    per_worker = threads // workers
+    with tempfile.TemporaryDirectory(prefix="eval_shared_") as tmp:
+        SharedInputs.build(frames, feature_cols, scaler, target_col, tmp)
+        init = (
+            str(model_or_best_dir),
+            runtime,
+            tmp,
+            list(feature_cols),
+            scaler,
+            {**params, "encoder_cache": bool(encoder_cache)},
+            per_worker,
+        )
+        with _thread_env(per_worker), ProcessPoolExecutor(
+            workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=init,
+        ) as pool:
+            futs = {pool.submit(_eval_shared, k): k for k in range(len(frames))}
+            for fut in as_completed(futs):
+                done(futs[fut], fut.result())
+    return outcomes
@@ -0,0 +1,297 @@
+# src/pipeline.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from instrument import RECORDER, n_rows, profiled
+
+# ====== Hash input (make-style) ======
+_CHUNK = 1 << 20
+
+
+def _hash_file(path: Path) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class HashCache:
+    """
+    Hash nội dung file, nhớ theo (size, mtime_ns): file không đổi thì không đọc lại
+    -> chạy lại không có gì thay đổi chỉ tốn vài lệnh stat().
+    """
+
+    def __init__(self, memo: Optional[Dict[str, Any]] = None):
+        self.memo = memo or {}
+        self.lock = threading.Lock()
+
+    def file(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path.resolve())
+        sig = [st.st_size, st.st_mtime_ns]
+        with self.lock:
+            m = self.memo.get(key)
+            if m and m["sig"] == sig:
+                return m["hash"]
+        digest = _hash_file(path)
+        with self.lock:
+            self.memo[key] = {"sig": sig, "hash": digest}
+        return digest
+
+    def path(self, path: Path) -> str:
+        """File -> hash nội dung; thư mục -> hash của (tên tương đối, hash) mọi file; thiếu -> 'missing'."""
+        path = Path(path)
+        if path.is_file():
+            return self.file(path)
+        if path.is_dir():
+            h = hashlib.blake2b(digest_size=16)
+            for f in sorted(p for p in path.rglob("*") if p.is_file()):
+                h.update(f"{f.relative_to(path)}:{self.file(f)}\n".encode("utf-8"))
+            return h.hexdigest()
+        return "missing"
+
+
+# ====== Bước & ngữ cảnh ======
+class Step:
+    """
+    1 nút trong DAG.
+    - fn(ctx) chạy trong process (trả về dict artifact -> object để bước sau dùng qua ctx)
+    - inputs: file/thư mục (kể cả file code) quyết định có phải chạy lại hay không
+    - outputs: file phải tồn tại thì mới được bỏ qua
+    - deps: tên các bước phải xong trước
+    - params: tham số (JSON-able) cũng nằm trong khoá cache
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[["Context"], Optional[Dict[str, Any]]],
+        inputs: Iterable[Path] = (),
+        outputs: Iterable[Path] = (),
+        deps: Iterable[str] = (),
+        params: Optional[Dict[str, Any]] = None,
+        title: str = "",
+    ):
+        self.name = name
+        self.fn = fn
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.deps = list(deps)
+        self.params = params or {}
+        self.title = title or name
+
+
+class Context:
+    """Artifact trong bộ nhớ giữa các bước; thiếu (bước trước được cache) thì đọc từ file."""
+
+    def __init__(self):
+        self._data: Dict[str, Any] = {}
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def pop_rows_read(self) -> int:
+        """Số dòng bước hiện tại (thread này) đã lấy từ ctx kể từ lần gọi trước."""
+        n = getattr(self._local, "rows", 0)
+        self._local.rows = 0
+        return n
+
+    def put(self, name: str, value: Any):
+        with self._lock:
+            self._data[name] = value
+
+    def loader(self, name: str, fn: Callable[[], Any]):
+        self._loaders[name] = fn
+
+    def get(self, name: str):
+        with self._lock:
+            value = self._data.get(name)
+        if value is None:
+            value = self._loaders[name]()
+            self.put(name, value)
+        self._local.rows = getattr(self._local, "rows", 0) + (n_rows(value) or 0)
+        return value
+
+
+# ====== Runner ======
+class Pipeline:
+    """
+    Chạy DAG các Step trong 1 process:
+      - bước nào có input hash + params không đổi và đủ output -> bỏ qua
+      - các nhánh độc lập (vd. giá cổ phiếu vs. tin tức) chạy song song trên thread pool
+      - 1 bước lỗi: các bước phụ thuộc bị bỏ, các nhánh khác vẫn chạy
+    Trạng thái cache lưu ở cache_path (JSON).
+    """
+
+    def __init__(
+        self,
+        steps: List[Step],
+        cache_path: Path,
+        max_workers: int = 4,
+        profile_dir: Optional[Path] = None,
+        profiler: str = "cprofile",
+    ):
+        self.steps = {s.name: s for s in steps}
+        for s in steps:
+            for d in s.deps:
+                if d not in self.steps:
+                    raise ValueError(f"Bước {s.name} phụ thuộc bước không tồn tại: {d}")
+        cycle = self._find_cycle()
+        if cycle:
+            raise ValueError(f"Phụ thuộc vòng: {' -> '.join(cycle)}")
+        self.cache_path = Path(cache_path)
+        self.max_workers = max_workers
+        self.profile_dir = profile_dir
+        self.profiler = profiler
+        self.status: Dict[str, str] = {}
+        self.ctx = Context()
+        state = self._load_state()
+        self.state_steps: Dict[str, str] = state.get("steps", {})
+        self.hashes = HashCache(state.get("files", {}))
+        self._state_lock = threading.Lock()
+        self._print_lock = threading.Lock()
+
+    def _find_cycle(self) -> Optional[List[str]]:
+        """DFS trên deps; trả về 1 vòng (a -> b -> ... -> a) nếu có."""
+        state: Dict[str, int] = {}  # 1: đang duyệt, 2: xong
+        path: List[str] = []
+
+        def visit(n: str) -> Optional[List[str]]:
+            state[n] = 1
+            path.append(n)
+            for d in self.steps[n].deps:
+                if state.get(d) == 1:
+                    return path[path.index(d) :] + [d]
+                if d not in state:
+                    found = visit(d)
+                    if found:
+                        return found
+            path.pop()
+            state[n] = 2
+            return None
+
+        for n in self.steps:
+            if n not in state:
+                found = visit(n)
+                if found:
+                    return found
+        return None
+
+    def log(self, msg: str):
+        # các bước chạy song song -> in cả dòng một lần, không xen nhau
+        with self._print_lock:
+            print(msg, flush=True)
+
+    def _load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with self._state_lock:
+            payload = {"steps": self.state_steps, "files": self.hashes.memo}
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=1)
+        os.replace(tmp, self.cache_path)
+
+    def step_key(self, step: Step) -> str:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps(step.params, sort_keys=True, default=str).encode("utf-8"))
+        for p in step.inputs:
+            h.update(f"{p}:{self.hashes.path(p)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def _up_to_date(self, step: Step, key: str) -> bool:
+        return self.state_steps.get(step.name) == key and all(
+            p.exists() for p in step.outputs
+        )
+
+    def _run_one(self, step: Step, force: bool) -> str:
+        key = self.step_key(step)
+        if not force and self._up_to_date(step, key):
+            self.log(f"==> [{step.title}] không đổi -> bỏ qua (cache)")
+            return "cached"
+        self.log(f"==> [{step.title}] chạy...")
+        t0 = time.perf_counter()
+        # số đo của bước + các hàm nóng bên trong gộp theo tên bước (xem instrument.py)
+        RECORDER.local.step = step.title
+        self.ctx.pop_rows_read()
+        try:
+            with RECORDER.span("[step]") as sp, profiled(
+                self.profile_dir, f"step_{step.name}", self.profiler
+            ):
+                out = step.fn(self.ctx) or {}
+                sp.rows_in = self.ctx.pop_rows_read() or None
+                rows_out = [n_rows(v) for v in out.values()]
+                sp.rows_out = sum(n for n in rows_out if n) or None
+        finally:
+            RECORDER.local.step = ""
+        for name, value in out.items():
+            self.ctx.put(name, value)
+        # khoá tính lại sau khi chạy: input có thể do chính bước này tạo ra lần đầu
+        with self._state_lock:
+            self.state_steps[step.name] = self.step_key(step)
+        self._save_state()
+        self.log(f"    ✓ [{step.title}] xong trong {time.perf_counter() - t0:.1f}s")
+        return "ran"
+
+    def run(
+        self, only: Optional[Iterable[str]] = None, force: bool = False
+    ) -> Dict[str, str]:
+        """
+        Chạy toàn bộ DAG (hoặc chỉ các bước trong `only`; bước ngoài danh sách coi như đã xong,
+        bước sau đọc output file của chúng). Trả về {bước: ran|cached|failed|skipped}.
+        """
+        selected = set(only) if only else set(self.steps)
+        status: Dict[str, str] = {n: "done" for n in self.steps if n not in selected}
+        pending = {n for n in self.steps if n in selected}
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            while pending or running:
+                for name in sorted(pending):
+                    deps = self.steps[name].deps
+                    if any(status.get(d) in ("failed", "skipped") for d in deps):
+                        status[name] = "skipped"
+                        pending.discard(name)
+                        self.log(
+                            f"==> [{self.steps[name].title}] bỏ qua vì bước trước lỗi"
+                        )
+                    elif all(d in status for d in deps):
+                        pending.discard(name)
+                        running[ex.submit(self._run_one, self.steps[name], force)] = (
+                            name
+                        )
+                if not running:
+                    # không bước nào chạy được và không còn gì đang chạy -> kẹt
+                    for name in sorted(pending):
+                        status[name] = "failed"
+                        self.log(
+                            f"❌ [{self.steps[name].title}] kẹt: phụ thuộc không thể xong"
+                        )
+                    pending.clear()
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    try:
+                        status[name] = fut.result()
+                    except Exception:
+                        status[name] = "failed"
+                        self.log(f"❌ [{self.steps[name].title}] lỗi:")
+                        traceback.print_exc()
+        self._save_state()
+        self.status = {n: status[n] for n in self.steps if n in selected}
+        return self.status
@@ -5,6 +5,8 @@ from datetime import datetime
 import pandas as pd
 from underthesea import sent_tokenize
 
+from instrument import timed
+
 # === Cấu hình ===
 TICKER_WHITELIST = {
     "FPT",
@@ -285,6 +287,7 @@ def normalize_date_vi(s):
     return s
 
 
+@timed("explode_content_to_sentences")
 def explode_content_to_sentences(
     df, date_col="ngay_dang", ticker_col="ticket", content_col="content"
 ):
@@ -320,6 +323,17 @@ def explode_content_to_sentences(
     return pd.DataFrame(rows)
 
 
+def build_sentences(df_news: pd.DataFrame) -> pd.DataFrame:
+    """Bảng tin sạch (content, ngay_dang, source) -> bảng câu (dùng chung cho main / pipeline)."""
+    df = df_news.copy()
+    # Thêm cột 'ticket' giả định từ source (cần map theo thực tế)
+    if "ticket" not in df.columns:
+        df["ticket"] = df["source"].str.upper()
+    return explode_content_to_sentences(
+        df, date_col="ngay_dang", ticker_col="ticket", content_col="content"
+    )
+
+
 if __name__ == "__main__":
     import pandas as pd
 
@@ -331,14 +345,8 @@ if __name__ == "__main__":
     else:
         df = pd.read_csv(input_file, encoding="utf-8")
 
-        # Thêm cột 'ticket' giả định từ source (cần map theo thực tế)
-        if "ticket" not in df.columns:
-            df["ticket"] = df["source"].str.upper()
-
         # Gọi hàm tách câu
-        df_sent = explode_content_to_sentences(
-            df, date_col="ngay_dang", ticker_col="ticket", content_col="content"
-        )
+        df_sent = build_sentences(df)
 
         print("Số câu sau khi tách:", df_sent.shape)
         print(df_sent.head())
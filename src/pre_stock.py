@@ -5,9 +5,12 @@ import pandas as pd
 import numpy as np
 import json
 
+from instrument import timed
+
 DATASET = Path("/home/namphuong/course_materials/web/dataset")
 DATA_CSV = DATASET / "data.csv"
 JSON_PATH = DATASET / "daily_scores_vi.json"
+SENT_STORE = DATASET / "daily_scores_by_symbol.csv"
 
 REQUIRED = ["time", "open", "high", "low", "close", "symbol"]
 
@@ -29,6 +32,68 @@ def _read_json_scores(json_path: str | Path) -> pd.DataFrame:
     return dfj
 
 
+def _read_sentiment_store(
+    store_path: str | Path | pd.DataFrame,
+) -> pd.DataFrame | None:
+    """
+    Bảng (symbol, time, p_neg, p_neu, p_pos, n_articles) từ model_sentiment; None nếu chưa có.
+    Nhận cả DataFrame đã có sẵn trong bộ nhớ (pipeline chuyển thẳng từ bước sentiment).
+    """
+    if isinstance(store_path, pd.DataFrame):
+        st = store_path.copy()
+    else:
+        store_path = Path(store_path)
+        if not store_path.exists():
+            return None
+        if store_path.suffix == ".parquet":
+            st = pd.read_parquet(store_path)
+        else:
+            st = pd.read_csv(store_path)
+    st["symbol"] = st["symbol"].astype(str).str.strip().str.upper()
+    st["time"] = pd.to_datetime(st["time"], errors="coerce")
+    for c in ["p_neg", "p_neu", "p_pos", "n_articles"]:
+        st[c] = pd.to_numeric(st[c], errors="coerce")
+    return st.dropna(subset=["time", "p_neg", "p_neu", "p_pos"])
+
+
+def _asof_join_sentiment(
+    df: pd.DataFrame, store: pd.DataFrame, max_gap_days: int = 10
+) -> pd.DataFrame:
+    """
+    Gắn sentiment theo từng mã bằng merge_asof (đã sort theo time, by='symbol'):
+    tin ngày d được tính vào phiên giao dịch đầu tiên >= d của chính mã đó
+    (tin cuối tuần/ngày nghỉ rơi vào phiên kế tiếp, tối đa max_gap_days).
+    Nhiều ngày tin rơi vào cùng 1 phiên -> trung bình có trọng số n_articles.
+    """
+    sessions = (
+        df[["symbol", "time"]]
+        .drop_duplicates()
+        .rename(columns={"time": "session"})
+        .sort_values("session")
+    )
+    st = store.sort_values("time")
+    st = st[st["symbol"].isin(sessions["symbol"].unique())]
+    m = pd.merge_asof(
+        st,
+        sessions,
+        left_on="time",
+        right_on="session",
+        by="symbol",
+        direction="forward",
+        tolerance=pd.Timedelta(days=max_gap_days),
+    ).dropna(subset=["session"])
+
+    w = m["n_articles"].fillna(1).clip(lower=1)
+    probs = ["p_neg", "p_neu", "p_pos"]
+    m[probs] = m[probs].mul(w, axis=0)
+    m["n_articles"] = w
+    agg = m.groupby(["symbol", "session"], sort=False)[probs + ["n_articles"]].sum()
+    agg[probs] = agg[probs].div(agg["n_articles"], axis=0)
+    agg = agg.reset_index().rename(columns={"session": "time"})
+
+    return df.merge(agg, on=["symbol", "time"], how="left", copy=False)
+
+
 def _rsi(series: pd.Series, period: int = 14) -> pd.Series:
     """RSI (Wilder)."""
     delta = series.diff()
@@ -44,14 +109,19 @@ def _rsi(series: pd.Series, period: int = 14) -> pd.Series:
     return rsi
 
 
+@timed("preprocess_data")
 def preprocess_data(
-    input_path: str | Path = DATA_CSV,
+    input_path: str | Path | pd.DataFrame = DATA_CSV,
     json_path: str | Path = JSON_PATH,
     start_date: str | None = "2020-01-01",
     output_path: str | Path | None = None,
+    sentiment_store: str | Path | pd.DataFrame | None = SENT_STORE,
 ) -> pd.DataFrame:
-    # ==== 1) CSV ====
-    df = pd.read_csv(input_path, low_memory=False)
+    # ==== 1) CSV (hoặc DataFrame giá đã gộp sẵn) ====
+    if isinstance(input_path, pd.DataFrame):
+        df = input_path.copy()
+    else:
+        df = pd.read_csv(input_path, low_memory=False)
     # chuẩn tên cột
     df.columns = [c.lower().strip() for c in df.columns]
     if "date" in df.columns and "time" not in df.columns:
@@ -74,15 +144,20 @@ def preprocess_data(
     if missing:
         raise ValueError(f"Thiếu cột bắt buộc trong CSV: {missing}")
 
-    # ==== 2) JSON ====
-    df_json = _read_json_scores(json_path)
-
-    # ==== 3) Merge theo time ====
-    df = pd.merge(df, df_json, on="time", how="outer", copy=False)
-
-    # lọc, sắp xếp
+    # lọc trước khi ghép sentiment để không nhân bản dòng thừa
     df = df.dropna(subset=["time"])
     df = df[df["symbol"].notna()]
+
+    # ==== 2+3) Sentiment: ưu tiên bảng theo (symbol, ngày); fallback JSON toàn cục ====
+    store = (
+        _read_sentiment_store(sentiment_store) if sentiment_store is not None else None
+    )
+    if store is not None:
+        df = _asof_join_sentiment(df, store)
+    else:
+        df_json = _read_json_scores(json_path)
+        df = pd.merge(df, df_json, on="time", how="left", copy=False)
+
     if start_date:
         start_ts = pd.to_datetime(start_date, errors="coerce")
         if pd.notna(start_ts):
@@ -99,6 +174,8 @@ def preprocess_data(
     df[["p_neg", "p_neu", "p_pos"]] = df[["p_neg", "p_neu", "p_pos"]].fillna(
         {"p_neg": 0.0, "p_neu": 1.0, "p_pos": 0.0}
     )
+    if "n_articles" in df.columns:
+        df["n_articles"] = df["n_articles"].fillna(0).astype("int32")
     # cờ has_news: có tin khi phân phối khác (0,1,0)
     probs_sum = df["p_neg"] + df["p_neu"] + df["p_pos"]
     df["has_news"] = np.where(
@@ -0,0 +1,157 @@
+# src/scaled_store.py
+"""
+Ma trận đặc trưng đã scale, tính sẵn 1 lần cho mỗi phiên bản dữ liệu và lưu ra
+<cache_dir>/scaled_<version>.npz; đường request chỉ cắt cửa sổ, không scale lại.
+  - version = hash(file dữ liệu, tham số scaler, feature_cols): đổi 1 trong 3 -> tính lại
+  - mỗi mã: khối số đã scale (T, Fd) float32 theo đúng thứ tự dòng của khung mã đó
+    + 1 dòng one-hot đã scale (bung vào batch lúc lấy cửa sổ)
+  - T hoặc thời điểm cuối không khớp khung lúc request -> windows() trả None (tự scale)
+"""
+
+from __future__ import annotations
+import hashlib
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from features import FeatureLayout, column_affine, get_layout
+
+PREFIX = "scaled_"
+
+
+def data_version(data_path: str | Path, scaler, feature_cols: Sequence[str]) -> str:
+    from np_runtime import file_hash
+
+    h = hashlib.blake2b(digest_size=8)
+    h.update(file_hash(data_path).encode())
+    affine = column_affine(scaler, len(feature_cols))
+    if affine is None:
+        raise ValueError("Scaler không tách được theo cột -> không tính sẵn được")
+    for arr in affine:
+        h.update(np.asarray(arr, dtype="float32").tobytes())
+    h.update("\x1f".join(feature_cols).encode())
+    return h.hexdigest()
+
+
+def _last_ns(times: pd.Series) -> int:
+    return int(pd.Timestamp(times.iloc[-1]).value)
+
+
+class ScaledStore:
+    """
+    store.windows(symbol, ends, W, times) -> (B, W, F) float32 cắt từ ma trận có sẵn.
+    Chỉ dùng được với layout có affine (scaler tách theo cột).
+    """
+
+    def __init__(
+        self,
+        layout: FeatureLayout,
+        version: str,
+        mats: Dict[str, Tuple[np.ndarray, np.ndarray, int]],
+    ):
+        self.layout = layout
+        self.version = version
+        self.mats = mats  # symbol -> (dense (T, Fd), sym_row (Fs,), last time ns)
+
+    @classmethod
+    def build(
+        cls,
+        frames: Iterable[Tuple[str, pd.DataFrame]],
+        feature_cols: Sequence[str],
+        scaler,
+        version: str = "",
+    ) -> "ScaledStore":
+        """frames: (symbol, khung đã sắp theo time) như lúc request dùng."""
+        lay = get_layout(feature_cols, scaler)
+        if lay.affine is None:
+            raise ValueError("Scaler không tách được theo cột -> không tính sẵn được")
+        mats = {}
+        for sym, dfg in frames:
+            if len(dfg) == 0:
+                continue
+            mats[sym] = (
+                lay.dense(dfg),
+                lay.sym_block(lay.ids(dfg.iloc[:1]))[0],
+                _last_ns(dfg["time"]),
+            )
+        return cls(lay, version, mats)
+
+    # ---------- đĩa ----------
+    def save(self, path: str | Path) -> Path:
+        path = Path(path)
+        arrays = {"version": np.array(self.version)}
+        for k, (sym, (d, s, t)) in enumerate(self.mats.items()):
+            arrays[f"name_{k}"] = np.array(sym)
+            arrays[f"dense_{k}"] = d
+            arrays[f"sym_{k}"] = s
+            arrays[f"last_{k}"] = np.array(t, dtype="int64")
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)  # ghi xong mới thay -> tiến trình khác không đọc dở
+        return path
+
+    @classmethod
+    def load(cls, path: str | Path, feature_cols: Sequence[str], scaler):
+        lay = get_layout(feature_cols, scaler)
+        mats = {}
+        with np.load(path) as z:
+            version = str(z["version"])
+            k = 0
+            while f"name_{k}" in z:
+                mats[str(z[f"name_{k}"])] = (
+                    z[f"dense_{k}"],
+                    z[f"sym_{k}"],
+                    int(z[f"last_{k}"]),
+                )
+                k += 1
+        return cls(lay, version, mats)
+
+    @classmethod
+    def open(
+        cls,
+        cache_dir: str | Path,
+        version: str,
+        feature_cols: Sequence[str],
+        scaler,
+        frames: Callable[[], Iterable[Tuple[str, pd.DataFrame]]],
+    ) -> "ScaledStore":
+        """Nạp scaled_<version>.npz nếu có; không thì tính, lưu và xoá bản cũ."""
+        cache_dir = Path(cache_dir)
+        path = cache_dir / f"{PREFIX}{version}.npz"
+        if path.exists():
+            try:
+                store = cls.load(path, feature_cols, scaler)
+                if store.version == version:
+                    return store
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[scaled_store] Bỏ qua {path.name}: {e}")
+        store = cls.build(frames(), feature_cols, scaler, version)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        store.save(path)
+        for old in cache_dir.glob(f"{PREFIX}*.npz"):
+            if old != path:
+                old.unlink(missing_ok=True)
+        return store
+
+    # ---------- API ----------
+    def windows(
+        self, symbol: str, ends: Sequence[int], window: int, times: pd.Series
+    ) -> Optional[np.ndarray]:
+        """Cửa sổ [e-W, e) (e trong ends) đã scale; khung không khớp -> None."""
+        hit = self.mats.get(symbol)
+        if hit is None:
+            return None
+        dense, sym_row, last = hit
+        if len(dense) != len(times) or last != _last_ns(times):
+            return None
+        ends = np.asarray(ends)
+        lay = self.layout
+        out = np.empty((len(ends), window, len(lay.feature_cols)), dtype="float32")
+        rows = (ends - window)[:, None] + np.arange(window)  # (B, W)
+        out[..., lay.dense_pos] = dense[rows]
+        out[..., lay.sym_pos] = sym_row
+        return out
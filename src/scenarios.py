@@ -0,0 +1,262 @@
+# src/scenarios.py
+"""
+Kịch bản what-if cho dự báo: nhiễu đặc trưng ở các ngày cuối cửa sổ (sentiment tin tức,
+cú sốc giá) -> dựng TẤT CẢ cửa sổ kịch bản thành 1 batch và dự báo 1 lượt model.
+Chỉ các ô bị đổi được scale lại (scaler theo cột: x*a + b), phần còn lại copy từ cửa sổ
+gốc đã scale.
+
+1 kịch bản (dict, mọi khoá đều tuỳ chọn):
+  name      : tên hiển thị (mặc định tự sinh từ tham số)
+  days      : số ngày cuối cửa sổ chịu tác động sentiment/set/add (mặc định 5)
+  sentiment : "neg" | "neu" | "pos" | [p_neg, p_neu, p_pos] | {"p_neg": .., ...}
+  shock     : cú sốc giá phiên cuối, tương đối (-0.05 = giảm 5%): open/high/low/close
+              nhân (1+shock); *_pct, ma_k, ema_k, macd, macd_signal, atr_14 cập nhật
+              theo công thức (tuyến tính theo close). rsi_14 giữ nguyên (cần trạng thái
+              avg gain/loss không có trong cửa sổ).
+  set / add : {cột: giá trị} gán / cộng thô vào 'days' ngày cuối
+"""
+
+from __future__ import annotations
+import itertools
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from features import column_affine
+
+SENT_COLS = ("p_neg", "p_neu", "p_pos")
+SENTIMENT_PRESETS = {
+    "neg": (0.8, 0.15, 0.05),
+    "neu": (0.0, 1.0, 0.0),  # = không có tin (has_news = 0)
+    "pos": (0.05, 0.15, 0.8),
+}
+PRICE_COLS = ("open", "high", "low", "close")
+DEFAULT_DAYS = 5
+MAX_SCENARIOS = 2000
+SPEC_KEYS = ("name", "days", "sentiment", "shock", "set", "add")
+GRID_KEYS = ("sentiment", "shock", "days")
+
+
+# ====== Chuẩn hoá kịch bản ======
+def _num(v, what: str, cast=float):
+    """Ép số; sai kiểu (list, dict, chuỗi không phải số...) -> ValueError, không TypeError."""
+    if isinstance(v, bool):
+        raise ValueError(f"{what} phải là số, nhận {v!r}")
+    try:
+        return cast(v)
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} phải là số, nhận {v!r}") from None
+
+
+def _col_values(v, what: str) -> Dict[str, float]:
+    if v is None:
+        return {}
+    if not isinstance(v, dict):
+        raise ValueError(f"{what} phải là {{cột: giá trị}}, nhận {v!r}")
+    return {str(k): _num(x, f"{what}.{k}") for k, x in v.items()}
+
+
+def _expand_grid(grid: dict) -> List[dict]:
+    if not isinstance(grid, dict):
+        raise ValueError(f"grid phải là dict, nhận {grid!r}")
+    bad = [k for k in grid if k not in GRID_KEYS]
+    if bad:
+        raise ValueError(f"Khoá grid không hợp lệ: {bad} (có: {', '.join(GRID_KEYS)})")
+    for k, v in grid.items():
+        if not isinstance(v, (list, tuple)) or not v:
+            raise ValueError(f"grid.{k} phải là list không rỗng, nhận {v!r}")
+    n = int(np.prod([len(v) for v in grid.values()]))
+    if n > MAX_SCENARIOS:
+        raise ValueError(f"Tối đa {MAX_SCENARIOS} kịch bản/lần, grid sinh {n}")
+    return scenario_grid(**grid)
+
+
+def _sentiment(v) -> Optional[tuple]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        if v not in SENTIMENT_PRESETS:
+            raise ValueError(
+                f"sentiment '{v}' không hợp lệ (có: {', '.join(SENTIMENT_PRESETS)})"
+            )
+        p = SENTIMENT_PRESETS[v]
+    elif isinstance(v, dict):
+        p = tuple(_num(v.get(c, 0.0), f"sentiment.{c}") for c in SENT_COLS)
+    elif isinstance(v, (list, tuple)):
+        p = tuple(_num(x, "sentiment") for x in v)
+        if len(p) != 3:
+            raise ValueError("sentiment cần 3 giá trị [p_neg, p_neu, p_pos]")
+    else:
+        raise ValueError(f"sentiment không hợp lệ: {v!r}")
+    s = sum(p)
+    if s <= 0 or min(p) < 0:
+        raise ValueError(f"sentiment không hợp lệ: {v}")
+    return tuple(x / s for x in p)
+
+
+def _auto_name(sc: dict) -> str:
+    parts = []
+    if sc["sentiment"] is not None:
+        parts.append("sent=" + "/".join(f"{x:.2f}" for x in sc["sentiment"]))
+    if sc["shock"]:
+        parts.append(f"shock={sc['shock']:+.1%}")
+    for c, v in sc["set"].items():
+        parts.append(f"{c}={v:g}")
+    for c, v in sc["add"].items():
+        parts.append(f"{c}{v:+g}")
+    if sc["sentiment"] is not None or sc["set"] or sc["add"]:
+        parts.append(f"days={sc['days']}")
+    return ", ".join(parts) or "base"
+
+
+def normalize_scenarios(
+    specs: Sequence[dict], feature_cols: Sequence[str], grid: Optional[dict] = None
+):
+    """
+    Kiểm tra + điền mặc định; grid (xem scenario_grid) nối thêm vào cuối specs.
+    Đầu vào sai (khoá lạ, sai kiểu, cột lạ trong set/add...) -> ValueError.
+    """
+    specs = list(specs)
+    if grid:
+        specs += _expand_grid(grid)
+    if len(specs) > MAX_SCENARIOS:
+        raise ValueError(f"Tối đa {MAX_SCENARIOS} kịch bản/lần, nhận {len(specs)}")
+    cols = set(feature_cols)
+    out = []
+    for spec in specs:
+        if not isinstance(spec, dict):
+            raise ValueError(f"Kịch bản phải là dict, nhận {spec!r}")
+        bad = [k for k in spec if k not in SPEC_KEYS]
+        if bad:
+            raise ValueError(
+                f"Khoá kịch bản không hợp lệ: {bad} (có: {', '.join(SPEC_KEYS)})"
+            )
+        sc = {
+            "days": _num(spec.get("days", DEFAULT_DAYS), "days", int),
+            "sentiment": _sentiment(spec.get("sentiment")),
+            "shock": _num(spec.get("shock") or 0.0, "shock"),
+            "set": _col_values(spec.get("set"), "set"),
+            "add": _col_values(spec.get("add"), "add"),
+        }
+        bad = [c for c in [*sc["set"], *sc["add"]] if c not in cols]
+        if bad:
+            raise ValueError(f"Cột không có trong feature_cols: {bad}")
+        if sc["days"] < 1:
+            raise ValueError("days phải >= 1")
+        if sc["shock"] <= -1:
+            raise ValueError("shock phải > -1 (giá âm)")
+        sc["name"] = str(spec.get("name") or _auto_name(sc))
+        out.append(sc)
+    return out
+
+
+def scenario_grid(
+    sentiment: Sequence = (None,),
+    shock: Sequence[float] = (0.0,),
+    days: Sequence[int] = (DEFAULT_DAYS,),
+) -> List[dict]:
+    """Tích Descartes sentiment × shock × days -> list kịch bản."""
+    return [
+        {"sentiment": s, "shock": k, "days": d}
+        for s, k, d in itertools.product(sentiment, shock, days)
+    ]
+
+
+# ====== Dựng batch ======
+def _apply_shock(raw: np.ndarray, col: Dict[str, int], s: float):
+    """
+    raw: (W, F) bản sao thô; sốc phiên cuối. Trả về {cột: giá trị mới của phiên cuối}.
+    """
+    new = {}
+    last, prev = raw[-1], raw[-2]
+    c_old = last[col["close"]] if "close" in col else None
+    for c in PRICE_COLS:
+        if c in col:
+            new[c] = last[col[c]] * (1.0 + s)
+        if f"{c}_pct" in col:
+            new[f"{c}_pct"] = (1.0 + last[col[f"{c}_pct"]]) * (1.0 + s) - 1.0
+    if c_old is None:
+        return new
+    dc = c_old * s
+    for name, j in col.items():
+        m = re.fullmatch(r"(ma|ema)_(\d+)", name)
+        if m:  # SMA: +dc/k; EMA(span k, adjust=False): +dc*2/(k+1)
+            k = int(m.group(2))
+            new[name] = raw[-1, j] + (
+                dc / k if m.group(1) == "ma" else dc * 2 / (k + 1)
+            )
+    if "macd" in col:
+        d_macd = dc * (2 / 13 - 2 / 27)
+        new["macd"] = last[col["macd"]] + d_macd
+        if "macd_signal" in col:
+            new["macd_signal"] = last[col["macd_signal"]] + d_macd * 2 / 10
+    if "atr_14" in col and {"high", "low", "close"} <= col.keys():
+
+        def tr(h, l):
+            cp = prev[col["close"]]
+            return max(h - l, abs(h - cp), abs(l - cp))
+
+        h, l = last[col["high"]], last[col["low"]]
+        new["atr_14"] = (
+            last[col["atr_14"]] + (tr(h * (1 + s), l * (1 + s)) - tr(h, l)) / 14
+        )
+    return new
+
+
+def build_scenario_windows(
+    raw_window: np.ndarray,
+    scaled_window: np.ndarray,
+    feature_cols: Sequence[str],
+    scenarios: Sequence[dict],
+    scaler,
+) -> np.ndarray:
+    """
+    raw_window (W, F) chưa scale, scaled_window (W, F) đã scale, scenarios đã chuẩn hoá
+    -> (B, W, F) float32. Chỉ các ô bị đổi được scale lại.
+    """
+    W, F = raw_window.shape
+    col = {c: j for j, c in enumerate(feature_cols)}
+    affine = column_affine(scaler, F)
+    batch = np.broadcast_to(scaled_window.astype("float32"), (len(scenarios), W, F))
+    batch = batch.copy()
+    for b, sc in enumerate(scenarios):
+        d = min(sc["days"], W)
+        edits: Dict[tuple, float] = {}  # (hàng, cột) -> giá trị thô
+        if sc["sentiment"] is not None:
+            for c, v in zip(SENT_COLS, sc["sentiment"]):
+                if c in col:
+                    for r in range(W - d, W):
+                        edits[r, col[c]] = v
+            if "has_news" in col:
+                flag = float(sc["sentiment"] != SENTIMENT_PRESETS["neu"])
+                for r in range(W - d, W):
+                    edits[r, col["has_news"]] = flag
+        for c, v in sc["set"].items():
+            for r in range(W - d, W):
+                edits[r, col[c]] = v
+        for c, v in sc["add"].items():
+            for r in range(W - d, W):
+                edits[r, col[c]] = edits.get((r, col[c]), raw_window[r, col[c]]) + v
+        if sc["shock"]:
+            for c, v in _apply_shock(raw_window, col, sc["shock"]).items():
+                edits[W - 1, col[c]] = v
+        if not edits:
+            continue
+        if affine is not None:
+            a, bb = affine
+            for (r, j), v in edits.items():
+                batch[b, r, j] = v * a[j] + bb[j]
+        else:  # scaler không tách theo cột: transform lại các dòng bị đổi
+            rows = sorted({r for r, _ in edits})
+            tmp = raw_window[rows].copy()
+            for (r, j), v in edits.items():
+                tmp[rows.index(r), j] = v
+            batch[b, rows] = scaler.transform(tmp)
+    return batch
+
+
+def scenario_paths(pred_rets: np.ndarray, last_price) -> np.ndarray:
+    """(B, H, 1) log-return + giá cuối (vô hướng hoặc (B,)) -> (B, H) đường giá."""
+    p0 = np.asarray(last_price, dtype="float64").reshape(-1, 1)
+    return p0 * np.exp(np.cumsum(pred_rets[..., 0], axis=-1, dtype="float64"))
@@ -62,10 +62,14 @@ async function loadSymbols() {
     symbolSelect.appendChild(opt);
   }
 }
+// số mẫu Monte Carlo cho dải phân vị forecast (0 = tắt)
+const MC_SAMPLES = 200;
+
 async function loadInfer(symbol, backtestDays, signal) {
   const q = new URLSearchParams({
     symbol,
     backtest_days: String(backtestDays),
+    samples: String(MC_SAMPLES),
   });
   return apiGet(`/infer?${q.toString()}`, signal);
 }
@@ -92,6 +96,28 @@ function renderChartsSeparated(symbol, data) {
   const y1 = p1.map((d) => d.pred_1step);
   const tf = (data.future_df || []).map((d) => d.time.slice(0, 10));
   const yf = (data.future_df || []).map((d) => d.pred_price);
+  const band = (k) => (data.future_df || []).map((d) => d[k] ?? null);
+  const hasBands = (data.future_df || []).some((d) => Number.isFinite(d?.q05));
+  // dải phân vị: vẽ cận dưới trước, cận trên fill "tonexty" về cận dưới
+  const bandTraces = (lo, hi, name, alpha) => [
+    {
+      x: tf,
+      y: band(lo),
+      mode: "lines",
+      line: { width: 0 },
+      showlegend: false,
+      hoverinfo: "skip",
+    },
+    {
+      x: tf,
+      y: band(hi),
+      name,
+      mode: "lines",
+      line: { width: 0 },
+      fill: "tonexty",
+      fillcolor: `rgba(99, 110, 250, ${alpha})`,
+    },
+  ];
 
   const ema20 = (data.backtest_df || []).map((d) => d.ema20 ?? null);
   const ema60 = (data.backtest_df || []).map((d) => d.ema60 ?? null);
@@ -132,6 +158,12 @@ function renderChartsSeparated(symbol, data) {
         mode: "lines",
         line: { dash: "dash" },
       },
+      ...(hasBands
+        ? [
+            ...bandTraces("q05", "q95", "Forecast 5–95%", 0.15),
+            ...bandTraces("q25", "q75", "Forecast 25–75%", 0.3),
+          ]
+        : []),
       {
         x: tf,
         y: yf,
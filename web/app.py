@@ -1,12 +1,14 @@
 # web/app.py
 from __future__ import annotations
 from pathlib import Path
-from fastapi import FastAPI, Query
+import os
+from fastapi import Body, FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import pandas as pd
 
-from .model import list_symbols, infer_one_symbol
+from . import metrics
+from .model import list_symbols, infer_one_symbol, prepare_data, scenario_one_symbol
 
 app = FastAPI(title="Stock Forecast API")
 app.add_middleware(
@@ -18,8 +20,19 @@ app.add_middleware(
 )
 
 # Đọc dữ liệu đã tiền xử lý
-DATA_PATH = Path(__file__).parent.parent / "dataset" / "preprocessed_data.csv"
+DATA_PATH = Path(
+    os.environ.get(
+        "STOCK_DATA_PATH",
+        Path(__file__).parent.parent / "dataset" / "preprocessed_data.csv",
+    )
+)
 DF_RAW = pd.read_csv(DATA_PATH, parse_dates=["time"])
+# scale sẵn 1 lần cho phiên bản dữ liệu này (lưu cạnh artifacts, dùng lại lần khởi động sau)
+prepare_data(DF_RAW, DATA_PATH)
+
+
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, symbols=lambda: list_symbols(DF_RAW))
 
 
 # ---------- API ----------
@@ -30,13 +43,43 @@ def symbols():
 
 @app.get("/infer")
 def infer(
-    symbol: str = Query(...), backtest_days: int = 60, lookback_hist_plot: int = 120
+    symbol: str = Query(...),
+    backtest_days: int = 60,
+    lookback_hist_plot: int = 120,
+    samples: int = Query(0, ge=0, le=5000),  # > 0: dải phân vị Monte Carlo
+    seed: int | None = None,
 ):
     return infer_one_symbol(
         DF_RAW,
         symbol=symbol,
         backtest_days=backtest_days,
         lookback_hist_plot=lookback_hist_plot,
+        samples=samples,
+        seed=seed,
+    )
+
+
+@app.post("/scenarios")
+def scenarios(
+    symbol: str = Query(...),
+    scenarios: list[dict] = Body(default=[], embed=True),
+    grid: dict | None = Body(default=None, embed=True),
+):
+    """
+    Body: {"scenarios": [{"sentiment": "neg", "days": 3}, {"shock": -0.05}, ...],
+           "grid": {"sentiment": ["neg", "pos"], "shock": [-0.05, 0, 0.05]}}
+    """
+    try:
+        return scenario_one_symbol(DF_RAW, symbol, scenarios=scenarios, grid=grid)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # async: chạy trong event loop -> đọc được hàng đợi threadpool của các endpoint sync
+    return Response(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
     )
 
 
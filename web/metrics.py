@@ -0,0 +1,283 @@
+# web/metrics.py
+"""
+Metrics kiểu Prometheus cho API (không cần prometheus_client): counter, histogram,
+gauge + text exposition format 0.0.4 cho GET /metrics.
+Tắt bằng STOCK_METRICS=0: middleware không được gắn, các hook chỉ còn 1 phép kiểm tra cờ.
+"""
+
+from __future__ import annotations
+import bisect
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import parse_qs
+
+ENABLED = os.environ.get("STOCK_METRICS", "1") != "0"
+
+# /infer mất vài giây -> thêm bucket dài hơn bộ mặc định của Prometheus
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROUTES = {"/symbols", "/infer", "/scenarios", "/metrics"}
+
+try:  # psutil là tuỳ chọn
+    import psutil
+
+    _PROC = psutil.Process()
+except Exception:  # pragma: no cover
+    _PROC = None
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_START = time.time()
+
+
+def _rss_bytes() -> float:
+    if _PROC is not None:
+        return float(_PROC.memory_info().rss)
+    try:
+        with open("/proc/self/statm") as f:
+            return float(int(f.read().split()[1]) * _PAGE)
+    except OSError:
+        return float("nan")
+
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra="") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+# ====== Kiểu metric ======
+class Counter:
+    """Cộng dồn bằng inc(), hoặc đọc lúc scrape (fn, không nhãn: giá trị chỉ tăng)."""
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Iterable[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+    ):
+        self.name, self.doc, self.labels, self.fn = name, doc, tuple(labels), fn
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} counter"
+        if self.fn is not None:
+            yield f"{self.name} {_num(float(self.fn()))}"
+            return
+        with self.lock:
+            items = sorted(self.values.items())
+        for lv, v in items:
+            yield f"{self.name}{_fmt_labels(self.labels, lv)} {_num(v)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Iterable[str] = (),
+        buckets=LATENCY_BUCKETS,
+    ):
+        self.name, self.doc, self.labels = name, doc, tuple(labels)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], list] = {}  # lv -> [counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            s = self.series.get(label_values)
+            if s is None:
+                s = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} histogram"
+        with self.lock:
+            items = sorted((lv, list(s)) for lv, s in self.series.items())
+        for lv, s in items:
+            cum = 0
+            for b, c in zip(self.buckets + (float("inf"),), s[:-2]):
+                cum += c
+                le = 'le="' + _num(float(b)) + '"'
+                yield f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {cum}"
+            yield f"{self.name}_sum{_fmt_labels(self.labels, lv)} {_num(s[-2])}"
+            yield f"{self.name}_count{_fmt_labels(self.labels, lv)} {s[-1]}"
+
+
+class Gauge:
+    """Giá trị đọc lúc scrape (fn) hoặc đặt tay (inc/dec)."""
+
+    def __init__(self, name: str, doc: str, fn: Optional[Callable[[], float]] = None):
+        self.name, self.doc, self.fn = name, doc, fn
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def expose(self):
+        yield f"# HELP {self.name} {self.doc}"
+        yield f"# TYPE {self.name} gauge"
+        yield f"{self.name} {_num(float(self.fn() if self.fn else self.value))}"
+
+
+# ====== Các metric của service ======
+REQUESTS = Counter(
+    "stock_http_requests_total",
+    "Số request theo route, symbol, status",
+    ("route", "method", "status", "symbol"),
+)
+LATENCY = Histogram(
+    "stock_http_request_duration_seconds",
+    "Độ trễ request (tới khi gửi xong body)",
+    ("route", "symbol"),
+)
+IN_FLIGHT = Gauge(
+    "stock_http_requests_in_flight", "Request đang xử lý hoặc đang chờ thread"
+)
+PHASES = Histogram(
+    "stock_infer_phase_seconds",
+    "Thời gian từng pha trong infer_one_symbol",
+    ("phase",),
+)
+CACHE = Counter(
+    "stock_cache_requests_total", "Truy cập cache theo kết quả", ("cache", "result")
+)
+_THREADPOOL: Dict[str, float] = {"busy": 0.0, "waiting": 0.0}
+THREADS_BUSY = Gauge(
+    "stock_threadpool_busy",
+    "Thread đang chạy endpoint đồng bộ (đo lúc scrape)",
+    lambda: _THREADPOOL["busy"],
+)
+THREADS_WAITING = Gauge(
+    "stock_threadpool_waiting",
+    "Request đồng bộ đang xếp hàng chờ thread (queue depth)",
+    lambda: _THREADPOOL["waiting"],
+)
+RSS = Gauge("process_resident_memory_bytes", "RSS của process", _rss_bytes)
+CPU = Counter("process_cpu_seconds_total", "CPU time (user+sys)", fn=time.process_time)
+START = Gauge(
+    "process_start_time_seconds", "Thời điểm process khởi động", lambda: _START
+)
+
+REGISTRY = [
+    REQUESTS,
+    LATENCY,
+    IN_FLIGHT,
+    PHASES,
+    CACHE,
+    THREADS_BUSY,
+    THREADS_WAITING,
+    RSS,
+    CPU,
+    START,
+]
+
+
+# ====== Hook dùng trong code ======
+class PhaseTimer:
+    """
+    t = PhaseTimer(); ...; t.mark("preprocess"); ...; t.mark("predict")
+    Mỗi mark ghi thời gian kể từ mark trước. Tắt metrics -> mark() trả về ngay.
+    """
+
+    __slots__ = ("t",)
+
+    def __init__(self):
+        self.t = time.perf_counter() if ENABLED else 0.0
+
+    def mark(self, phase: str):
+        if not ENABLED:
+            return
+        now = time.perf_counter()
+        PHASES.observe(now - self.t, phase)
+        self.t = now
+
+
+def record_cache(cache: str, hit: bool, n: int = 1):
+    if ENABLED:
+        CACHE.inc(cache, "hit" if hit else "miss", amount=n)
+
+
+def render() -> str:
+    """Text exposition cho GET /metrics (gọi trong event loop để đọc threadpool)."""
+    try:
+        from anyio.to_thread import current_default_thread_limiter
+
+        st = current_default_thread_limiter().statistics()
+        _THREADPOOL["busy"] = float(st.borrowed_tokens)
+        _THREADPOOL["waiting"] = float(st.tasks_waiting)
+    except Exception:
+        pass
+    lines = []
+    for m in REGISTRY:
+        lines.extend(m.expose())
+    return "\n".join(lines) + "\n"
+
+
+# ====== ASGI middleware ======
+class MetricsMiddleware:
+    """Đếm request + histogram độ trễ theo (route, symbol); route lạ gom về 'static'."""
+
+    def __init__(self, app, symbols: Callable[[], Iterable[str]] = lambda: ()):
+        self.app = app
+        self._symbols = symbols
+        self._known: Optional[set] = None
+
+    def _symbol(self, scope) -> str:
+        qs = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        sym = (qs.get("symbol") or [""])[0].upper()
+        if not sym:
+            return ""
+        if self._known is None:
+            self._known = {str(s).upper() for s in self._symbols()}
+        # giới hạn cardinality: mã không có trong dữ liệu -> 'unknown'
+        return sym if sym in self._known else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        route = path if path in ROUTES else "static"
+        symbol = self._symbol(scope) if route in ("/infer", "/scenarios") else ""
+        status = [500]
+
+        async def send_wrapper(msg):
+            if msg["type"] == "http.response.start":
+                status[0] = msg["status"]
+            await send(msg)
+
+        IN_FLIGHT.inc()
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            LATENCY.observe(time.perf_counter() - t0, route, symbol)
+            REQUESTS.inc(route, scope.get("method", ""), str(status[0]), symbol)
@@ -1,49 +1,57 @@
 # web/model.py
 from __future__ import annotations
 from pathlib import Path
+import os
+import sys
 import json
 import numpy as np
 import pandas as pd
-import joblib
-import tensorflow as tf
-from tensorflow.keras import layers
-from tensorflow.keras import backend as K
-from tensorflow.keras.models import load_model
+
+from .metrics import PhaseTimer, record_cache
 
 # ---------- ĐƯỜNG DẪN ----------
 THIS_DIR = Path(__file__).parent
-BEST_DIR = THIS_DIR / "best_model"
+SRC_DIR = THIS_DIR.parent / "src"
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+from encoder_cache import CACHE_NAME, EncoderCache  # noqa: E402
+from features import SYM_PREFIX, feature_matrix, load_scaler, window_batch  # noqa: E402
+from forecaster import (  # noqa: E402
+    forecast_bands,
+    forecast_windows,
+    has_latent,
+    load_forecaster,
+    model_version,
+    source_model_path,
+)
+from metrics_and_backtest import path_metrics  # noqa: E402
+from scaled_store import ScaledStore, data_version  # noqa: E402
+from scenarios import (  # noqa: E402
+    build_scenario_windows,
+    normalize_scenarios,
+    scenario_paths,
+)
+
+# STOCK_BEST_DIR: trỏ sang bộ artifacts khác (vd. model giả của bench/)
+BEST_DIR = Path(os.environ.get("STOCK_BEST_DIR", THIS_DIR / "best_model"))
 CFG_PATH = BEST_DIR / "config.json"
 SCL_PATH = BEST_DIR / "x_scaler.pkl"
-KERAS_BEST = BEST_DIR / "best_vae.keras"
-KERAS_FINAL = BEST_DIR / "final_vae.keras"
-
-
-# ---------- LAYERS TUỲ BIẾN ----------
-class Sampling(layers.Layer):
-    def call(self, inputs):
-        mu, logvar = inputs
-        eps = tf.random.normal(shape=K.shape(mu))
-        return mu + K.exp(0.5 * logvar) * eps
-
-
-class KLDivergenceLayer(layers.Layer):
-    def __init__(self, beta=0.5, **kwargs):
-        super().__init__(**kwargs)
-        self.beta = beta
-
-    def call(self, inputs):
-        mu, logvar = inputs
-        kl_per = -0.5 * K.sum(1 + logvar - K.square(mu) - K.exp(logvar), axis=1)
-        self.add_loss(self.beta * K.mean(kl_per))
-        return inputs
+# STOCK_RUNTIME: auto | keras | export | numpy (không import TensorFlow), xem src/forecaster.py
+RUNTIME = os.environ.get("STOCK_RUNTIME", "auto")
+# STOCK_ENCODER_CACHE=0: tắt cache encoder; STOCK_ENCODER_CACHE_PATH: file SQLite
+ENCODER_CACHE_ON = os.environ.get("STOCK_ENCODER_CACHE", "1") != "0"
+ENCODER_CACHE_PATH = os.environ.get(
+    "STOCK_ENCODER_CACHE_PATH", str(BEST_DIR / CACHE_NAME)
+)
+# STOCK_SCALED_CACHE=0: không tính sẵn ma trận đã scale (mỗi request tự scale)
+SCALED_CACHE_ON = os.environ.get("STOCK_SCALED_CACHE", "1") != "0"
 
 
 # ---------- NẠP ARTIFACTS ----------
 if (
     not CFG_PATH.exists()
     or not SCL_PATH.exists()
-    or not (KERAS_BEST.exists() or KERAS_FINAL.exists())
+    or not source_model_path(BEST_DIR).exists()
 ):
     raise FileNotFoundError(
         f"Thiếu artifacts trong {BEST_DIR}. Cần config.json, x_scaler.pkl và best_vae.keras (hoặc final_vae.keras)."
@@ -51,60 +59,135 @@ if (
 
 with CFG_PATH.open("r") as f:
     CONFIG = json.load(f)
-SCALER = joblib.load(SCL_PATH)
-MODEL_PATH = KERAS_BEST if KERAS_BEST.exists() else KERAS_FINAL
-VAE = load_model(
-    MODEL_PATH,
-    custom_objects={"Sampling": Sampling, "KLDivergenceLayer": KLDivergenceLayer},
-    compile=False,
+# x_scaler.npz (float32, không cần sklearn) nếu khớp x_scaler.pkl, xem features.load_scaler
+SCALER = load_scaler(BEST_DIR)
+MODEL, RUNTIME = load_forecaster(BEST_DIR, RUNTIME)
+# (mu, logvar) theo (symbol, ngày cuối cửa sổ): chỉ runtime có encode/decode riêng
+ENCODER_CACHE = (
+    EncoderCache(
+        model_version(BEST_DIR),
+        ENCODER_CACHE_PATH,
+        on_lookup=lambda hit, n: record_cache("encoder", hit, n),
+    )
+    if ENCODER_CACHE_ON and has_latent(MODEL)
+    else None
 )
 
 W = int(CONFIG.get("W", 90))
 H = int(CONFIG.get("H", 7))
 TARGET_COL = CONFIG.get("TARGET_COL", "close")
 FEATURE_COLS = CONFIG.get("feature_cols", [])
+# ma trận đã scale tính sẵn cho 1 khung dữ liệu (prepare_data); SCALED_SOURCE = khung đó
+SCALED: ScaledStore | None = None
+SCALED_SOURCE: pd.DataFrame | None = None
 
 
 # ---------- TIỆN ÍCH ----------
 def _align_feature_cols(df: pd.DataFrame, feature_cols):
-    for c in feature_cols:
+    # khối one-hot sym_* không thêm dày: feature_matrix bung từ cột 'symbol'
+    dense = [c for c in feature_cols if not c.startswith(SYM_PREFIX)]
+    for c in dense:
         if c not in df.columns:
             df[c] = 0.0
-    return df.astype({c: "float32" for c in feature_cols})
+    return df.astype({c: "float32" for c in dense})
 
 
 def _safe_np(a):
     return np.asarray(a, dtype="float64", order="C")
 
 
+def _forecast(symbol: str, windows: np.ndarray, times: pd.Series, ends):
+    """
+    Dự báo 1 lượt cho cửa sổ đã scale (B, W, F) kết thúc ở ends -> (y (B, H, 1), latent).
+    export/numpy dùng z = mu (tất định), keras lấy 1 mẫu/cửa sổ.
+    """
+    end_dates = [t.isoformat() for t in times.iloc[np.asarray(ends) - 1]]
+    return forecast_windows(MODEL, windows, ENCODER_CACHE, symbol.upper(), end_dates)
+
+
+def _symbol_frame(df_raw: pd.DataFrame, symbol: str, min_rows: int) -> pd.DataFrame:
+    """Lọc 1 mã, sắp theo thời gian, đủ cột đặc trưng; thiếu dòng -> ValueError."""
+    dfg = (
+        df_raw[df_raw["symbol"].astype(str).str.upper() == symbol.upper()]
+        .sort_values("time")
+        .reset_index(drop=True)
+        .copy()
+    )
+    if len(dfg) < min_rows:
+        raise ValueError(f"{symbol}: cần >= {min_rows} dòng, hiện có {len(dfg)}")
+    dfg["time"] = pd.to_datetime(dfg["time"])
+    return _align_feature_cols(dfg, FEATURE_COLS)
+
+
+def _future_times(times: pd.Series):
+    """H mốc tương lai theo tần suất 2 điểm cuối (mặc định 1 ngày)."""
+    if len(times) >= 2:
+        freq = times.iloc[-1] - times.iloc[-2]
+        if freq <= pd.Timedelta(0):
+            freq = pd.Timedelta(days=1)
+    else:
+        freq = pd.Timedelta(days=1)
+    return [times.iloc[-1] + (i + 1) * freq for i in range(H)]
+
+
 def list_symbols(df: pd.DataFrame):
     return df["symbol"].dropna().astype(str).str.upper().unique().tolist()
 
 
+def prepare_data(df_raw: pd.DataFrame, data_path: str | Path | None = None):
+    """
+    Tính sẵn (hoặc nạp <BEST_DIR>/scaled_<version>.npz) khối đặc trưng đã scale của mọi
+    mã trong df_raw -> request trên đúng khung này chỉ cắt cửa sổ. data_path=None: không
+    lưu đĩa (version theo nội dung không xác định được).
+    """
+    global SCALED, SCALED_SOURCE
+    if not SCALED_CACHE_ON:
+        return None
+
+    def frames():
+        for s in list_symbols(df_raw):
+            yield s, _symbol_frame(df_raw, s, 0)
+
+    try:
+        if data_path is None:
+            store = ScaledStore.build(frames(), FEATURE_COLS, SCALER)
+        else:
+            version = data_version(data_path, SCALER, FEATURE_COLS)
+            store = ScaledStore.open(BEST_DIR, version, FEATURE_COLS, SCALER, frames)
+    except ValueError as e:  # scaler không tách theo cột
+        print(f"[model] Không tính sẵn ma trận đã scale: {e}")
+        return None
+    SCALED, SCALED_SOURCE = store, df_raw
+    return store
+
+
+def _windows(df_raw: pd.DataFrame, symbol: str, dfg: pd.DataFrame, ends):
+    """Cửa sổ đã scale: cắt từ SCALED nếu df_raw là khung đã prepare, không thì scale."""
+    if SCALED is not None and df_raw is SCALED_SOURCE:
+        out = SCALED.windows(symbol.upper(), ends, W, dfg["time"])
+        if out is not None:
+            return out
+    return window_batch(dfg, FEATURE_COLS, SCALER, ends, W)
+
+
 # ---------- INFER 1 SYMBOL ----------
 def infer_one_symbol(
     df_raw: pd.DataFrame,
     symbol: str,
     backtest_days: int = 60,
     lookback_hist_plot: int = 120,
+    samples: int = 0,
+    seed: int | None = None,
 ):
+    """
+    samples > 0: thêm dải phân vị Monte Carlo (q05..q95, mc_mean) vào future_df,
+    K mẫu latent cho cửa sổ cuối trong 1 lượt decoder.
+    """
+    timer = PhaseTimer()  # thời gian từng pha -> /metrics
     # Lọc 1 mã
-    dfg = (
-        df_raw[df_raw["symbol"].astype(str).str.upper() == symbol.upper()]
-        .sort_values("time")
-        .reset_index(drop=True)
-        .copy()
-    )
-    if len(dfg) < (W + backtest_days + 1):
-        raise ValueError(
-            f"{symbol}: cần >= {W + backtest_days + 1} dòng, hiện có {len(dfg)}"
-        )
-
-    dfg["time"] = pd.to_datetime(dfg["time"])
-    dfg = _align_feature_cols(dfg, FEATURE_COLS)
+    dfg = _symbol_frame(df_raw, symbol, W + backtest_days + 1)
+    timer.mark("preprocess")
 
-    # Scale & series
-    X_all = SCALER.transform(dfg[FEATURE_COLS].to_numpy(dtype="float32", copy=False))
     prices = _safe_np(dfg[TARGET_COL].to_numpy(copy=False))
     times = pd.to_datetime(dfg["time"])
 
@@ -113,16 +196,15 @@ def infer_one_symbol(
     if start_bt_idx - W < 0:
         start_bt_idx = W
 
-    pred_bt_1step = []
-    for t in range(start_bt_idx, len(dfg)):
-        s, e = t - W, t
-        window = X_all[s:e]  # (W,F)
-        pred_rets = VAE.predict(window[np.newaxis], verbose=0)[0, :, 0]
-        p0 = float(prices[e - 1])
-        p1 = p0 * np.exp(float(pred_rets[0]))  # 1-step
-        pred_bt_1step.append(p1)
-
-    pred_bt_1step = _safe_np(pred_bt_1step)
+    # cửa sổ kết thúc ở t-1 dự báo ngày t; cửa sổ cuối (e = len) cho forecast H ngày
+    ends = np.arange(start_bt_idx, len(dfg) + 1)
+    # cắt từ ma trận tính sẵn; không có thì chỉ scale các dòng trong cửa sổ backtest
+    windows = _windows(df_raw, symbol, dfg, ends)
+    timer.mark("scale")
+    y, latent = _forecast(symbol, windows, times, ends)
+    timer.mark("predict")
+    # 1-step: giá ngày trước * exp(log-return bước 1)
+    pred_bt_1step = _safe_np(prices[ends[:-1] - 1] * np.exp(y[:-1, 0, 0]))
     actual_bt = prices[start_bt_idx:]
     times_bt = times[start_bt_idx:]
 
@@ -133,49 +215,27 @@ def infer_one_symbol(
     p0 = float(prices[start_bt_idx + first_valid_pos - 1])
 
     # ----- 2) Metrics -----
-    def _safe_div(a, b):
-        return a / np.clip(b, 1e-12, None)
-
-    err = pred_bt_1step[valid] - actual_bt[valid]
-    rmse = float(np.sqrt(np.mean(err**2)))
-    mape = float(np.mean(np.abs(_safe_div(err, actual_bt[valid]))) * 100.0)
-
-    a = np.concatenate([[p0], actual_bt[valid]])
-    p = np.concatenate([[p0], pred_bt_1step[valid]])
-    da = float(np.mean(np.sign(np.diff(a)) == np.sign(np.diff(p))))
-    if len(a) >= 3:
-        a_dir = np.sign(np.diff(a))
-        p_dir = np.sign(np.diff(p))
-        ta = float(np.mean((a_dir[1:] != a_dir[:-1]) == (p_dir[1:] != p_dir[:-1])))
-        sda = float(np.mean(np.sign(a[2:] - a[:-2]) == np.sign(p[2:] - p[:-2])))
-    else:
-        ta, sda = float("nan"), float("nan")
-
+    m = path_metrics(actual_bt[first_valid_pos:], pred_bt_1step[first_valid_pos:], p0)
     metrics = {
-        "days": int(len(actual_bt[valid])),
-        "rmse": rmse,
-        "mape": mape,
-        "da": da,
-        "ta": ta,
-        "sda": sda,
+        "days": m["n"],
+        "rmse": m["rmse"],
+        "mape": m["mape"],
+        "da": m["da"],
+        "ta": m["ta"],
+        "sda": m["sda"],
     }
+    timer.mark("metrics")
 
     # ----- 3) Forecast H ngày -----
-    last_window = X_all[-W:]
-    pred_rets_fut = VAE.predict(last_window[np.newaxis], verbose=0)[0, :, 0]
+    last_window = windows[-1]
+    pred_rets_fut = y[-1, :, 0]
     last_price = float(prices[-1])
     fut_prices = [last_price]
     for r in pred_rets_fut:
         fut_prices.append(fut_prices[-1] * np.exp(float(r)))
     fut_prices = _safe_np(fut_prices[1:])
 
-    if len(times) >= 2:
-        freq = times.iloc[-1] - times.iloc[-2]
-        if freq <= pd.Timedelta(0):
-            freq = pd.Timedelta(days=1)
-    else:
-        freq = pd.Timedelta(days=1)
-    fut_times = [times.iloc[-1] + (i + 1) * freq for i in range(H)]
+    fut_times = _future_times(times)
 
     # ----- 4) Gói thêm INDICATORS CHO FRONTEND -----
     # cắt cùng vùng backtest để vẽ các chỉ báo song song với actual/pred
@@ -217,9 +277,78 @@ def infer_one_symbol(
     )
 
     future_df = pd.DataFrame({"time": fut_times, "pred_price": fut_prices})
+    if samples > 0:
+        bands = forecast_bands(
+            MODEL,
+            last_window[np.newaxis],
+            [last_price],
+            k=samples,
+            seed=seed,
+            latent=None if latent is None else (latent[0][-1:], latent[1][-1:]),
+        )
+        for name, v in bands.items():
+            future_df["mc_mean" if name == "mean" else name] = v[0]
+        timer.mark("sample")
 
-    return {
+    out = {
         "backtest_df": backtest_df.to_dict(orient="records"),
         "future_df": future_df.to_dict(orient="records"),
         "metrics_backtest": metrics,
     }
+    timer.mark("serialize")
+    return out
+
+
+# ---------- WHAT-IF SCENARIOS ----------
+def scenario_one_symbol(
+    df_raw: pd.DataFrame,
+    symbol: str,
+    scenarios: list | None = None,
+    grid: dict | None = None,
+):
+    """
+    Dự báo H ngày cho cửa sổ cuối dưới nhiều kịch bản (xem src/scenarios.py) trong
+    1 lượt model. scenarios: list dict; grid: {"sentiment": [...], "shock": [...],
+    "days": [...]} -> tích Descartes. Kịch bản 'base' (không đổi gì) luôn đứng đầu;
+    delta_pct = chênh lệch giá cuối horizon so với base (%). Runtime keras rút nhiễu
+    latent riêng từng dòng -> delta lẫn nhiễu; export/numpy (z = mu) cho delta tất định.
+    """
+    timer = PhaseTimer()
+    specs = normalize_scenarios(
+        [{"name": "base"}, *(scenarios or [])], FEATURE_COLS, grid=grid
+    )
+    dfg = _symbol_frame(df_raw, symbol, W)
+    timer.mark("preprocess")
+
+    # cửa sổ cuối đã scale (tính sẵn nếu có); kịch bản scale lại đúng các ô bị đổi
+    raw = feature_matrix(dfg.iloc[-W:], FEATURE_COLS).astype("float64")
+    scaled = _windows(df_raw, symbol, dfg, [len(dfg)])[0]
+    batch = build_scenario_windows(raw, scaled, FEATURE_COLS, specs, SCALER)
+    timer.mark("scale")
+    y, _ = forecast_windows(MODEL, batch)
+    timer.mark("predict")
+
+    last_price = float(dfg[TARGET_COL].iloc[-1])
+    # kịch bản có shock bắt đầu từ giá phiên cuối đã bị sốc
+    start = last_price * (1.0 + np.array([sc["shock"] for sc in specs]))
+    paths = scenario_paths(y, start)  # (B, H)
+    delta = (paths[:, -1] / paths[0, -1] - 1.0) * 100.0
+    out = {
+        "symbol": symbol.upper(),
+        "last_time": dfg["time"].iloc[-1],
+        "last_price": last_price,
+        "time": _future_times(dfg["time"]),
+        "scenarios": [
+            {
+                "name": sc["name"],
+                "sentiment": sc["sentiment"],
+                "shock": sc["shock"],
+                "days": sc["days"],
+                "pred_price": paths[b].tolist(),
+                "delta_pct": float(delta[b]),
+            }
+            for b, sc in enumerate(specs)
+        ],
+    }
+    timer.mark("serialize")
+    return out